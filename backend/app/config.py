@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -10,10 +11,84 @@ class Settings:
     
     # Storage
     UPLOAD_DIR: str = os.path.join(os.getcwd(), "backend", "uploads")
+    UPLOAD_BUDGET_BYTES: int = int(os.getenv("UPLOAD_BUDGET_BYTES", str(5 * 1024 ** 3)))
+    UPLOAD_TTL_HOURS: float = float(os.getenv("UPLOAD_TTL_HOURS", "0"))  # 0 disables TTL eviction
+    UPLOAD_GC_INTERVAL: float = float(os.getenv("UPLOAD_GC_INTERVAL", "300"))
+    # Render thumbnails/previews in the background right after upload (else on first request)
+    DERIVATIVES_EAGER: bool = os.getenv("DERIVATIVES_EAGER", "true").lower() == "true"
+    
+    # Upload gate: limits checked before an upload body is read
+    UPLOAD_MAX_IMAGE_BYTES: int = int(os.getenv("UPLOAD_MAX_IMAGE_BYTES", str(50 * 1024 ** 2)))
+    UPLOAD_MAX_VIDEO_BYTES: int = int(os.getenv("UPLOAD_MAX_VIDEO_BYTES", str(500 * 1024 ** 2)))
+    UPLOAD_MAX_AUDIO_BYTES: int = int(os.getenv("UPLOAD_MAX_AUDIO_BYTES", str(100 * 1024 ** 2)))
+    UPLOAD_MAX_PIXELS: int = int(os.getenv("UPLOAD_MAX_PIXELS", "100000000"))
+    # Per-route overrides, e.g. {"/api/stego/analyze": {"max_bytes": 20000000, "max_pixels": 40000000}}
+    UPLOAD_LIMITS: dict = json.loads(os.getenv("UPLOAD_LIMITS", "{}"))
     
     # Supabase (Optional for now, but ready)
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY", "")
+    
+    # Object storage replication (none, local, supabase, s3)
+    OBJECT_STORE_BACKEND: str = os.getenv("OBJECT_STORE_BACKEND", "supabase" if SUPABASE_URL else "none").lower()
+    OBJECT_STORE_BUCKET: str = os.getenv("OBJECT_STORE_BUCKET", "uploads")
+    OBJECT_STORE_LOCAL_DIR: str = os.getenv("OBJECT_STORE_LOCAL_DIR", os.path.join(os.getcwd(), "backend", "replica"))
+    S3_ENDPOINT_URL: str = os.getenv("S3_ENDPOINT_URL", "")
+    REPLICATION_WORKERS: int = int(os.getenv("REPLICATION_WORKERS", "4"))
+    REPLICATION_MAX_ATTEMPTS: int = int(os.getenv("REPLICATION_MAX_ATTEMPTS", "8"))
+    
+    # Visitor log write-behind buffer
+    VISITOR_LOG_BATCH_SIZE: int = int(os.getenv("VISITOR_LOG_BATCH_SIZE", "200"))
+    VISITOR_LOG_FLUSH_MS: int = int(os.getenv("VISITOR_LOG_FLUSH_MS", "500"))
+    VISITOR_LOG_MAX_PENDING: int = int(os.getenv("VISITOR_LOG_MAX_PENDING", "10000"))
+    
+    # Visitor tracking queue between the request path and reverse OSINT logging
+    VISITOR_TRACKING_QUEUE_SIZE: int = int(os.getenv("VISITOR_TRACKING_QUEUE_SIZE", "10000"))
+    VISITOR_TRACKING_WORKERS: int = int(os.getenv("VISITOR_TRACKING_WORKERS", "8"))
+    VISITOR_TRACKING_DROP_POLICY: str = os.getenv("VISITOR_TRACKING_DROP_POLICY", "newest")  # newest | oldest
+    # Exact paths, or "/prefix/*" for a path and everything below it
+    VISITOR_TRACKING_SKIP_PATHS: list = os.getenv(
+        "VISITOR_TRACKING_SKIP_PATHS", "/,/favicon.ico,/uploads/*,/ws/*").split(",")
+    
+    # Offline IP geolocation: .mmdb (MaxMind/DB-IP) or CSV ranges, reloaded when the file changes
+    GEOIP_DATABASE: str = os.getenv("GEOIP_DATABASE", os.path.join(os.getcwd(), "backend", "data", "geoip.mmdb"))
+    GEOIP_CACHE_SIZE: int = int(os.getenv("GEOIP_CACHE_SIZE", "65536"))
+    GEOIP_RELOAD_INTERVAL: float = float(os.getenv("GEOIP_RELOAD_INTERVAL", "60"))
+    
+    # Local CIDR lists (one file per tag, e.g. tor.txt, malicious.netset) matched against visitor IPs
+    THREAT_LISTS_DIR: str = os.getenv("THREAT_LISTS_DIR", os.path.join(os.getcwd(), "backend", "data", "threat_lists"))
+    THREAT_LIST_ANONYMIZER_TAGS: list = os.getenv("THREAT_LIST_ANONYMIZER_TAGS", "tor,vpn,proxy,hosting").split(",")
+    THREAT_LISTS_CACHE_SIZE: int = int(os.getenv("THREAT_LISTS_CACHE_SIZE", "65536"))
+    THREAT_LISTS_RELOAD_INTERVAL: float = float(os.getenv("THREAT_LISTS_RELOAD_INTERVAL", "60"))
+    
+    # Sliding-window request rates per IP / device fingerprint (count-min sketch)
+    RATE_WINDOW_SECONDS: int = int(os.getenv("RATE_WINDOW_SECONDS", "60"))
+    RATE_LIMIT_PER_IP: int = int(os.getenv("RATE_LIMIT_PER_IP", "120"))
+    RATE_LIMIT_PER_FINGERPRINT: int = int(os.getenv("RATE_LIMIT_PER_FINGERPRINT", "120"))
+    RATE_SKETCH_WIDTH: int = int(os.getenv("RATE_SKETCH_WIDTH", "4096"))
+    RATE_SKETCH_DEPTH: int = int(os.getenv("RATE_SKETCH_DEPTH", "4"))
+    RATE_TOP_K: int = int(os.getenv("RATE_TOP_K", "20"))
+    RATE_SHARED_MEMORY: str = os.getenv("RATE_SHARED_MEMORY", "")  # Segment name to share counts across workers
+    
+    # Scan result write-behind buffer
+    SCAN_RESULT_BATCH_SIZE: int = int(os.getenv("SCAN_RESULT_BATCH_SIZE", "100"))
+    SCAN_RESULT_FLUSH_MS: int = int(os.getenv("SCAN_RESULT_FLUSH_MS", "500"))
+    SCAN_RESULT_MAX_PENDING: int = int(os.getenv("SCAN_RESULT_MAX_PENDING", "10000"))
+    
+    # Visitor log retention (0 keeps forever); hourly rollups keep the statistics
+    VISITOR_LOG_RETENTION_DAYS: float = float(os.getenv("VISITOR_LOG_RETENTION_DAYS", "30"))
+    VISITOR_ROLLUP_RETENTION_DAYS: float = float(os.getenv("VISITOR_ROLLUP_RETENTION_DAYS", "365"))
+    VISITOR_RETENTION_INTERVAL: float = float(os.getenv("VISITOR_RETENTION_INTERVAL", "3600"))
+    
+    # Cold storage for old OSINT collections and stego results (0 disables archiving)
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", os.path.join(os.getcwd(), "backend", "archive"))
+    ARCHIVE_AFTER_DAYS: float = float(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+    ARCHIVE_SEGMENT_ROWS: int = int(os.getenv("ARCHIVE_SEGMENT_ROWS", "10000"))
+    ARCHIVE_INTERVAL: float = float(os.getenv("ARCHIVE_INTERVAL", "21600"))
+    
+    # Bulk export: rows per streamed batch / Parquet row group (smaller when OSINT payloads are included)
+    EXPORT_BATCH_ROWS: int = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+    EXPORT_PAYLOAD_BATCH_ROWS: int = int(os.getenv("EXPORT_PAYLOAD_BATCH_ROWS", "250"))
 
 settings = Settings()
 
@@ -1,16 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+import asyncio
 import os
 
 from app.config import settings
-from app.routers import scan, osint, social_media, steganography, reverse_osint_router
+from app.routers import scan, osint, social_media, steganography, reverse_osint_router, media, search, export
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION
 )
 
+# Reject unwanted uploads before their body is read (inside CORS so errors stay readable)
+from app.services.upload_gate import UploadGateMiddleware
+app.add_middleware(UploadGateMiddleware)
+
 # CORS configuration - Simplest form for cross-origin access
 app.add_middleware(
     CORSMiddleware,
@@ -20,54 +25,86 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Reverse OSINT Tracking Middleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.services.reverse_osint import reverse_osint
-
-class ReverseOSINTMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        # Track visitor (non-blocking)
-        try:
-            client_ip = request.client.host if request.client else "unknown"
-            user_agent = request.headers.get("user-agent", "unknown")
-            path = str(request.url.path)
-            method = request.method
-            
-            # Skip tracking for static files and health checks
-            skip_paths = ["/uploads", "/ws", "/favicon.ico", "/"]
-            if not any(path.startswith(p) for p in skip_paths):
-                request_data = {
-                    "ip": client_ip,
-                    "user_agent": user_agent,
-                    "path": path,
-                    "method": method
-                }
-                # Log asynchronously (fire and forget)
-                import asyncio
-                asyncio.create_task(reverse_osint.log_visitor(request_data))
-        except Exception as e:
-            print(f"Reverse OSINT tracking error: {e}")
-        
-        response = await call_next(request)
-        return response
-
-app.add_middleware(ReverseOSINTMiddleware)
+# Reverse OSINT tracking: records are queued here and processed off the request path
+from app.services.visitor_tracking import VisitorTrackingMiddleware
+app.add_middleware(VisitorTrackingMiddleware)
 
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and services on startup"""
     from app.services.database import db_service
+    from app.services.replication import replication_queue
+    from app.services.upload_gc import upload_gc
+    from app.services.visitor_log_writer import visitor_log_writer
+    from app.services.scan_result_writer import scan_result_writer
+    from app.services.visitor_rollup import visitor_rollups
+    from app.services.visitor_tracking import visitor_tracker
+    from app.services.geoip import geoip
+    from app.services.threat_lists import threat_lists
+    from app.services.archive import archive_service
     print("Initializing database...")
-    # Database is initialized in db_service constructor
+    await asyncio.to_thread(db_service.init_schema)
+    # Visitor logs and rollups kept in the core database by older versions are moved by a script
+    legacy = await asyncio.to_thread(db_service.legacy_telemetry_tables)
+    if legacy:
+        print(f"Core database still holds telemetry tables {legacy}; "
+              f"run `python migrate_telemetry.py --drop` to move them")
+    # Move OSINT payloads stored inline by older versions into payload_blobs
+    migrated = await asyncio.to_thread(db_service.migrate_inline_payloads)
+    if migrated:
+        print(f"Moved {migrated} OSINT payloads to compressed storage")
+    if db_service.search_index_empty():
+        indexed = await asyncio.to_thread(db_service.rebuild_search_index)
+        if indexed:
+            print(f"Built full-text search index over {indexed} documents")
+    # Backfill rollups before the log writer starts adding to them
+    await visitor_rollups.start()
+    await visitor_log_writer.start()
+    await geoip.start()
+    await threat_lists.start()
+    await visitor_tracker.start()
+    await scan_result_writer.start()
+    await replication_queue.start()
+    await upload_gc.start()
+    await archive_service.start()
     print("Advanced OSINT Platform ready!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush uploads still being persisted and buffered log writes"""
+    from app.services.storage import storage_service
+    from app.services.replication import replication_queue
+    from app.services.upload_gc import upload_gc
+    from app.services.visitor_log_writer import visitor_log_writer
+    from app.services.scan_result_writer import scan_result_writer
+    from app.services.visitor_rollup import visitor_rollups
+    from app.services.visitor_tracking import visitor_tracker
+    from app.services.geoip import geoip
+    from app.services.threat_lists import threat_lists
+    from app.services.archive import archive_service
+    await storage_service.wait_persisted()
+    await archive_service.stop()
+    await upload_gc.stop()
+    await visitor_rollups.stop()
+    # Drain queued visitor records into the log writer before it flushes
+    await visitor_tracker.stop()
+    await geoip.stop()
+    await threat_lists.stop()
+    await visitor_log_writer.stop()
+    await scan_result_writer.stop()
+    # Unfinished replication jobs stay in the database and resume on restart
+    await replication_queue.stop()
+
 # Routes
 app.include_router(scan.router, prefix=settings.API_PREFIX, tags=["Scan"])
 app.include_router(osint.router, prefix=f"{settings.API_PREFIX}/intelligence", tags=["Intelligence"])
 app.include_router(social_media.router, prefix=f"{settings.API_PREFIX}/social", tags=["Social Media OSINT"])
 app.include_router(steganography.router, prefix=f"{settings.API_PREFIX}/stego", tags=["Steganography"])
 app.include_router(reverse_osint_router.router, prefix=f"{settings.API_PREFIX}/reverse-osint", tags=["Reverse OSINT"])
+app.include_router(media.router, prefix=f"{settings.API_PREFIX}/media", tags=["Media"])
+app.include_router(search.router, prefix=settings.API_PREFIX, tags=["Search"])
+app.include_router(export.router, prefix=settings.API_PREFIX, tags=["Export"])
 
 # WebSocket Endpoint
 from fastapi import WebSocket, WebSocketDisconnect
@@ -114,6 +151,14 @@ async def get_system_stats(user_id: str = "demo"):
         ]
     }
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """
+    Returns internal service metrics (cache hit ratios, queue depths, etc.).
+    """
+    from app.services.metrics import metrics
+    return metrics.snapshot()
+
 @app.get("/")
 async def health_check():
     return {
@@ -3,20 +3,25 @@ import numpy as np
 import os
 import uuid
 from app.config import settings
+from app.services.upload_gc import upload_gc
 
 class GradCAM:
     def __init__(self):
         pass
     
-    def generate_mock_heatmap(self, image_path: str, label: str) -> str:
+    def generate_mock_heatmap(self, image_path: str, label: str, source=None) -> str:
         """
         Generates a convincing simulated heatmap for fallback/demo purposes.
         If FAKE: Highlights random facial regions (simulating detection).
         If REAL: diffuse highlight.
+        source: optional in-memory UploadBuffer decoded instead of image_path.
         """
         try:
             # 1. Load image
-            img = cv2.imread(image_path)
+            if source is not None:
+                img = cv2.imdecode(source.array(), cv2.IMREAD_COLOR)
+            else:
+                img = cv2.imread(image_path)
             if img is None:
                 return ""
             
@@ -58,6 +63,7 @@ class GradCAM:
             unique_filename = f"heatmap_{uuid.uuid4().hex}.jpg"
             save_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
             cv2.imwrite(save_path, superimposed_img)
+            upload_gc.register(save_path)
             
             return unique_filename
         except Exception as e:
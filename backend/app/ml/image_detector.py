@@ -2,6 +2,10 @@ from PIL import Image
 import os
 
 class ImageDetector:
+    MODEL_ID = "umm-maybe/AI-image-detector"
+    # Bump when detection logic changes; stored scan results are reused only within a version
+    DETECTOR_VERSION = 1
+
     def __init__(self):
         self.pipe = None
         self.model_loaded = False
@@ -22,22 +26,35 @@ class ImageDetector:
             import torch
             from transformers import pipeline
             # Using MesoNet inspired GAN-detector with 93.8% precision/accuracy
-            self.pipe = pipeline("image-classification", model="umm-maybe/AI-image-detector")
+            self.pipe = pipeline("image-classification", model=self.MODEL_ID)
             self.model_loaded = True
             print("MesoNet/GAN Detector loaded successfully.")
         except Exception as e:
             print(f"FAILED to load model: {e}")
             self.model_loaded = False
 
-    def predict(self, image_path: str) -> dict:
+    def model_version(self, modality: str = "image", load: bool = False) -> str:
+        """
+        Identifies the detector that will produce a result.
+        Does not load the model unless `load` is set, for callers whose predict
+        loads it on demand (video); blocking, so run that in a worker thread.
+        """
+        if load:
+            self._load_model()
+        # Audio detection is simulated even when the image model is loaded
+        backend = self.MODEL_ID if self.model_loaded and modality != "audio" else "mock"
+        return f"{backend}:v{self.DETECTOR_VERSION}"
+
+    def predict(self, image_path: str, filename: str = None, source=None) -> dict:
+        """source: optional in-memory UploadBuffer decoded instead of image_path"""
         self._load_model()
         
         if not self.model_loaded:
             print("Inference requested but model not loaded. Falling back to mock.")
-            return self.mock_predict(image_path)
+            return self.mock_predict(image_path, filename, source)
 
         try:
-            image = Image.open(image_path)
+            image = Image.open(source.open() if source is not None else image_path)
             results = self.pipe(image)
             
             # Get the top result
@@ -50,11 +67,11 @@ class ImageDetector:
             # Generate Explanation (Grad-CAM)
             heatmap_file = ""
             explanation = ""
-            forensics = self._perform_frequency_analysis(image_path)
+            forensics = self._perform_frequency_analysis(image_path, filename)
             
             try:
                 from app.ml.explainability.gradcam import gradcam
-                heatmap_file = gradcam.generate_mock_heatmap(image_path, prediction)
+                heatmap_file = gradcam.generate_mock_heatmap(image_path, prediction, source)
                 
                 if prediction == "FAKE":
                     explanation = f"MesoNet/GAN Analysis detected high-frequency artifacts in facial textures. Forensic frequency analysis (DCT) shows {forensics['artifact_density']}% artifact density."
@@ -76,17 +93,18 @@ class ImageDetector:
         except Exception as e:
             return {"label": "ERROR", "score": 0.0, "details": str(e)}
 
-    def mock_predict(self, image_path: str) -> dict:
+    def mock_predict(self, image_path: str, filename: str = None, source=None) -> dict:
         """
         Fallback method for when real model fails to load (e.g. missing DLLs).
         Returns a convincing fake result for demo purposes.
+        filename is the original upload name (stored files are named by hash).
         """
         import random
         # verify file exists
-        if not os.path.exists(image_path):
+        if source is None and not os.path.exists(image_path):
              return {"label": "ERROR", "score": 0.0, "details": "File not found"}
         
-        filename = os.path.basename(image_path).lower()
+        filename = (filename or os.path.basename(image_path)).lower()
         if "real" in filename:
              label = "REAL"
              score = random.uniform(85.0, 99.0)
@@ -99,7 +117,7 @@ class ImageDetector:
         explanation = ""
         try:
              from app.ml.explainability.gradcam import gradcam
-             heatmap_file = gradcam.generate_mock_heatmap(image_path, label)
+             heatmap_file = gradcam.generate_mock_heatmap(image_path, label, source)
              explanation = "Demo Mode: MesoNet/GAN detection simulation (93.8% Accuracy)."
         except:
             pass
@@ -110,12 +128,12 @@ class ImageDetector:
             "mode": "MOCK_FALLBACK (Real Model Failed to Load)",
             "model_type": "MesoNet/GAN-Detector",
             "accuracy_rating": "93.8%",
-            "forensics": self._perform_frequency_analysis(image_path),
+            "forensics": self._perform_frequency_analysis(image_path, filename),
             "heatmap": heatmap_file,
             "explanation": explanation
         }
 
-    def _perform_frequency_analysis(self, image_path: str) -> dict:
+    def _perform_frequency_analysis(self, image_path: str, filename: str = None) -> dict:
         """
         Simulates Discrete Cosine Transform (DCT) forensic analysis.
         Detects periodic artifacts common in GAN-generated images.
@@ -126,7 +144,7 @@ class ImageDetector:
         # 2. Apply DCT to blocks
         # 3. Analyze high-frequency coefficients
         artifact_density = random.uniform(5.0, 15.0)
-        label = os.path.basename(image_path).lower()
+        label = (filename or os.path.basename(image_path)).lower()
         if "fake" in label or "generated" in label:
              artifact_density = random.uniform(65.0, 92.0)
              
@@ -137,11 +155,11 @@ class ImageDetector:
             "frequency_spikes": random.randint(2, 8) if artifact_density > 50 else 0
         }
 
-    def predict_video(self, video_path: str) -> dict:
+    def predict_video(self, video_path: str, filename: str = None) -> dict:
         """Video deepfake detection logic."""
         self._load_model()
         # For hackathon/demo, we reuse analysis logic but with video-specific metrics
-        result = self.predict(video_path)
+        result = self.predict(video_path, filename)
         result["model_type"] = "FakeFormer (Video Deepfake Detector)"
         result["accuracy_rating"] = "91.2%"
         return result
@@ -0,0 +1,177 @@
+"""
+SPAM (Subtractive Pixel Adjacency Matrix) steganalysis features.
+
+First-order SPAM: pixel differences are taken in 8 directions, truncated to
+[-T, T] and modelled as a Markov chain. The transition matrices of the 4
+straight and the 4 diagonal directions are averaged, giving
+2 * (2T + 1)^2 features (98 for T = 3). Counting is a single np.bincount
+over combined (d_k, d_k+1) indices per direction; the opposite direction
+is derived from the same counts, so only 4 passes over the image are made.
+A 12 MP RGB image takes well under 0.5 s on one core
+(see benchmark_spam_features.py).
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+SPAM_T = 3
+SPAM_BINS = 2 * SPAM_T + 1
+SPAM_FEATURE_LENGTH = 2 * SPAM_BINS * SPAM_BINS
+
+
+def _to_gray(img_array: np.ndarray) -> np.ndarray:
+    """Integer luma (ITU-R 601 weights / 256) as int16"""
+    if img_array.ndim == 2:
+        return img_array.astype(np.int16)
+    rgb = img_array[:, :, :3].astype(np.uint16)
+    gray = rgb[:, :, 0] * 77
+    gray += rgb[:, :, 1] * 150
+    gray += rgb[:, :, 2] * 29
+    gray >>= 8
+    return gray.astype(np.int16)
+
+
+def _shifted_differences(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """a - b truncated to [-T, T] and shifted to [0, 2T] as uint8"""
+    d = np.subtract(a, b)
+    np.clip(d, -SPAM_T, SPAM_T, out=d)
+    d += SPAM_T
+    return d.astype(np.uint8)
+
+
+def _transition_counts(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """
+    Joint counts of consecutive shifted differences along one direction.
+
+    Returns a (BINS, BINS) matrix C[d1, d2]. Combined indices fit in one
+    byte, so pairs of them are reinterpreted as uint16 and counted with a
+    single 65536-bin np.bincount over half as many elements; both bytes'
+    marginals are then summed back into the 49 transition bins.
+    """
+    combined = first * np.uint8(SPAM_BINS)
+    combined += second
+    flat = combined.ravel()
+    even = flat.size // 2 * 2
+    packed = np.bincount(flat[:even].view(np.uint16), minlength=1 << 16).reshape(256, 256)
+    n = SPAM_BINS * SPAM_BINS
+    counts = packed.sum(axis=0)[:n] + packed.sum(axis=1)[:n]
+    if even < flat.size:
+        counts[flat[-1]] += 1
+    return counts.reshape(SPAM_BINS, SPAM_BINS).astype(np.float64)
+
+
+def _conditional(counts: np.ndarray) -> np.ndarray:
+    """Row-normalize joint counts into P(d2 | d1)"""
+    totals = counts.sum(axis=1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+
+
+def extract_spam_features(img_array: np.ndarray) -> np.ndarray:
+    """
+    Compute the 98-dimensional first-order SPAM feature vector.
+
+    Args:
+        img_array: Grayscale (H, W), palette-index (H, W) or RGB (H, W, 3) array
+
+    Returns:
+        float32 array of length SPAM_FEATURE_LENGTH (zeros for images < 3x3)
+    """
+    x = _to_gray(img_array)
+    if x.shape[0] < 3 or x.shape[1] < 3:
+        return np.zeros(SPAM_FEATURE_LENGTH, dtype=np.float32)
+
+    # Forward directions; each yields its reverse by flipping the matrix, since
+    # reversing a path negates the differences and swaps their order:
+    # C_reverse[a, b] = C_forward[-b, -a]  ->  C_forward[::-1, ::-1].T
+    # Each difference array is computed once and paired with its successor
+    d = _shifted_differences(x[:, :-1], x[:, 1:])
+    horizontal = _transition_counts(d[:, :-1], d[:, 1:])
+    d = _shifted_differences(x[:-1, :], x[1:, :])
+    vertical = _transition_counts(d[:-1, :], d[1:, :])
+    d = _shifted_differences(x[:-1, :-1], x[1:, 1:])
+    diagonal = _transition_counts(d[:-1, :-1], d[1:, 1:])
+    d = _shifted_differences(x[:-1, 1:], x[1:, :-1])
+    anti_diagonal = _transition_counts(d[:-1, 1:], d[1:, :-1])
+
+    def with_reverse(counts: np.ndarray):
+        return _conditional(counts), _conditional(counts[::-1, ::-1].T)
+
+    straight = np.mean([*with_reverse(horizontal), *with_reverse(vertical)], axis=0)
+    diagonals = np.mean([*with_reverse(diagonal), *with_reverse(anti_diagonal)], axis=0)
+    return np.concatenate([straight.ravel(), diagonals.ravel()]).astype(np.float32)
+
+
+class SpamClassifier:
+    """
+    Logistic-regression scorer over SPAM features.
+
+    Weights live in an .npz file with arrays "weights", "bias" and optionally
+    "mean"/"scale" for feature standardization. Without a model file the
+    classifier reports itself as not loaded and score() returns None.
+    """
+
+    def __init__(self, model_path: Optional[str] = None):
+        self.model_path = model_path or os.getenv("STEGO_SPAM_MODEL", "")
+        self.weights: Optional[np.ndarray] = None
+        self.bias = 0.0
+        self.mean: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self.model_loaded = False
+        if self.model_path and os.path.exists(self.model_path):
+            self.load(self.model_path)
+
+    def load(self, path: str):
+        try:
+            data = np.load(path)
+            weights = data["weights"].astype(np.float64).ravel()
+            if weights.shape != (SPAM_FEATURE_LENGTH,):
+                raise ValueError(f"expected {SPAM_FEATURE_LENGTH} weights, got {weights.shape[0]}")
+            self.weights = weights
+            self.bias = float(data["bias"])
+            self.mean = data["mean"] if "mean" in data else None
+            self.scale = data["scale"] if "scale" in data else None
+            self.model_loaded = True
+        except Exception as e:
+            print(f"Failed to load SPAM model from {path}: {e}")
+            self.model_loaded = False
+
+    def _standardize(self, features: np.ndarray) -> np.ndarray:
+        x = np.asarray(features, dtype=np.float64)
+        if self.mean is not None:
+            x = x - self.mean
+        if self.scale is not None:
+            x = x / np.where(self.scale > 0, self.scale, 1.0)
+        return x
+
+    def score(self, features: np.ndarray) -> Optional[float]:
+        """Probability (0-1) that the image carries an embedded payload"""
+        if not self.model_loaded:
+            return None
+        z = float(self._standardize(features) @ self.weights + self.bias)
+        return float(1.0 / (1.0 + np.exp(-z)))
+
+    def fit(self, features: np.ndarray, labels: np.ndarray, epochs: int = 500,
+            learning_rate: float = 0.1, l2: float = 1e-3):
+        """Train with batch gradient descent (labels: 1 = stego, 0 = cover)"""
+        x = np.asarray(features, dtype=np.float64)
+        y = np.asarray(labels, dtype=np.float64)
+        self.mean = x.mean(axis=0)
+        self.scale = x.std(axis=0)
+        x = self._standardize(x)
+        w = np.zeros(x.shape[1])
+        b = 0.0
+        for _ in range(epochs):
+            p = 1.0 / (1.0 + np.exp(-(x @ w + b)))
+            error = p - y
+            w -= learning_rate * (x.T @ error / len(y) + l2 * w)
+            b -= learning_rate * error.mean()
+        self.weights, self.bias, self.model_loaded = w, b, True
+
+    def save(self, path: str):
+        np.savez(path, weights=self.weights, bias=self.bias, mean=self.mean, scale=self.scale)
+
+
+# Global instance
+spam_classifier = SpamClassifier()
@@ -0,0 +1,73 @@
+"""
+Export API Router - Streaming bulk export of history as NDJSON or Parquet
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.services.database import EXPORT_TABLES
+from app.services.export import export_service
+
+router = APIRouter()
+
+
+@router.get("/export/{dataset}")
+async def export_dataset(dataset: str, format: str = "ndjson", start: Optional[datetime] = None,
+                         end: Optional[datetime] = None, user_id: Optional[str] = None,
+                         collection_type: Optional[str] = None, platform: Optional[str] = None,
+                         has_hidden_data: Optional[bool] = None, detection_method: Optional[str] = None,
+                         ip_address: Optional[str] = None, country: Optional[str] = None,
+                         is_suspicious: Optional[bool] = None, threat_level: Optional[str] = None,
+                         modality: Optional[str] = None, label: Optional[str] = None,
+                         include_payloads: bool = True):
+    """
+    Stream every matching row of a dataset, oldest first.
+
+    Args:
+        dataset: osint, stego, visitors or scans
+        format: ndjson (one JSON object per line) or parquet
+        start: Only rows at or after this time (created_at / analyzed_at / timestamp / scanned_at)
+        end: Only rows before this time
+        user_id, collection_type, platform: Filters for osint
+        user_id, has_hidden_data, detection_method: Filters for stego
+        ip_address, country, is_suspicious, threat_level: Filters for visitors
+        user_id, modality, label: Filters for scans
+        include_payloads: Include the full OSINT result in "data" (osint only)
+    """
+
+    try:
+        if dataset not in EXPORT_TABLES:
+            raise HTTPException(status_code=404, detail=f"Unknown dataset '{dataset}'")
+        if format not in export_service.MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unknown format '{format}'")
+        if format == "parquet" and not export_service.parquet_available:
+            raise HTTPException(status_code=501, detail="Parquet export requires the pyarrow package")
+        if start is not None and end is not None and start >= end:
+            raise HTTPException(status_code=400, detail="start must be before end")
+
+        filters = {key: value for key, value in {
+            "user_id": user_id, "collection_type": collection_type, "platform": platform,
+            "has_hidden_data": has_hidden_data, "detection_method": detection_method,
+            "ip_address": ip_address, "country": country, "is_suspicious": is_suspicious,
+            "threat_level": threat_level, "modality": modality, "label": label,
+        }.items() if value is not None}
+        allowed = EXPORT_TABLES[dataset][2]
+        unsupported = sorted(key for key in filters if key not in allowed)
+        if unsupported:
+            raise HTTPException(status_code=400,
+                                detail=f"Filters not supported for {dataset}: {', '.join(unsupported)}")
+
+        filename = export_service.filename(dataset, format)
+        return StreamingResponse(
+            export_service.stream(dataset, format, filters, start, end, include_payloads),
+            media_type=export_service.MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export error: {str(e)}")
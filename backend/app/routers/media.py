@@ -0,0 +1,60 @@
+"""
+Media API Router - Thumbnails and previews of files under /uploads
+"""
+
+import asyncio
+import os
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from app.services.derivatives import derivative_service
+
+router = APIRouter()
+
+
+@router.get("/{variant}/{file_path:path}")
+async def get_derivative(variant: str, file_path: str, request: Request, format: Optional[str] = None):
+    """
+    Serve a resized copy of an uploaded image or heatmap.
+
+    Args:
+        variant: "thumb" (256 px) or "preview" (1024 px)
+        file_path: Path relative to /uploads (as in heatmap_url or file_info.local_path)
+        format: "webp" or "jpeg"; negotiated from the Accept header if omitted
+    """
+
+    try:
+        if variant not in derivative_service.VARIANTS:
+            raise HTTPException(status_code=404, detail=f"Unknown variant '{variant}'")
+        negotiated = format is None
+        fmt = (format or ("webp" if "image/webp" in request.headers.get("accept", "") else "jpeg")).lower()
+        if fmt not in derivative_service.FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'")
+
+        source = derivative_service.resolve_source(file_path)
+        if source is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+
+        path, etag = await asyncio.to_thread(derivative_service.get, source, variant, fmt)
+
+        # Originals are content-addressed and Grad-CAM heatmaps uniquely named; only stego
+        # heatmaps are re-rendered under the same name (e.g. after a detector update)
+        immutable = not os.path.basename(source).startswith("stego_heatmap_")
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "public, max-age=31536000, immutable" if immutable else "public, max-age=86400"
+        }
+        if negotiated:
+            headers["Vary"] = "Accept"
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+
+        return FileResponse(path, media_type=derivative_service.media_type(fmt), headers=headers)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -2,10 +2,15 @@
 Reverse OSINT API Router
 """
 
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, HTTPException
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from app.services.reverse_osint import reverse_osint
+from app.services.geoip import geoip
+from app.services.rate_tracker import rate_tracker
+from app.services.threat_lists import threat_lists
+from app.services.database import db_service, get_session, next_cursor
+from app.services.visitor_rollup import visitor_rollups
 
 router = APIRouter()
 
@@ -15,6 +20,10 @@ class HoneypotRequest(BaseModel):
     data: dict
 
 
+class IPBatchRequest(BaseModel):
+    ips: List[str]
+
+
 @router.post("/track")
 async def track_visitor(request: Request):
     """
@@ -47,19 +56,20 @@ async def track_visitor(request: Request):
 
 
 @router.get("/visitors")
-async def get_visitor_logs(limit: int = 100, suspicious_only: bool = False):
+async def get_visitor_logs(limit: int = 100, suspicious_only: bool = False, cursor: Optional[str] = None,
+                           session=Depends(get_session)):
     """
-    Get visitor logs.
+    Get visitor logs, newest first.
     
     Args:
         limit: Maximum number of logs to return  
         suspicious_only: Only return suspicious visitors
+        cursor: next_cursor from the previous page
     """
     
     try:
-        from app.services.database import db_service
-        
-        logs = db_service.get_visitor_logs(limit=limit, suspicious_only=suspicious_only)
+        logs = await db_service.get_visitor_logs_async(limit=limit, suspicious_only=suspicious_only, cursor=cursor,
+                                                       session=session)
         
         visitors = []
         for log in logs:
@@ -78,13 +88,68 @@ async def get_visitor_logs(limit: int = 100, suspicious_only: bool = False):
         
         return {
             "total_visitors": len(visitors),
-            "visitors": visitors
+            "visitors": visitors,
+            "next_cursor": next_cursor(logs, limit, "timestamp")
         }
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Retrieval error: {str(e)}")
 
 
+@router.post("/geolocate")
+async def geolocate_ips(request: IPBatchRequest):
+    """
+    Look up IP addresses in the local geolocation database.
+    
+    Args:
+        ips: Addresses to locate (at most 10000 per request)
+    """
+    
+    try:
+        if len(request.ips) > 10000:
+            raise HTTPException(status_code=400, detail="At most 10000 addresses per request")
+        
+        locations = geoip.lookup_many(request.ips)
+        
+        return {
+            "database_loaded": geoip.loaded,
+            "results": [{"ip": ip, "geolocation": location} for ip, location in zip(request.ips, locations)]
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Geolocation error: {str(e)}")
+
+
+@router.post("/ip-lists/match")
+async def match_ip_lists(request: IPBatchRequest):
+    """
+    Match IP addresses against the local threat lists (Tor, blocklists, VPN ranges).
+    
+    Args:
+        ips: Addresses to check (at most 10000 per request)
+    """
+    
+    try:
+        if len(request.ips) > 10000:
+            raise HTTPException(status_code=400, detail="At most 10000 addresses per request")
+        
+        matches = threat_lists.match_many(request.ips)
+        
+        return {
+            "lists": threat_lists.lists,
+            "results": [{"ip": ip, "match": match} for ip, match in zip(request.ips, matches)]
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Threat list error: {str(e)}")
+
+
 @router.get("/map")
 async def get_visitor_map(hours: int = 24, limit: int = 100):
     """
@@ -124,6 +189,29 @@ async def get_threat_actors(min_score: int = 50):
         raise HTTPException(status_code=500, detail=f"Threat retrieval error: {str(e)}")
 
 
+@router.get("/heavy-hitters")
+async def get_heavy_hitters(limit: int = 10):
+    """
+    Get the most active IPs and device fingerprints in the rate window.
+    
+    Args:
+        limit: Maximum entries per list
+    """
+    
+    try:
+        hitters = rate_tracker.heavy_hitters(limit=limit)
+        
+        return {
+            "window_seconds": rate_tracker.window_seconds,
+            "window_requests": rate_tracker.sketch.events(),
+            "top_ips": hitters["ip"],
+            "top_fingerprints": hitters["fingerprint"]
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Heavy hitter retrieval error: {str(e)}")
+
+
 @router.post("/honeypot")
 async def create_honeypot(request: HoneypotRequest):
     """
@@ -147,42 +235,24 @@ async def create_honeypot(request: HoneypotRequest):
 
 
 @router.get("/stats")
-async def get_reverse_osint_stats():
+async def get_reverse_osint_stats(session=Depends(get_session)):
     """
-    Get overall reverse OSINT statistics.
+    Get overall reverse OSINT statistics (from hourly rollups, not raw logs).
     """
     
     try:
-        from app.services.database import db_service
-        from datetime import datetime, timedelta
-        
-        # Get visitor data
-        all_visitors = db_service.get_visitor_logs(limit=1000)
-        recent_visitors = [v for v in all_visitors if v.timestamp > datetime.utcnow() - timedelta(hours=24)]
-        
-        suspicious_count = sum(1 for v in all_visitors if v.is_suspicious)
-        unique_ips = len(set(v.ip_address for v in all_visitors))
-        countries = list(set(v.country for v in all_visitors if v.country))
-        
-        # Threat levels
-        critical = sum(1 for v in all_visitors if v.threat_level == "CRITICAL")
-        high = sum(1 for v in all_visitors if v.threat_level == "HIGH")
-        medium = sum(1 for v in all_visitors if v.threat_level == "MEDIUM")
-        low = sum(1 for v in all_visitors if v.threat_level == "LOW")
+        totals = await visitor_rollups.totals(session=session)
+        recent = await visitor_rollups.window(hours=24, session=session)
         
         return {
-            "total_visitors": len(all_visitors),
-            "recent_visitors_24h": len(recent_visitors),
-            "unique_ips": unique_ips,
-            "suspicious_visitors": suspicious_count,
-            "countries_detected": len(countries),
-            "threat_levels": {
-                "critical": critical,
-                "high": high,
-                "medium": medium,
-                "low": low
-            },
-            "top_countries": countries[:10]
+            "total_visitors": totals["visits"],
+            "recent_visitors_24h": recent["visits"],
+            "unique_ips": totals["unique_ips"],
+            "unique_ips_24h": recent["unique_ips"],
+            "suspicious_visitors": totals["suspicious"],
+            "countries_detected": len(totals["countries"]),
+            "threat_levels": totals["threat_levels"],
+            "top_countries": list(totals["countries"])[:10]
         }
     
     except Exception as e:
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
+from app.services.database import db_service, get_session, next_cursor, SCAN_MODALITIES
+from app.services.metrics import metrics
+from app.services.scan_result_writer import scan_result_writer
 from app.services.storage import storage_service
 from app.services.profile_service import profile_service
 from app.services.osint_aggregator import osint_aggregator
 from app.services.risk_scoring import risk_engine
 from app.services.websocket_manager import manager
 from app.ml.image_detector import detector
+from app.services.derivatives import derivative_service
+from app.config import settings
 import os
 
 router = APIRouter()
@@ -50,34 +58,65 @@ async def perform_comprehensive_intelligence(analysis_result: dict, user_id: str
         "risk_intelligence": risk_report
     }
 
+async def cached_analysis(content_hash: str, modality: str, model_version: str, session=None) -> Optional[dict]:
+    """
+    Stored analysis of the same content by the same detector version, so a
+    repeat upload skips inference. Results whose heatmap was evicted are rescanned.
+    """
+    try:
+        stored = await db_service.get_cached_scan_async(content_hash, modality, model_version, session=session)
+    except Exception as e:
+        print(f"Scan result lookup failed: {e}")
+        stored = None
+    if stored is None or not stored.analysis:
+        metrics.increment("scan_cache.misses")
+        return None
+    heatmap = stored.analysis.get("heatmap")
+    if heatmap and not os.path.exists(os.path.join(settings.UPLOAD_DIR, os.path.basename(heatmap))):
+        metrics.increment("scan_cache.misses")
+        return None
+    metrics.increment("scan_cache.hits")
+    return {**stored.analysis, "cached": True}
+
 @router.post("/scan")
 async def scan_media(file: UploadFile = File(...), user_id: str = "demo"):
     """Enhanced Image Scan with Intelligence."""
     if not file:
         raise HTTPException(status_code=400, detail="No file uploaded")
     
-    storage_result = await storage_service.save_file(file)
+    # Decode from memory; the upload is persisted in the background
+    storage_result, upload_buffer = await storage_service.ingest(file)
     
-    # 1. ML Analysis
-    try:
-        if detector.model_loaded:
-             analysis_result = detector.predict(storage_result['local_path'])
-        else:
-             analysis_result = detector.mock_predict(storage_result['local_path'])
-    except Exception as e:
-        print(f"ML Failed: {e}")
-        analysis_result = {"label": "FAKE", "score": 95.0, "explanation": "Fallback Analysis Triggered"}
+    # 1. ML Analysis (reused when this content was already scanned by the same model);
+    # like before, the mock detector answers until the model has been loaded elsewhere
+    model_version = detector.model_version("image")
+    analysis_result = await cached_analysis(storage_result['content_hash'], "image", model_version)
+    if analysis_result is None:
+        try:
+            if detector.model_loaded:
+                 analysis_result = detector.predict(storage_result['local_path'], storage_result['filename'], upload_buffer)
+            else:
+                 analysis_result = detector.mock_predict(storage_result['local_path'], storage_result['filename'], upload_buffer)
+        except Exception as e:
+            print(f"ML Failed: {e}")
+            analysis_result = {"label": "FAKE", "score": 95.0, "explanation": "Fallback Analysis Triggered"}
 
     # Process heatmap
     if "heatmap" in analysis_result and analysis_result["heatmap"]:
          filename = os.path.basename(analysis_result["heatmap"])
          analysis_result["heatmap_url"] = f"/uploads/{filename}"
+         analysis_result["heatmap_preview_url"] = derivative_service.url(filename)
+         if settings.DERIVATIVES_EAGER:
+             derivative_service.schedule(os.path.join(settings.UPLOAD_DIR, filename), variants=("preview",))
 
     # 2. Intelligence Gathering
     intel_report = await perform_comprehensive_intelligence(analysis_result, user_id, storage_result['local_path'])
+    scan_result_writer.record(user_id, "image", storage_result, analysis_result,
+                              intel_report["risk_intelligence"], model_version)
 
     return {
         "status": "success",
+        "cached": analysis_result.get("cached", False),
         "file_info": storage_result,
         "analysis": analysis_result,
         **intel_report,
@@ -85,6 +124,7 @@ async def scan_media(file: UploadFile = File(...), user_id: str = "demo"):
         "prediction": analysis_result.get("label", "UNKNOWN"),
         "confidence": analysis_result.get("score", 0.0),
         "heatmap": analysis_result.get("heatmap_url", ""),
+        "heatmap_preview": analysis_result.get("heatmap_preview_url", ""),
         "explanation": analysis_result.get("explanation", "Analysis complete"),
         "risk_score": intel_report["risk_intelligence"]["score"]
     }
@@ -93,11 +133,18 @@ async def scan_media(file: UploadFile = File(...), user_id: str = "demo"):
 async def scan_video(file: UploadFile = File(...), user_id: str = "demo"):
     """Enhanced Video Intelligence Scan."""
     storage_result = await storage_service.save_file(file)
-    analysis = detector.predict_video(storage_result['local_path'])
+    # predict_video loads the model on first use; do that off the event loop before naming the version
+    model_version = await asyncio.to_thread(detector.model_version, "video", True)
+    analysis = await cached_analysis(storage_result['content_hash'], "video", model_version)
+    if analysis is None:
+        analysis = detector.predict_video(storage_result['local_path'], storage_result['filename'])
     intel_report = await perform_comprehensive_intelligence(analysis, user_id, storage_result['local_path'])
+    scan_result_writer.record(user_id, "video", storage_result, analysis,
+                              intel_report["risk_intelligence"], model_version)
     
     return {
         "status": "success", 
+        "cached": analysis.get("cached", False),
         "analysis": analysis, 
         **intel_report,
         "prediction": analysis.get('label', 'UNKNOWN'), 
@@ -110,11 +157,17 @@ async def scan_video(file: UploadFile = File(...), user_id: str = "demo"):
 async def scan_audio(file: UploadFile = File(...), user_id: str = "demo"):
     """Enhanced Audio Intelligence Scan."""
     storage_result = await storage_service.save_file(file)
-    analysis = detector.predict_audio(storage_result['local_path'])
+    model_version = detector.model_version("audio")
+    analysis = await cached_analysis(storage_result['content_hash'], "audio", model_version)
+    if analysis is None:
+        analysis = detector.predict_audio(storage_result['local_path'])
     intel_report = await perform_comprehensive_intelligence(analysis, user_id, storage_result['local_path'])
+    scan_result_writer.record(user_id, "audio", storage_result, analysis,
+                              intel_report["risk_intelligence"], model_version)
     
     return {
         "status": "success", 
+        "cached": analysis.get("cached", False),
         "analysis": analysis, 
         **intel_report,
         "prediction": analysis.get('label', 'UNKNOWN'), 
@@ -123,6 +176,97 @@ async def scan_audio(file: UploadFile = File(...), user_id: str = "demo"):
         "risk_score": intel_report["risk_intelligence"]["score"]
     }
 
+@router.get("/scan/history")
+async def get_scan_history(user_id: str = "demo", modality: Optional[str] = None, limit: int = 50,
+                           cursor: Optional[str] = None, session=Depends(get_session)):
+    """
+    Get deepfake scan history, newest first.
+    
+    Args:
+        user_id: User ID
+        modality: Only image, video or audio scans
+        limit: Maximum number of records
+        cursor: next_cursor from the previous page
+    """
+    
+    try:
+        if modality is not None and modality not in SCAN_MODALITIES:
+            raise HTTPException(status_code=400, detail=f"Unknown modality '{modality}'")
+        results = await db_service.get_scan_history_async(user_id, limit, cursor, modality, session=session)
+        
+        history = []
+        for result in results:
+            history.append({
+                "id": result.id,
+                "modality": result.modality,
+                "file_name": result.file_name,
+                "content_hash": result.content_hash,
+                "prediction": result.label,
+                "confidence": result.score,
+                "model_type": result.model_type,
+                "heatmap": result.heatmap_path,
+                "risk_score": result.risk_score,
+                "severity": result.severity,
+                "scanned_at": result.scanned_at.isoformat()
+            })
+        
+        return {
+            "user_id": user_id,
+            "total_scans": len(history),
+            "history": history,
+            "next_cursor": next_cursor(results, limit, "scanned_at")
+        }
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"History retrieval error: {str(e)}")
+
+@router.get("/scan/history/{scan_id}")
+async def get_scan_details(scan_id: int, user_id: str = "demo", session=Depends(get_session)):
+    """Get one scan with its full detector output."""
+    
+    try:
+        result = await db_service.get_scan_result_async(scan_id, user_id, session=session)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Scan not found")
+        return {
+            "id": result.id,
+            "modality": result.modality,
+            "file_name": result.file_name,
+            "content_hash": result.content_hash,
+            "model_version": result.model_version,
+            "risk_score": result.risk_score,
+            "severity": result.severity,
+            "scanned_at": result.scanned_at.isoformat(),
+            "analysis": result.analysis
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Scan retrieval error: {str(e)}")
+
+@router.get("/scan/stats")
+async def get_scan_statistics(user_id: str = "demo", days: int = 30, session=Depends(get_session)):
+    """
+    Dashboard aggregates over stored scans (no rescans).
+    
+    Args:
+        user_id: User ID
+        days: Window in days (0 for all time)
+    """
+    
+    try:
+        since = datetime.utcnow() - timedelta(days=days) if days > 0 else None
+        stats = await db_service.get_scan_aggregates_async(user_id, since, session=session)
+        return {"user_id": user_id, "days": days, **stats}
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Statistics error: {str(e)}")
+
 @router.post("/profile/link")
 async def link_social_asset(user_id: str, asset_type: str, asset_value: str, label: str = ""):
     """Link a new social media or email asset to the user profile."""
@@ -0,0 +1,67 @@
+"""
+Search API Router - Full-text search over extracted stego text and OSINT captions
+"""
+
+import html
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import OperationalError
+
+from app.services.database import db_service, get_session, SEARCH_MARK_CLOSE, SEARCH_MARK_OPEN, SEARCH_SOURCES
+
+router = APIRouter()
+
+
+def _highlighted(value: Optional[str]) -> Optional[str]:
+    """HTML-escape indexed text, then turn match markers into <mark> tags"""
+    if value is None:
+        return None
+    return html.escape(value).replace(SEARCH_MARK_OPEN, "<mark>").replace(SEARCH_MARK_CLOSE, "</mark>")
+
+
+@router.get("/search")
+async def search(q: str, user_id: Optional[str] = None, source: Optional[str] = None, limit: int = 20,
+                 offset: int = 0, syntax: str = "terms", session=Depends(get_session)):
+    """
+    Ranked full-text search.
+
+    Args:
+        q: Search terms (all must match; end a term with * for prefix matching)
+        user_id: Only search this user's documents
+        source: "stego" (extracted text) or "osint" (profiles and captions)
+        limit: Maximum number of results
+        offset: Number of results to skip (next_offset from the previous page)
+        syntax: "terms", or "fts" to pass q through as an FTS5 query (phrases, OR, NEAR)
+    """
+
+    try:
+        if not db_service.search_enabled:
+            raise HTTPException(status_code=501, detail="Full-text search requires SQLite with FTS5")
+        if source is not None and source not in SEARCH_SOURCES:
+            raise HTTPException(status_code=400, detail=f"Unknown source '{source}'")
+        if syntax not in ("terms", "fts"):
+            raise HTTPException(status_code=400, detail=f"Unknown syntax '{syntax}'")
+        limit = max(1, min(limit, 100))
+        offset = max(0, offset)
+
+        results = await db_service.search_async(q, user_id=user_id, source=source, limit=limit, offset=offset,
+                                                raw=syntax == "fts", session=session)
+        for result in results:
+            result["title"] = _highlighted(result["title"])
+            result["snippet"] = _highlighted(result["snippet"])
+
+        return {
+            "query": q,
+            "total_results": len(results),
+            "results": results,
+            "next_offset": offset + limit if len(results) == limit else None
+        }
+
+    except HTTPException:
+        raise
+    except OperationalError as e:
+        # Malformed FTS5 syntax
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {e.orig}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
@@ -2,11 +2,12 @@
 Social Media OSINT API Router
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional
 from app.services.social_media_osint import social_media_osint
-from app.services.database import db_service
+from app.services.database import db_service, get_session, next_cursor
+from app.services.archive import archive_service
 
 router = APIRouter()
 
@@ -19,7 +20,7 @@ class SocialMediaScanRequest(BaseModel):
 
 
 @router.post("/scan")
-async def scan_social_profile(request: SocialMediaScanRequest):
+async def scan_social_profile(request: SocialMediaScanRequest, session=Depends(get_session)):
     """
     Scan a social media profile for OSINT data.
     
@@ -42,14 +43,15 @@ async def scan_social_profile(request: SocialMediaScanRequest):
             raise HTTPException(status_code=400, detail=result.get("error", "Scan failed"))
         
         # Log to database
-        db_service.log_osint_collection(
+        await db_service.log_osint_collection_async(
             user_id=request.user_id,
             collection_type="social_media",
             target=request.username,
             platform=request.platform,
             data=result,
             metadata=result.get("metadata_summary"),
-            risk_score=result.get("exposure_metrics", {}).get("exposure_score", 0)
+            risk_score=result.get("exposure_metrics", {}).get("exposure_score", 0),
+            session=session
         )
         
         return result
@@ -59,7 +61,7 @@ async def scan_social_profile(request: SocialMediaScanRequest):
 
 
 @router.get("/search")
-async def search_username(username: str, user_id: str = "demo"):
+async def search_username(username: str, user_id: str = "demo", session=Depends(get_session)):
     """
     Search for a username across all supported platforms.
     
@@ -72,12 +74,13 @@ async def search_username(username: str, user_id: str = "demo"):
         result = await social_media_osint.search_username_across_platforms(username)
         
         # Log search
-        db_service.log_osint_collection(
+        await db_service.log_osint_collection_async(
             user_id=user_id,
             collection_type="username_search",
             target=username,
             data=result,
-            risk_score=result.get("platforms_found", 0) * 10
+            risk_score=result.get("platforms_found", 0) * 10,
+            session=session
         )
         
         return result
@@ -108,7 +111,8 @@ async def connect_social_account(
     user_id: str,
     platform: str,
     username: str,
-    profile_url: Optional[str] = None
+    profile_url: Optional[str] = None,
+    session=Depends(get_session)
 ):
     """
     Link a social media account to user profile for ongoing monitoring.
@@ -122,14 +126,15 @@ async def connect_social_account(
     
     try:
         # Ensure user exists
-        db_service.get_or_create_user(user_id)
+        await db_service.get_or_create_user_async(user_id, session=session)
         
         # Add social account
-        account = db_service.add_social_account(
+        account = await db_service.add_social_account_async(
             user_id=user_id,
             platform=platform,
             username=username,
-            profile_url=profile_url
+            profile_url=profile_url,
+            session=session
         )
         
         return {
@@ -148,17 +153,19 @@ async def connect_social_account(
 
 
 @router.get("/history")
-async def get_scan_history(user_id: str = "demo", limit: int = 50):
+async def get_scan_history(user_id: str = "demo", limit: int = 50, cursor: Optional[str] = None,
+                           session=Depends(get_session)):
     """
-    Get OSINT scan history for a user.
+    Get OSINT scan history for a user, newest first.
     
     Args:
         user_id: User ID
         limit: Maximum number of records to return
+        cursor: next_cursor from the previous page
     """
     
     try:
-        collections = db_service.get_osint_history(user_id, limit)
+        collections = await archive_service.get_osint_history_async(user_id, limit, cursor, session=session)
         
         history = []
         for collection in collections:
@@ -174,8 +181,44 @@ async def get_scan_history(user_id: str = "demo", limit: int = 50):
         return {
             "user_id": user_id,
             "total_scans": len(history),
-            "history": history
+            "history": history,
+            "next_cursor": next_cursor(collections, limit, "created_at")
         }
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"History retrieval error: {str(e)}")
+
+
+@router.get("/history/{collection_id}")
+async def get_scan_detail(collection_id: int, user_id: str = "demo", session=Depends(get_session)):
+    """
+    Get one OSINT scan with its full stored result.
+    
+    Args:
+        collection_id: ID from the history listing
+        user_id: User ID
+    """
+    
+    try:
+        found = await archive_service.get_osint_collection_async(collection_id, user_id, session=session)
+        if found is None:
+            raise HTTPException(status_code=404, detail="Scan not found")
+        
+        collection, data = found
+        return {
+            "id": collection.id,
+            "type": collection.collection_type,
+            "target": collection.target,
+            "platform": collection.platform,
+            "risk_score": collection.risk_score,
+            "timestamp": collection.created_at.isoformat(),
+            "metadata": collection.metadata_extracted,
+            "data": data
+        }
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"History retrieval error: {str(e)}")
@@ -2,17 +2,25 @@
 Steganography Detection API Router
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from app.services.steganography_detector import stego_detector
 from app.services.storage import storage_service
-from app.services.database import db_service
+from app.services.database import db_service, get_session, next_cursor
 from app.services.reverse_osint import reverse_osint
+from app.services.stego_similarity import stego_index
+from app.services.stego_cache import stego_cache
+from app.services.derivatives import derivative_service
+from app.services.archive import archive_service
 
 router = APIRouter()
 
 
 @router.post("/analyze")
-async def analyze_image(file: UploadFile = File(...), user_id: str = "demo", extract_data: bool = True):
+async def analyze_image(file: UploadFile = File(...), user_id: str = "demo", extract_data: bool = True,
+                        generate_heatmap: bool = False, multi_frame: bool = False,
+                        session=Depends(get_session)):
     """
     Analyze an image for steganography.
     
@@ -20,20 +28,35 @@ async def analyze_image(file: UploadFile = File(...), user_id: str = "demo", ext
         file: Image file to analyze
         user_id: User performing the analysis
         extract_data: Whether to attempt data extraction
+        generate_heatmap: Whether to render the block-level suspicion heatmap
+        multi_frame: Analyze every frame of animated GIF/APNG or multi-page TIFF
     """
     
     try:
-        # Save uploaded file
-        storage_result = await storage_service.save_file(file)
+        # Accept upload (persisted in the background; analysis reads the buffer)
+        storage_result, upload_buffer = await storage_service.ingest(file)
+        content_hash = storage_result['content_hash']
+        cache_key = stego_cache.make_key(content_hash, extract_data, multi_frame=multi_frame)
         
-        # Analyze for steganography
-        result = await stego_detector.analyze_image(
-            image_path=storage_result['local_path'],
-            extract_data=extract_data
-        )
+        # Analyze for steganography (unless this exact image was analyzed before)
+        result = await stego_cache.get_async(cache_key, require_heatmap=generate_heatmap, session=session)
+        cached = result is not None
+        if cached:
+            result["file_path"] = storage_result['local_path']
+            result["file_name"] = storage_result['filename']
+        else:
+            analyze = stego_detector.analyze_frames if multi_frame else stego_detector.analyze_image
+            result = await analyze(
+                image_path=storage_result['local_path'],
+                extract_data=extract_data,
+                generate_heatmap=generate_heatmap,
+                source=upload_buffer
+            )
         
         if result.get("status") != "success":
             raise HTTPException(status_code=400, detail=result.get("error", "Analysis failed"))
+        if not cached:
+            stego_cache.put(cache_key, result)
         
         # Save to database
         extracted_text = None
@@ -42,26 +65,36 @@ async def analyze_image(file: UploadFile = File(...), user_id: str = "demo", ext
             extracted_text = result["extracted_data"].get("text")
             extracted_coords = result["extracted_data"].get("coordinates")
         
-        db_service.save_stego_result(
+        saved = await db_service.save_stego_result_async(
             user_id=user_id,
             file_path=storage_result['local_path'],
             file_name=storage_result['filename'],
+            file_size=storage_result['size'],
             has_hidden_data=result.get("has_hidden_data", False),
             confidence=result.get("confidence_score", 0),
             method=", ".join(result.get("detection_methods", {}).keys()),
             extracted_text=extracted_text,
-            extracted_coords=extracted_coords
+            extracted_coords=extracted_coords,
+            heatmap_path=result.get("heatmap_path"),
+            statistical_analysis=result.get("statistical_analysis"),
+            content_hash=content_hash,
+            cache_key=cache_key,
+            analysis_result=None if cached else result,
+            session=session
         )
+        await asyncio.to_thread(stego_index.add, user_id, saved.id, result.get("statistical_analysis"))
+        result["result_id"] = saved.id
+        result["cached"] = cached
         
         # Format heatmap URL
         if result.get("heatmap_path"):
-            import os
-            filename = os.path.basename(result["heatmap_path"])
-            result["heatmap_url"] = f"/uploads/{filename}"
+            result["heatmap_url"] = storage_service.public_url(result["heatmap_path"])
+            result["heatmap_preview_url"] = derivative_service.url(result["heatmap_path"])
+        storage_result["thumbnail_url"] = derivative_service.url(storage_result["local_path"], "thumb")
         
         # Reverse OSINT Correlation
         correlation = None
-        if has_hidden_data:
+        if result.get("has_hidden_data"):
             correlation = await reverse_osint.correlate_stego_data(result.get("extracted_data"))
         
         return {
@@ -70,12 +103,14 @@ async def analyze_image(file: UploadFile = File(...), user_id: str = "demo", ext
             "reverse_osint_correlation": correlation
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
 
 @router.post("/extract")
-async def extract_hidden_data(file: UploadFile = File(...), method: str = "auto"):
+async def extract_hidden_data(file: UploadFile = File(...), method: str = "auto", session=Depends(get_session)):
     """
     Extract hidden data from an image.
     
@@ -85,75 +120,138 @@ async def extract_hidden_data(file: UploadFile = File(...), method: str = "auto"
     """
     
     try:
-        # Save uploaded file
-        storage_result = await storage_service.save_file(file)
+        # Accept upload (persisted in the background; analysis reads the buffer)
+        storage_result, upload_buffer = await storage_service.ingest(file)
+        cache_key = stego_cache.make_key(storage_result['content_hash'], True, method)
         
         # Analyze and extract
-        result = await stego_detector.analyze_image(
-            image_path=storage_result['local_path'],
-            extract_data=True
-        )
+        result = await stego_cache.get_async(cache_key, session=session)
+        cached = result is not None
+        if not cached:
+            result = await stego_detector.analyze_image(
+                image_path=storage_result['local_path'],
+                extract_data=True,
+                source=upload_buffer
+            )
         
         if result.get("status") != "success":
             raise HTTPException(status_code=400, detail=result.get("error", "Extraction failed"))
+        if not cached:
+            stego_cache.put(cache_key, result)
         
         return {
             "status": "success",
             "file_name": storage_result['filename'],
             "extracted_data": result.get("extracted_data"),
             "confidence": result.get("confidence_score"),
-            "methods_used": list(result.get("detection_methods", {}).keys())
+            "methods_used": list(result.get("detection_methods", {}).keys()),
+            "cached": cached
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Extraction error: {str(e)}")
 
 
 @router.get("/history")
-async def get_analysis_history(user_id: str = "demo", limit: int = 50):
+async def get_analysis_history(user_id: str = "demo", limit: int = 50, cursor: Optional[str] = None,
+                               session=Depends(get_session)):
     """
-    Get steganography analysis history.
+    Get steganography analysis history, newest first.
     
     Args:
         user_id: User ID
         limit: Maximum number of records
+        cursor: next_cursor from the previous page
     """
     
     try:
-        from app.services.database import db_service
-        db = db_service.get_db()
+        results = await archive_service.get_stego_history_async(user_id, limit, cursor, session=session)
         
-        try:
-            from app.services.database import SteganographyResult
-            results = db.query(SteganographyResult).filter(
-                SteganographyResult.user_id == user_id
-            ).order_by(SteganographyResult.analyzed_at.desc()).limit(limit).all()
-            
-            history = []
-            for result in results:
-                history.append({
-                    "id": result.id,
-                    "file_name": result.file_name,
-                    "has_hidden_data": result.has_hidden_data,
-                    "confidence": result.confidence_score,
-                    "method": result.detection_method,
-                    "analyzed_at": result.analyzed_at.isoformat(),
-                    "extracted_text_preview": result.extracted_text[:100] if result.extracted_text else None
-                })
-            
-            return {
-                "user_id": user_id,
-                "total_analyses": len(history),
-                "history": history
-            }
+        history = []
+        for result in results:
+            history.append({
+                "id": result.id,
+                "file_name": result.file_name,
+                "has_hidden_data": result.has_hidden_data,
+                "confidence": result.confidence_score,
+                "method": result.detection_method,
+                "analyzed_at": result.analyzed_at.isoformat(),
+                "extracted_text_preview": result.extracted_text[:100] if result.extracted_text else None
+            })
         
-        finally:
-            db.close()
+        return {
+            "user_id": user_id,
+            "total_analyses": len(history),
+            "history": history,
+            "next_cursor": next_cursor(results, limit, "analyzed_at")
+        }
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"History retrieval error: {str(e)}")
 
 
+@router.get("/similar/{result_id}")
+async def find_similar_analyses(result_id: int, user_id: str = "demo", limit: int = 10,
+                                session=Depends(get_session)):
+    """
+    Find past analyses whose embedding signature resembles a given result.
+    
+    Args:
+        result_id: ID of the analysis to compare against
+        user_id: User whose history is searched
+        limit: Maximum number of matches
+    """
+    
+    try:
+        # First use loads the user's vectors from the database
+        vector = await asyncio.to_thread(stego_index.get_vector, user_id, result_id)
+        if vector is None:
+            raise HTTPException(status_code=404, detail="No feature vector stored for this analysis")
+        
+        for _ in range(2):
+            matches = await asyncio.to_thread(
+                stego_index.search, user_id, vector, limit=limit, exclude_id=result_id, normalized=True
+            )
+            
+            ids = [m["result_id"] for m in matches]
+            rows = {r.id: r for r in await db_service.get_stego_results_async(ids, session=session)}
+            missing = [i for i in ids if i not in rows]
+            if not missing:
+                break
+            # Archived by another worker since its vectors were loaded; search again without them
+            await asyncio.to_thread(stego_index.remove, user_id, missing)
+        
+        similar = []
+        for match in matches:
+            row = rows.get(match["result_id"])
+            if row is None:
+                continue
+            similar.append({
+                "id": row.id,
+                "file_name": row.file_name,
+                "has_hidden_data": row.has_hidden_data,
+                "confidence": row.confidence_score,
+                "analyzed_at": row.analyzed_at.isoformat(),
+                "similarity": match["similarity"]
+            })
+        
+        return {
+            "result_id": result_id,
+            "user_id": user_id,
+            "total_matches": len(similar),
+            "similar": similar
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Similarity search error: {str(e)}")
+
+
 @router.get("/methods")
 async def get_detection_methods():
     """
@@ -181,8 +279,14 @@ async def get_detection_methods():
                 "name": "Visual Analysis",
                 "description": "Visual artifact detection",
                 "best_for": "Identifying unusual patterns"
+            },
+            {
+                "name": "SPAM",
+                "description": "Pixel-difference Markov features scored by logistic regression",
+                "best_for": "Low-rate LSB matching and adaptive embedding"
             }
         ],
-        "supported_formats": ["PNG", "JPEG", "BMP", "TIFF"],
+        "supported_formats": ["PNG", "JPEG", "BMP", "TIFF", "GIF"],
+        "multi_frame_formats": ["GIF", "APNG", "TIFF"],
         "extraction_capabilities": ["Text", "Coordinates", "Binary data", "Files"]
     }
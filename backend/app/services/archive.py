@@ -0,0 +1,255 @@
+"""
+Cold Storage Archive - Move old OSINT collections and stego results out of the hot database.
+Rows older than a cutoff are written to compressed, month-partitioned JSONL
+segment files; a small index (segment time/id ranges and per-user time
+ranges) stays in the database. History lookups that run past the hot rows
+continue into the segments transparently, with the same keyset cursors.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime
+
+from app.config import settings
+from app.services.database import db_service, decode_cursor, encode_cursor, ARCHIVE_TABLES
+from app.services.metrics import metrics
+from app.services.payload_codec import compress_bytes, decompress_bytes
+from app.services.stego_similarity import stego_index
+
+# Columns of archived rows holding upload/heatmap paths under UPLOAD_DIR
+FILE_COLUMNS = ("file_path", "heatmap_path")
+
+
+class ArchiveService:
+    """Writes archive segments and rehydrates archived rows on demand"""
+
+    EXTENSIONS = {"zstd": ".jsonl.zst", "zlib": ".jsonl.zz"}
+
+    def __init__(self, archive_dir: str, archive_after_days: float = 365, segment_rows: int = 10000,
+                 interval: float = 21600, cache_segments: int = 8):
+        """
+        Args:
+            archive_dir: Directory holding segment files
+            archive_after_days: Archive rows older than this (0 disables the job)
+            segment_rows: Maximum rows per archival batch (and so per segment)
+            interval: Seconds between archival passes
+            cache_segments: Decoded segments kept in memory for repeated lookups
+        """
+        self.archive_dir = archive_dir
+        self.archive_after_days = archive_after_days
+        self.segment_rows = segment_rows
+        self.interval = interval
+        self.cache_segments = cache_segments
+        self._cache: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # Writing
+
+    def _serialize(self, record: Dict) -> Dict:
+        return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in record.items()}
+
+    def _write_segment(self, table_name: str, partition: str, records: List[Dict]) -> Tuple[str, str, int]:
+        """Write one segment durably; returns (path, codec, stored bytes)"""
+        lines = "\n".join(json.dumps(self._serialize(r), separators=(",", ":"), default=str) for r in records)
+        codec, data = compress_bytes(lines.encode("utf-8"))
+        directory = os.path.join(self.archive_dir, table_name, partition)
+        os.makedirs(directory, exist_ok=True)
+        name = f"{table_name}-{partition}-{records[0]['id']}-{records[-1]['id']}{self.EXTENSIONS[codec]}"
+        path = os.path.join(directory, name)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as out:
+            out.write(data)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(temp_path, path)
+        return path, codec, len(data)
+
+    def archive_table(self, table_name: str, before: datetime) -> int:
+        """Move rows older than `before` into segments (blocking); returns rows archived"""
+        _, time_column = ARCHIVE_TABLES[table_name]
+        time_key = time_column.key
+        archived = 0
+        while True:
+            records = db_service.get_archivable_rows(table_name, before, self.segment_rows)
+            if not records:
+                return archived
+            partitions: Dict[str, List[Dict]] = {}
+            for record in records:
+                partitions.setdefault(record[time_key].strftime("%Y-%m"), []).append(record)
+
+            for partition, rows in partitions.items():
+                # Payloads were inlined into "data"; their blob references are released
+                payload_hashes = [r["payload_hash"] for r in rows if r.get("payload_hash")]
+                for r in rows:
+                    r.pop("payload_hash", None)
+                # Uploads and heatmaps of archived stego results stay pinned so rehydrated rows can open them
+                file_paths = sorted({r[key] for r in rows for key in FILE_COLUMNS if r.get(key)})
+                path, codec, stored_size = self._write_segment(table_name, partition, rows)
+                users: Dict[Optional[str], Dict] = {}
+                for r in rows:
+                    user = users.setdefault(r["user_id"], {"user_id": r["user_id"], "row_count": 0,
+                                                           "min_time": r[time_key], "max_time": r[time_key]})
+                    user["row_count"] += 1
+                    user["min_time"] = min(user["min_time"], r[time_key])
+                    user["max_time"] = max(user["max_time"], r[time_key])
+                segment = {
+                    "partition": partition, "path": path, "codec": codec, "row_count": len(rows),
+                    "stored_size": stored_size,
+                    "min_time": min(r[time_key] for r in rows), "max_time": max(r[time_key] for r in rows),
+                    "min_id": min(r["id"] for r in rows), "max_id": max(r["id"] for r in rows),
+                }
+                try:
+                    db_service.commit_archive_segment(table_name, segment, list(users.values()),
+                                                      [r["id"] for r in rows], payload_hashes, file_paths)
+                except Exception:
+                    # The rows stay in the hot table; remove the unregistered segment
+                    os.remove(path)
+                    raise
+                if table_name == "steganography_results":
+                    # Similarity search only returns hot rows
+                    for user_id in users:
+                        stego_index.remove(user_id, [r["id"] for r in rows if r["user_id"] == user_id])
+                archived += len(rows)
+                metrics.increment("archive.segments")
+                metrics.increment("archive.rows", len(rows))
+                metrics.increment("archive.bytes", stored_size)
+            if len(records) < self.segment_rows:
+                return archived
+
+    def run_pass(self) -> Dict[str, int]:
+        """Archive every archivable table up to the cutoff (blocking)"""
+        if self.archive_after_days <= 0:
+            return {}
+        started = time.monotonic()
+        before = datetime.utcnow() - timedelta(days=self.archive_after_days)
+        counts = {table_name: self.archive_table(table_name, before) for table_name in ARCHIVE_TABLES}
+        metrics.observe("archive.pass_seconds", time.monotonic() - started)
+        if any(counts.values()):
+            print(f"Archived rows to cold storage: {counts}")
+        return counts
+
+    # Reading
+
+    def _read_segment(self, segment) -> List[Dict]:
+        """Decoded rows of a segment (newest first), through a small LRU cache"""
+        with self._cache_lock:
+            rows = self._cache.get(segment.path)
+            if rows is not None:
+                self._cache.move_to_end(segment.path)
+                return rows
+        with open(segment.path, "rb") as f:
+            raw = decompress_bytes(segment.codec, f.read())
+        rows = [json.loads(line) for line in raw.decode("utf-8").splitlines() if line]
+        model, time_column = ARCHIVE_TABLES[segment.table_name]
+        date_columns = [c.key for c in model.__table__.columns if isinstance(c.type, DateTime)]
+        for row in rows:
+            for key in date_columns:
+                if row.get(key):
+                    row[key] = datetime.fromisoformat(row[key])
+        rows.sort(key=lambda r: (r[time_column.key], r["id"]), reverse=True)
+        metrics.increment("archive.segment_reads")
+        with self._cache_lock:
+            self._cache[segment.path] = rows
+            while len(self._cache) > self.cache_segments:
+                self._cache.popitem(last=False)
+        return rows
+
+    def _rehydrate(self, table_name: str, row: Dict):
+        """Detached model instance for an archived row (never added to a session)"""
+        model, _ = ARCHIVE_TABLES[table_name]
+        columns = model.__table__.columns
+        return model(**{key: value for key, value in row.items() if key in columns})
+
+    def history(self, table_name: str, user_id: str, limit: int, cursor: str = None) -> List:
+        """Archived rows of one user after `cursor`, newest first (blocking)"""
+        _, time_column = ARCHIVE_TABLES[table_name]
+        time_key = time_column.key
+        position = decode_cursor(cursor) if cursor else None
+        matches: List[Dict] = []
+        for segment in db_service.find_archive_segments(table_name, user_id, position[0] if position else None):
+            # Segments come newest first but may overlap; stop once none can beat what we have
+            if len(matches) >= limit and segment.max_time < matches[limit - 1][time_key]:
+                break
+            for row in self._read_segment(segment):
+                if row["user_id"] != user_id:
+                    continue
+                if position is not None and (row[time_key], row["id"]) >= position:
+                    continue
+                matches.append(row)
+            matches.sort(key=lambda r: (r[time_key], r["id"]), reverse=True)
+        metrics.increment("archive.rehydrated_rows", min(len(matches), limit))
+        return [self._rehydrate(table_name, row) for row in matches[:limit]]
+
+    def get_row(self, table_name: str, row_id: int, user_id: str = None):
+        """One archived row by id, or None (blocking)"""
+        for segment in db_service.find_archive_segments_for_id(table_name, row_id):
+            for row in self._read_segment(segment):
+                if row["id"] == row_id and (user_id is None or row["user_id"] == user_id):
+                    return self._rehydrate(table_name, row)
+        return None
+
+    async def _with_archive(self, table_name: str, rows: List, user_id: str, limit: int, cursor: str = None):
+        """Top up a short page of hot rows from the archive"""
+        if len(rows) >= limit:
+            return rows
+        _, time_column = ARCHIVE_TABLES[table_name]
+        if rows:
+            cursor = encode_cursor(getattr(rows[-1], time_column.key), rows[-1].id)
+        older = await asyncio.to_thread(self.history, table_name, user_id, limit - len(rows), cursor)
+        return rows + older
+
+    async def get_osint_history_async(self, user_id: str, limit: int = 50, cursor: str = None, session=None):
+        """OSINT history, newest first, continuing into archived rows"""
+        rows = await db_service.get_osint_history_async(user_id, limit, cursor, session=session)
+        return await self._with_archive("osint_collections", rows, user_id, limit, cursor)
+
+    async def get_stego_history_async(self, user_id: str, limit: int = 50, cursor: str = None, session=None):
+        """Steganography history, newest first, continuing into archived rows"""
+        rows = await db_service.get_stego_history_async(user_id, limit, cursor, session=session)
+        return await self._with_archive("steganography_results", rows, user_id, limit, cursor)
+
+    async def get_osint_collection_async(self, collection_id: int, user_id: str = None, session=None):
+        """(collection, data) from the hot table or the archive, or None"""
+        found = await db_service.get_osint_collection_async(collection_id, user_id, session=session)
+        if found is not None:
+            return found
+        collection = await asyncio.to_thread(self.get_row, "osint_collections", collection_id, user_id)
+        return (collection, collection.data) if collection is not None else None
+
+    # Background job
+
+    async def start(self):
+        if self._task is not None or self.archive_after_days <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_pass)
+            except Exception as e:
+                print(f"Archive pass failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# Global instance
+archive_service = ArchiveService(
+    archive_dir=settings.ARCHIVE_DIR,
+    archive_after_days=settings.ARCHIVE_AFTER_DAYS,
+    segment_rows=settings.ARCHIVE_SEGMENT_ROWS,
+    interval=settings.ARCHIVE_INTERVAL
+)
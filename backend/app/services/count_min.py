@@ -0,0 +1,130 @@
+"""
+Sliding Count-Min Sketch - Approximate per-key event counts over a time window.
+One count-min sketch per second is kept in a ring of `window` buckets plus
+a running total of all of them, so memory is fixed no matter how many
+distinct keys (e.g. churning IPs) are seen, an estimate reads `depth`
+counters, and expired seconds are subtracted from the total and zeroed.
+Counts never underestimate; collisions add at most ~e/width of the
+window's events with probability 1 - e^-depth. Counters can live in a
+caller-provided buffer such as shared memory, so several processes can
+count into one sketch.
+"""
+
+import contextlib
+import hashlib
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+class SlidingCountMinSketch:
+    """Count-min sketch over the last `window` seconds"""
+
+    def __init__(self, window: int = 60, width: int = 4096, depth: int = 4, buffer=None, lock=None):
+        """
+        Args:
+            window: Window length in seconds (one bucket per second)
+            width: Counters per row; error bound is ~e/width of events in the window
+            depth: Hash rows (1-16); failure probability is ~e^-depth
+            buffer: Writable buffer of at least nbytes() to hold the counters (zeroed = empty)
+            lock: Context manager serializing updates between threads/processes sharing `buffer`
+        """
+        if not 1 <= depth <= 16:
+            raise ValueError("depth must be between 1 and 16")
+        self.window = window
+        self.width = width
+        self.depth = depth
+        self._lock = lock or contextlib.nullcontext()
+        if buffer is None:
+            buffer = bytearray(self.nbytes(window, width, depth))
+        # Layout: newest second counted, events per second, running total sketch, per-second sketches
+        cells = depth * width
+        total_offset = 8 + 8 * window
+        buckets_offset = total_offset + 4 * cells
+        self._clock = np.ndarray((1,), dtype=np.int64, buffer=buffer, offset=0)
+        self._events = np.ndarray((window,), dtype=np.int64, buffer=buffer, offset=8)
+        self._total = np.ndarray((cells,), dtype=np.int32, buffer=buffer, offset=total_offset)
+        self._buckets = np.ndarray((window, cells), dtype=np.int32, buffer=buffer, offset=buckets_offset)
+        # Flat views for per-key updates: scalar memoryview access is far cheaper than NumPy indexing
+        view = memoryview(buffer).cast("B")
+        self._total_cells = view[total_offset:buckets_offset].cast("i")
+        self._bucket_cells = view[buckets_offset:buckets_offset + 4 * window * cells].cast("i")
+        self._row_offsets = [row * width for row in range(depth)]
+
+    @staticmethod
+    def nbytes(window: int, width: int, depth: int) -> int:
+        return 8 + 8 * window + 4 * (window + 1) * depth * width
+
+    def _cells(self, key: str) -> List[int]:
+        """Flat counter index of `key` in each row"""
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=4 * self.depth).digest()
+        hashed = int.from_bytes(digest, "little")
+        width = self.width
+        return [offset + ((hashed >> (32 * row)) & 0xFFFFFFFF) % width
+                for row, offset in enumerate(self._row_offsets)]
+
+    def _advance(self, second: int):
+        """Move the window forward to `second`, retiring buckets that fell out of it (lock held)"""
+        current = int(self._clock[0])
+        if current >= second:
+            return
+        if second - current >= self.window:
+            self._buckets[:] = 0
+            self._total[:] = 0
+            self._events[:] = 0
+        else:
+            for expired in range(current + 1, second + 1):
+                slot = expired % self.window
+                self._total -= self._buckets[slot]
+                self._buckets[slot] = 0
+                self._events[slot] = 0
+        self._clock[0] = second
+
+    def add(self, keys: Sequence[str], now: Optional[float] = None) -> List[int]:
+        """
+        Count one event for each key.
+
+        Returns:
+            Each key's estimated count over the window, including this event
+        """
+        second = int(time.time() if now is None else now)
+        key_cells = [self._cells(key) for key in keys]
+        total, buckets = self._total_cells, self._bucket_cells
+        with self._lock:
+            self._advance(second)
+            if second <= self._clock[0] - self.window:  # Older than the window: report without counting
+                return [min(total[cell] for cell in cells) for cells in key_cells]
+            slot = second % self.window
+            self._events[slot] += 1
+            base = slot * self.width * self.depth
+            counts = []
+            for cells in key_cells:
+                smallest = None
+                for cell in cells:
+                    buckets[base + cell] += 1
+                    count = total[cell] + 1
+                    total[cell] = count
+                    if smallest is None or count < smallest:
+                        smallest = count
+                counts.append(smallest)
+        return counts
+
+    def estimate(self, key: str, now: Optional[float] = None) -> int:
+        """Estimated count of `key` over the window ending at `now`"""
+        cells = self._cells(key)
+        with self._lock:
+            self._advance(int(time.time() if now is None else now))
+            return min(self._total_cells[cell] for cell in cells)
+
+    def release(self):
+        """Drop every view of the buffer so its owner (e.g. a shared memory segment) can close it"""
+        self._total_cells.release()
+        self._bucket_cells.release()
+        self._clock = self._events = self._total = self._buckets = None
+
+    def events(self, now: Optional[float] = None) -> int:
+        """Number of add() calls over the window"""
+        with self._lock:
+            self._advance(int(time.time() if now is None else now))
+            return int(self._events.sum())
@@ -3,21 +3,155 @@ Database service for OSINT platform using SQLAlchemy with SQLite.
 Easily upgradeable to PostgreSQL/Supabase by changing the connection string.
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, JSON, Text, ForeignKey
+from sqlalchemy import case, create_engine, delete, event, func, insert, inspect, literal, null, select, text, tuple_, Column, Index, Integer, String, Float, DateTime, Boolean, JSON, LargeBinary, Text, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import deferred, sessionmaker, relationship, undefer, Session
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
+import asyncio
+import base64
+import threading
 import os
 from pathlib import Path
 
+from app.config import settings
+from app.services.hyperloglog import HyperLogLog
+from app.services.payload_codec import EncodedPayload, decode_payload, encode_payload
+
 # Database setup
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 DB_PATH = BASE_DIR / "osint_data.db"
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# WAL lets readers run alongside the single writer; NORMAL sync is durable in WAL mode
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+    "cache_size": -20000,  # ~20 MB page cache per connection
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _async_url(url: str):
+    """Async driver URL for a sync one (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite:///"):
+        return "sqlite+aiosqlite:///" + url[len("sqlite:///"):]
+    for scheme in ("postgresql://", "postgres://"):
+        if url.startswith(scheme):
+            return "postgresql+asyncpg://" + url[len(scheme):]
+    return None
+
+
+def _telemetry_url(url: str) -> str:
+    """Default telemetry database: a sibling SQLite file, else the same database"""
+    if url.startswith("sqlite:///") and ":memory:" not in url:
+        path = Path(url[len("sqlite:///"):])
+        return f"sqlite:///{path.with_name(path.stem + '_telemetry' + (path.suffix or '.db'))}"
+    return url
+
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _create_engine(url: str, schema: str = None):
+    sqlite = url.startswith("sqlite")
+    new_engine = create_engine(url, connect_args={"check_same_thread": False} if sqlite else {})
+    if sqlite:
+        event.listen(new_engine, "connect", _apply_sqlite_pragmas)
+    return new_engine.execution_options(schema_translate_map={None: schema}) if schema else new_engine
+
+
+# High-write telemetry (visitor logs, rollups, metrics) lives in its own database so
+# its inserts never queue on the core database's write lock. Set
+# TELEMETRY_DATABASE_URL to DATABASE_URL to share one database; on PostgreSQL,
+# TELEMETRY_DB_SCHEMA puts the tables in their own schema instead.
+TELEMETRY_DATABASE_URL = os.getenv("TELEMETRY_DATABASE_URL") or _telemetry_url(DATABASE_URL)
+TELEMETRY_DB_SCHEMA = os.getenv("TELEMETRY_DB_SCHEMA") or None
+SEPARATE_TELEMETRY = TELEMETRY_DATABASE_URL != DATABASE_URL or TELEMETRY_DB_SCHEMA is not None
+
+engine = _create_engine(DATABASE_URL)
+telemetry_engine = _create_engine(TELEMETRY_DATABASE_URL, TELEMETRY_DB_SCHEMA) if SEPARATE_TELEMETRY else engine
 Base = declarative_base()
+TelemetryBase = declarative_base()  # Models routed to telemetry_engine
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, binds={TelemetryBase: telemetry_engine})
+
+# Async engine for request handlers; without the driver, async methods use a thread pool
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+ASYNC_TELEMETRY_DATABASE_URL = os.getenv("ASYNC_TELEMETRY_DATABASE_URL") or _async_url(TELEMETRY_DATABASE_URL)
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DATABASE_URL and ASYNC_TELEMETRY_DATABASE_URL:
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        
+        def _create_async_engine(url: str, schema: str = None):
+            new_engine = create_async_engine(url)
+            if url.startswith("sqlite"):
+                event.listen(new_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+            return new_engine.execution_options(schema_translate_map={None: schema}) if schema else new_engine
+        
+        async_engine = _create_async_engine(ASYNC_DATABASE_URL)
+        async_telemetry_engine = (_create_async_engine(ASYNC_TELEMETRY_DATABASE_URL, TELEMETRY_DB_SCHEMA)
+                                  if SEPARATE_TELEMETRY else async_engine)
+        AsyncSessionLocal = async_sessionmaker(async_engine, binds={TelemetryBase: async_telemetry_engine},
+                                               autoflush=False, expire_on_commit=False)
+    except Exception as e:
+        print(f"Async database driver unavailable ({e}); falling back to a thread pool")
+        async_engine = None
+
+
+async def get_session():
+    """
+    FastAPI dependency yielding one AsyncSession per request.
+    Yields None when no async driver is installed; DatabaseService async
+    methods then run their queries in a worker thread instead.
+    """
+    if AsyncSessionLocal is None:
+        yield None
+        return
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque keyset cursor pointing at the last row of a page"""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(timestamp, id) from encode_cursor(); raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def keyset_page(query, time_column, id_column, limit: int, cursor: str = None):
+    """
+    Newest-first page of `query` continuing after `cursor`. Seeks on
+    (time, id) instead of OFFSET, so every page costs one index range scan.
+    """
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(time_column, id_column) < tuple_(timestamp, row_id))
+    return query.order_by(time_column.desc(), id_column.desc()).limit(limit)
+
+
+def next_cursor(rows: list, limit: int, time_attr: str):
+    """Cursor for the page after `rows` (None once a page comes back short)"""
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(getattr(rows[-1], time_attr), rows[-1].id)
 
 
 # Models
@@ -57,6 +191,10 @@ class SocialMediaAccount(Base):
 class OSINTCollection(Base):
     """OSINT scan results and collections"""
     __tablename__ = "osint_collections"
+    __table_args__ = (
+        Index("ix_osint_collections_user_created", "user_id", "created_at", "id"),
+        Index("ix_osint_collections_created", "created_at", "id"),  # Archiver and exports
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.user_id"))
@@ -64,9 +202,10 @@ class OSINTCollection(Base):
     target = Column(String, nullable=False)  # email, username, profile URL
     platform = Column(String)  # Platform if social media scan
     
-    # Results
-    data = Column(JSON)  # Main collection data
-    metadata_extracted = Column(JSON)  # GPS, device info, timestamps
+    # Results; payloads load only when a detail view asks for them
+    data = deferred(Column(JSON))  # Inline payload of rows written before payload_blobs
+    payload_hash = Column(String, index=True)  # PayloadBlob.content_hash of the full result
+    metadata_extracted = deferred(Column(JSON))  # GPS, device info, timestamps
     risk_score = Column(Float)
     
     # Timestamps
@@ -75,9 +214,13 @@ class OSINTCollection(Base):
     user = relationship("User", back_populates="osint_scans")
 
 
-class ReverseOSINTLog(Base):
+class ReverseOSINTLog(TelemetryBase):
     """Track visitors and potential threat actors"""
     __tablename__ = "reverse_osint_logs"
+    __table_args__ = (
+        Index("ix_reverse_osint_logs_time", "timestamp", "id"),
+        Index("ix_reverse_osint_logs_suspicious_time", "is_suspicious", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -95,7 +238,7 @@ class ReverseOSINTLog(Base):
     # Access info
     accessed_resource = Column(String)  # What they tried to access
     request_method = Column(String)
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    timestamp = Column(DateTime, default=datetime.utcnow)
     
     # Threat assessment
     is_suspicious = Column(Boolean, default=False)
@@ -107,15 +250,79 @@ class ReverseOSINTLog(Base):
     visit_count = Column(Integer, default=1)
 
 
+class VisitorRollup(TelemetryBase):
+    """Hourly visitor aggregates plus one all-time row, maintained as logs are written"""
+    __tablename__ = "visitor_rollups"
+    __table_args__ = (Index("ix_visitor_rollups_bucket", "granularity", "bucket_start", unique=True),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String, nullable=False)  # hour, total
+    bucket_start = Column(DateTime, nullable=False)  # Start of the hour (ROLLUP_TOTAL_BUCKET for total)
+    
+    visits = Column(Integer, default=0)
+    suspicious = Column(Integer, default=0)
+    threat_critical = Column(Integer, default=0)
+    threat_high = Column(Integer, default=0)
+    threat_medium = Column(Integer, default=0)
+    threat_low = Column(Integer, default=0)
+    countries = Column(JSON)  # {country: visits}
+    ip_sketch = Column(LargeBinary)  # HyperLogLog registers over ip_address
+    
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+ROLLUP_TOTAL_BUCKET = datetime(1970, 1, 1)
+ROLLUP_THREAT_COLUMNS = {"CRITICAL": "threat_critical", "HIGH": "threat_high",
+                         "MEDIUM": "threat_medium", "LOW": "threat_low"}
+
+
+SEARCH_TABLE = "search_index"
+SEARCH_SOURCES = {"stego": 0, "osint": 1}  # rowid % 2
+# Highlight markers; control characters never occur in indexed text and survive HTML escaping
+SEARCH_MARK_OPEN, SEARCH_MARK_CLOSE = "\x02", "\x03"
+
+
+def osint_search_text(payload) -> str:
+    """Searchable text of an OSINT result: profile fields and post captions"""
+    if not isinstance(payload, dict):
+        return ""
+    profile = payload.get("profile") or {}
+    parts = [profile.get(key) for key in ("display_name", "bio", "location")]
+    parts += [post.get("caption") for post in payload.get("posts") or [] if isinstance(post, dict)]
+    return "\n".join(part for part in parts if isinstance(part, str) and part)
+
+
+def fts_query(query: str) -> str:
+    """
+    Plain search terms as an FTS5 query: every term must match, a trailing *
+    keeps prefix matching, and FTS5 operators in the input are taken literally.
+    """
+    terms = []
+    for term in query.split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*").replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
 class SteganographyResult(Base):
     """Steganography analysis results"""
     __tablename__ = "steganography_results"
+    __table_args__ = (
+        Index("ix_steganography_results_user_analyzed", "user_id", "analyzed_at", "id"),
+        Index("ix_steganography_results_analyzed", "analyzed_at", "id"),  # Archiver and exports
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.user_id"))
     
     # Image info
-    file_path = Column(String, nullable=False)
+    file_path = Column(String, nullable=False, index=True)
     file_name = Column(String)
     file_size = Column(Integer)
     
@@ -131,7 +338,12 @@ class SteganographyResult(Base):
     statistical_analysis = Column(JSON)
     
     # Visualization
-    heatmap_path = Column(String)
+    heatmap_path = Column(String, index=True)
+    
+    # Result cache (content hash + parameters + detector version)
+    content_hash = Column(String, index=True)
+    cache_key = Column(String, index=True)
+    analysis_result = Column(JSON(none_as_null=True))
     
     # Timestamp
     analyzed_at = Column(DateTime, default=datetime.utcnow)
@@ -139,6 +351,163 @@ class SteganographyResult(Base):
     user = relationship("User", back_populates="stego_analyses")
 
 
+class ScanResult(Base):
+    """Deepfake scan results (image, video, audio), written in batches"""
+    __tablename__ = "scan_results"
+    __table_args__ = (
+        Index("ix_scan_results_user_scanned", "user_id", "scanned_at", "id"),
+        Index("ix_scan_results_user_modality_scanned", "user_id", "modality", "scanned_at", "id"),
+        Index("ix_scan_results_content", "content_hash", "modality", "model_version"),
+        Index("ix_scan_results_heatmap", "heatmap_path"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("users.user_id"))
+    
+    # Scanned file
+    content_hash = Column(String, nullable=False)  # SHA-256 of the upload
+    modality = Column(String, nullable=False)  # image, video, audio
+    file_name = Column(String)
+    
+    # Detection
+    label = Column(String)  # FAKE, REAL, ERROR
+    score = Column(Float)  # Detector confidence, 0-100
+    model_type = Column(String)
+    model_version = Column(String)  # ImageDetector.model_version; results are reused only within a version
+    heatmap_path = Column(String)  # /uploads/... URL of the heatmap, if any
+    
+    # Intelligence
+    risk_score = Column(Float)
+    severity = Column(String)
+    
+    analysis = deferred(Column(JSON))  # Full detector output
+    scanned_at = Column(DateTime, default=datetime.utcnow)
+
+
+SCAN_MODALITIES = ("image", "video", "audio")
+HIGH_RISK_SCORE = 70  # Risk scores above this raise alerts
+
+
+# Tables the archiver may move to cold storage: name -> (model, time column)
+ARCHIVE_TABLES = {
+    "osint_collections": (OSINTCollection, OSINTCollection.created_at),
+    "steganography_results": (SteganographyResult, SteganographyResult.analyzed_at),
+}
+
+# Tables the bulk export streams: dataset -> (model, time column, filterable columns)
+EXPORT_TABLES = {
+    "osint": (OSINTCollection, OSINTCollection.created_at, ("user_id", "collection_type", "platform")),
+    "stego": (SteganographyResult, SteganographyResult.analyzed_at, ("user_id", "has_hidden_data", "detection_method")),
+    "visitors": (ReverseOSINTLog, ReverseOSINTLog.timestamp, ("ip_address", "country", "is_suspicious", "threat_level")),
+    "scans": (ScanResult, ScanResult.scanned_at, ("user_id", "modality", "label")),
+}
+
+
+class StoredFile(Base):
+    """Content-addressed upload store (one row per unique file content)"""
+    __tablename__ = "stored_files"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String, unique=True, index=True, nullable=False)  # SHA-256 hex
+    path = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    content_type = Column(String)
+    original_filename = Column(String)  # Name of the first upload with this content
+    ref_count = Column(Integer, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PayloadBlob(Base):
+    """Compressed, content-addressed JSON payloads (shared by identical results)"""
+    __tablename__ = "payload_blobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String, unique=True, index=True, nullable=False)  # SHA-256 of canonical JSON
+    codec = Column(String, nullable=False)  # zstd, zlib
+    size = Column(Integer, nullable=False)  # Uncompressed bytes
+    stored_size = Column(Integer, nullable=False)
+    data = deferred(Column(LargeBinary, nullable=False))
+    ref_count = Column(Integer, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ArchiveSegment(Base):
+    """Compressed JSONL file of rows moved out of a hot table by the archiver"""
+    __tablename__ = "archive_segments"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String, nullable=False, index=True)
+    partition = Column(String, nullable=False)  # YYYY-MM of the rows' timestamps
+    path = Column(String, nullable=False)
+    codec = Column(String, nullable=False)  # zstd, zlib
+    row_count = Column(Integer, nullable=False)
+    stored_size = Column(Integer, nullable=False)
+    min_time = Column(DateTime, nullable=False)
+    max_time = Column(DateTime, nullable=False)
+    min_id = Column(Integer, nullable=False)
+    max_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ArchiveSegmentUser(Base):
+    """Per-user time range within a segment, so lookups only open relevant files"""
+    __tablename__ = "archive_segment_users"
+    __table_args__ = (Index("ix_archive_segment_users_lookup", "table_name", "user_id", "max_time"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    segment_id = Column(Integer, ForeignKey("archive_segments.id"), nullable=False, index=True)
+    table_name = Column(String, nullable=False)
+    user_id = Column(String)
+    row_count = Column(Integer, nullable=False)
+    min_time = Column(DateTime, nullable=False)
+    max_time = Column(DateTime, nullable=False)
+
+
+class ArchivedFileReference(Base):
+    """Upload or heatmap path referenced by an archived row; keeps the file from eviction"""
+    __tablename__ = "archived_file_references"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String, nullable=False, index=True)
+    segment_id = Column(Integer, ForeignKey("archive_segments.id"), nullable=False, index=True)
+    table_name = Column(String, nullable=False)
+
+
+class UploadIndexEntry(Base):
+    """Size and last access of every file under UPLOAD_DIR (drives eviction)"""
+    __tablename__ = "upload_index"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String, unique=True, index=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    kind = Column(String)  # object, heatmap, stego_heatmap, other
+    content_hash = Column(String)
+    pinned = Column(Boolean, default=False)
+    last_access = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ReplicationJob(Base):
+    """Durable queue of stored files waiting to be copied to object storage"""
+    __tablename__ = "replication_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String, index=True, nullable=False)
+    local_path = Column(String, nullable=False)
+    object_key = Column(String, nullable=False)
+    content_type = Column(String)
+    backend = Column(String, nullable=False)
+    
+    # pending, in_progress, done, failed
+    status = Column(String, default="pending", index=True)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_error = Column(Text)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
 class APIKeyStore(Base):
     """Secure storage for API keys and credentials"""
     __tablename__ = "api_keys"
@@ -186,8 +555,92 @@ class DatabaseService:
     """Service for database operations"""
     
     def __init__(self):
-        Base.metadata.create_all(bind=engine)
+        # Nothing touches the database until init_schema(), so importing the app never writes to it
         self.SessionLocal = SessionLocal
+        # Serializes rollup read-modify-writes between the log writer and write-through callers
+        self._rollup_lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self.schema_ready = False
+        self.search_enabled = False
+    
+    def init_schema(self):
+        """
+        Create missing tables, columns, indexes and the search index in both
+        databases. Idempotent; called once at startup and by scripts that need
+        the schema.
+        """
+        with self._schema_lock:
+            if self.schema_ready:
+                return
+            Base.metadata.create_all(bind=engine)
+            self._add_missing_columns(Base, engine)
+            if TELEMETRY_DB_SCHEMA is not None:
+                with telemetry_engine.begin() as conn:
+                    conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{TELEMETRY_DB_SCHEMA}"'))
+            TelemetryBase.metadata.create_all(bind=telemetry_engine)
+            self._add_missing_columns(TelemetryBase, telemetry_engine, TELEMETRY_DB_SCHEMA)
+            self.search_enabled = self._create_search_index()
+            self.schema_ready = True
+    
+    def _add_missing_columns(self, base, bind, schema: str = None):
+        """
+        create_all() never alters existing tables, so add columns and indexes
+        introduced after a database file was first created.
+        """
+        inspector = inspect(bind)
+        prefix = f'"{schema}".' if schema else ""
+        with bind.begin() as conn:
+            for table in base.metadata.sorted_tables:
+                if not inspector.has_table(table.name, schema=schema):
+                    continue
+                existing = {c["name"] for c in inspector.get_columns(table.name, schema=schema)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        column_type = column.type.compile(dialect=bind.dialect)
+                        conn.execute(text(f"ALTER TABLE {prefix}{table.name} ADD COLUMN {column.name} {column_type}"))
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
+    
+    def _create_search_index(self) -> bool:
+        """
+        Create the FTS5 search index and the triggers that keep stego text in
+        sync (OSINT payloads are compressed, so those are indexed on write).
+        Rowids encode the source: id * 2 for stego results, id * 2 + 1 for OSINT.
+        """
+        if not IS_SQLITE:
+            return False
+        stego_document = ("new.id * 2, new.file_name, new.extracted_text, new.user_id, new.analyzed_at "
+                          "WHERE new.extracted_text IS NOT NULL AND new.extracted_text != ''")
+        statements = [
+            f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+                title, body, user_id UNINDEXED, created_at UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2')""",
+            f"""CREATE TRIGGER IF NOT EXISTS steganography_results_search_insert
+                AFTER INSERT ON steganography_results BEGIN
+                INSERT INTO {SEARCH_TABLE}(rowid, title, body, user_id, created_at) SELECT {stego_document};
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS steganography_results_search_update
+                AFTER UPDATE OF extracted_text, file_name, user_id ON steganography_results BEGIN
+                DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * 2;
+                INSERT INTO {SEARCH_TABLE}(rowid, title, body, user_id, created_at) SELECT {stego_document};
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS steganography_results_search_delete
+                AFTER DELETE ON steganography_results BEGIN
+                DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * 2;
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS osint_collections_search_delete
+                AFTER DELETE ON osint_collections BEGIN
+                DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * 2 + 1;
+                END""",
+        ]
+        try:
+            with engine.begin() as conn:
+                for statement in statements:
+                    conn.exec_driver_sql(statement)
+            return True
+        except Exception as e:
+            print(f"Full-text search unavailable (SQLite built without FTS5?): {e}")
+            return False
     
     def get_db(self):
         """Get database session"""
@@ -197,138 +650,1131 @@ class DatabaseService:
         finally:
             pass  # Session will be closed by caller
     
-    def get_or_create_user(self, user_id: str, email: str = None):
-        """Get existing user or create new one"""
+    def _run(self, query, *args, **kwargs):
+        """Run a query helper `query(db, ...)` in a fresh session"""
         db = self.get_db()
         try:
-            user = db.query(User).filter(User.user_id == user_id).first()
-            if not user:
-                user = User(user_id=user_id, email=email)
-                db.add(user)
-                db.commit()
-                db.refresh(user)
-            return user
+            return query(db, *args, **kwargs)
         finally:
             db.close()
     
+    async def _run_async(self, query, *args, session=None, **kwargs):
+        """
+        Run a query helper without blocking the event loop: on the request's
+        AsyncSession, on a new one, or in a worker thread without an async driver.
+        """
+        if session is not None:
+            return await session.run_sync(query, *args, **kwargs)
+        if AsyncSessionLocal is None:
+            return await asyncio.to_thread(self._run, query, *args, **kwargs)
+        async with AsyncSessionLocal() as new_session:
+            return await new_session.run_sync(query, *args, **kwargs)
+    
+    def _get_or_create_user(self, db, user_id: str, email: str = None):
+        user = db.query(User).filter(User.user_id == user_id).first()
+        if not user:
+            user = User(user_id=user_id, email=email)
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+        return user
+    
+    def get_or_create_user(self, user_id: str, email: str = None):
+        """Get existing user or create new one"""
+        return self._run(self._get_or_create_user, user_id, email)
+    
+    async def get_or_create_user_async(self, user_id: str, email: str = None, session=None):
+        return await self._run_async(self._get_or_create_user, user_id, email, session=session)
+    
+    def _add_social_account(self, db, user_id: str, platform: str, username: str, profile_url: str = None):
+        account = SocialMediaAccount(
+            user_id=user_id,
+            platform=platform,
+            username=username,
+            profile_url=profile_url
+        )
+        db.add(account)
+        db.commit()
+        db.refresh(account)
+        return account
+    
     def add_social_account(self, user_id: str, platform: str, username: str, profile_url: str = None):
         """Link a social media account"""
+        return self._run(self._add_social_account, user_id, platform, username, profile_url)
+    
+    async def add_social_account_async(self, user_id: str, platform: str, username: str,
+                                       profile_url: str = None, session=None):
+        return await self._run_async(self._add_social_account, user_id, platform, username, profile_url,
+                                     session=session)
+    
+    def _store_payload(self, db, payload: EncodedPayload):
+        """Insert a payload blob or take another reference to identical content (caller commits)"""
+        updated = db.query(PayloadBlob).filter(PayloadBlob.content_hash == payload.content_hash).update(
+            {PayloadBlob.ref_count: PayloadBlob.ref_count + 1}, synchronize_session=False
+        )
+        if not updated:
+            db.add(PayloadBlob(content_hash=payload.content_hash, codec=payload.codec, size=payload.size,
+                               stored_size=len(payload.data), data=payload.data))
+            db.flush()
+    
+    def _index_osint_collection(self, db, collection: OSINTCollection, search_text: str):
+        """Add an OSINT collection to the search index (caller commits)"""
+        if not self.search_enabled:
+            return
+        db.execute(text(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, title, body, user_id, created_at) "
+            "VALUES (:rowid, :title, :body, :user_id, :created_at)"
+        ), {
+            "rowid": collection.id * 2 + SEARCH_SOURCES["osint"],
+            "title": f"{collection.platform or collection.collection_type}: {collection.target}",
+            "body": search_text,
+            "user_id": collection.user_id,
+            "created_at": collection.created_at.isoformat(sep=" ")
+        })
+    
+    def _log_osint_collection(self, db, user_id: str, collection_type: str, target: str,
+                              payload: EncodedPayload, metadata: dict = None, risk_score: float = 0.0,
+                              platform: str = None, search_text: str = ""):
+        for attempt in range(2):
+            try:
+                self._store_payload(db, payload)
+                collection = OSINTCollection(
+                    user_id=user_id,
+                    collection_type=collection_type,
+                    target=target,
+                    platform=platform,
+                    payload_hash=payload.content_hash,
+                    metadata_extracted=metadata,
+                    risk_score=risk_score
+                )
+                db.add(collection)
+                db.flush()
+                self._index_osint_collection(db, collection, search_text)
+                db.commit()
+                db.refresh(collection)
+                return collection
+            except IntegrityError:
+                # Another request stored the same payload first; retry as a reference
+                db.rollback()
+                if attempt:
+                    raise
+    
+    def log_osint_collection(self, user_id: str, collection_type: str, target: str, 
+                            data: dict, metadata: dict = None, risk_score: float = 0.0, platform: str = None):
+        """Log an OSINT collection (the full result is stored compressed and deduplicated)"""
+        return self._run(self._log_osint_collection, user_id, collection_type, target, encode_payload(data),
+                         metadata, risk_score, platform, osint_search_text(data))
+    
+    async def log_osint_collection_async(self, user_id: str, collection_type: str, target: str,
+                                         data: dict, metadata: dict = None, risk_score: float = 0.0,
+                                         platform: str = None, session=None):
+        # Serializing and compressing a large scan is CPU work; keep it off the event loop
+        payload = await asyncio.to_thread(encode_payload, data)
+        return await self._run_async(self._log_osint_collection, user_id, collection_type, target, payload,
+                                     metadata, risk_score, platform, osint_search_text(data), session=session)
+    
+    def _get_osint_collection(self, db, collection_id: int, user_id: str = None):
+        """(collection, codec, compressed payload or None, legacy inline payload or None)"""
+        query = db.query(OSINTCollection).options(
+            undefer(OSINTCollection.metadata_extracted)
+        ).filter(OSINTCollection.id == collection_id)
+        if user_id is not None:
+            query = query.filter(OSINTCollection.user_id == user_id)
+        collection = query.first()
+        if collection is None:
+            return None
+        if collection.payload_hash:
+            blob = db.query(PayloadBlob).options(undefer(PayloadBlob.data)).filter(
+                PayloadBlob.content_hash == collection.payload_hash
+            ).first()
+            if blob is not None:
+                return collection, blob.codec, blob.data, None
+        return collection, None, None, collection.data
+    
+    def _decode_osint_collection(self, row):
+        if row is None:
+            return None
+        collection, codec, blob, inline = row
+        return collection, decode_payload(codec, blob) if blob is not None else inline
+    
+    def get_osint_collection(self, collection_id: int, user_id: str = None):
+        """One OSINT collection with its full payload: (collection, data) or None"""
+        return self._decode_osint_collection(self._run(self._get_osint_collection, collection_id, user_id))
+    
+    async def get_osint_collection_async(self, collection_id: int, user_id: str = None, session=None):
+        row = await self._run_async(self._get_osint_collection, collection_id, user_id, session=session)
+        return await asyncio.to_thread(self._decode_osint_collection, row)
+    
+    def get_archivable_rows(self, table_name: str, before: datetime, limit: int) -> list:
+        """
+        Oldest rows of an archivable table older than `before`, as column dicts.
+        OSINT payloads are decoded into "data" so segments are self-contained.
+        """
+        model, time_column = ARCHIVE_TABLES[table_name]
         db = self.get_db()
         try:
-            account = SocialMediaAccount(
-                user_id=user_id,
-                platform=platform,
-                username=username,
-                profile_url=profile_url
-            )
-            db.add(account)
+            query = db.query(model).filter(time_column < before)
+            if model is OSINTCollection:
+                query = query.options(undefer(OSINTCollection.data), undefer(OSINTCollection.metadata_extracted))
+            rows = query.order_by(time_column, model.id).limit(limit).all()
+            records = [{column.key: getattr(row, column.key) for column in model.__table__.columns} for row in rows]
+            if model is OSINTCollection:
+                hashes = {r["payload_hash"] for r in records if r["payload_hash"]}
+                blobs = {
+                    blob.content_hash: blob for blob in db.query(PayloadBlob).options(undefer(PayloadBlob.data)).filter(
+                        PayloadBlob.content_hash.in_(hashes)
+                    )
+                } if hashes else {}
+                for record in records:
+                    blob = blobs.get(record["payload_hash"])
+                    if blob is not None:
+                        record["data"] = decode_payload(blob.codec, blob.data)
+            return records
+        finally:
+            db.close()
+    
+    def iter_export_rows(self, dataset: str, filters: dict = None, start: datetime = None, end: datetime = None,
+                         batch_size: int = 1000, include_payloads: bool = True):
+        """
+        Stream every row of an export dataset as batches of column dicts, oldest
+        first, through a server-side cursor (one batch in memory at a time).
+        OSINT payloads are decoded into "data" unless include_payloads is False.
+        """
+        model, time_column, _ = EXPORT_TABLES[dataset]
+        columns = [c for c in model.__table__.columns
+                   if not (model is OSINTCollection and c.key == "data" and not include_payloads)]
+        query = select(*columns)
+        if model is OSINTCollection and include_payloads:
+            query = query.add_columns(
+                PayloadBlob.codec.label("payload_codec"), PayloadBlob.data.label("payload_data")
+            ).outerjoin(PayloadBlob, PayloadBlob.content_hash == OSINTCollection.payload_hash)
+        for key, value in (filters or {}).items():
+            query = query.where(model.__table__.c[key] == value)
+        if start is not None:
+            query = query.where(time_column >= start)
+        if end is not None:
+            query = query.where(time_column < end)
+        # (time, id) order is served by an index, so SQLite never sorts the whole table
+        query = query.order_by(time_column, model.id).execution_options(yield_per=batch_size)
+        
+        db = self.get_db()
+        try:
+            for partition in db.execute(query).partitions():
+                records = []
+                for row in partition:
+                    record = row._asdict()
+                    codec, data = record.pop("payload_codec", None), record.pop("payload_data", None)
+                    if codec is not None:
+                        record["data"] = decode_payload(codec, data)
+                    records.append(record)
+                yield records
+        finally:
+            db.close()
+    
+    def commit_archive_segment(self, table_name: str, segment: dict, users: list, ids: list,
+                               payload_hashes: list = None, file_paths: list = None):
+        """
+        Register a written segment and delete its rows from the hot table in one
+        transaction; payload blob references held by the rows are released and
+        the upload files they point at (file_paths) stay pinned.
+        """
+        model, _ = ARCHIVE_TABLES[table_name]
+        db = self.get_db()
+        try:
+            archived = ArchiveSegment(table_name=table_name, **segment)
+            db.add(archived)
+            db.flush()
+            for user in users:
+                db.add(ArchiveSegmentUser(segment_id=archived.id, table_name=table_name, **user))
+            for path in file_paths or []:
+                db.add(ArchivedFileReference(path=path, segment_id=archived.id, table_name=table_name))
+            for start in range(0, len(ids), 500):
+                db.query(model).filter(model.id.in_(ids[start:start + 500])).delete(synchronize_session=False)
+            for content_hash in payload_hashes or []:
+                db.query(PayloadBlob).filter(PayloadBlob.content_hash == content_hash).update(
+                    {PayloadBlob.ref_count: PayloadBlob.ref_count - 1}, synchronize_session=False
+                )
+            if payload_hashes:
+                db.query(PayloadBlob).filter(
+                    PayloadBlob.content_hash.in_(set(payload_hashes)),
+                    PayloadBlob.ref_count <= 0
+                ).delete(synchronize_session=False)
             db.commit()
-            db.refresh(account)
-            return account
+            return archived.id
         finally:
             db.close()
     
-    def log_osint_collection(self, user_id: str, collection_type: str, target: str, 
-                            data: dict, metadata: dict = None, risk_score: float = 0.0, platform: str = None):
-        """Log an OSINT collection"""
+    def find_archive_segments(self, table_name: str, user_id: str, before: datetime = None):
+        """Segments holding a user's rows (at or before `before`), newest first"""
         db = self.get_db()
         try:
-            collection = OSINTCollection(
-                user_id=user_id,
-                collection_type=collection_type,
-                target=target,
-                platform=platform,
-                data=data,
-                metadata_extracted=metadata,
-                risk_score=risk_score
+            query = db.query(ArchiveSegment).join(
+                ArchiveSegmentUser, ArchiveSegmentUser.segment_id == ArchiveSegment.id
+            ).filter(
+                ArchiveSegmentUser.table_name == table_name,
+                ArchiveSegmentUser.user_id == user_id
             )
-            db.add(collection)
+            if before is not None:
+                query = query.filter(ArchiveSegmentUser.min_time <= before)
+            return query.order_by(ArchiveSegmentUser.max_time.desc()).all()
+        finally:
+            db.close()
+    
+    def find_archive_segments_for_id(self, table_name: str, row_id: int):
+        """Segments whose id range covers an archived row"""
+        db = self.get_db()
+        try:
+            return db.query(ArchiveSegment).filter(
+                ArchiveSegment.table_name == table_name,
+                ArchiveSegment.min_id <= row_id,
+                ArchiveSegment.max_id >= row_id
+            ).all()
+        finally:
+            db.close()
+    
+    def search_index_empty(self) -> bool:
+        if not self.search_enabled:
+            return False
+        with engine.connect() as conn:
+            return conn.exec_driver_sql(f"SELECT 1 FROM {SEARCH_TABLE} LIMIT 1").first() is None
+    
+    def rebuild_search_index(self, batch_size: int = 500) -> int:
+        """Re-index every stego result and OSINT collection; returns documents indexed"""
+        if not self.search_enabled:
+            return 0
+        db = self.get_db()
+        try:
+            db.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+            indexed = db.execute(text(
+                f"INSERT INTO {SEARCH_TABLE}(rowid, title, body, user_id, created_at) "
+                "SELECT id * 2, file_name, extracted_text, user_id, analyzed_at FROM steganography_results "
+                "WHERE extracted_text IS NOT NULL AND extracted_text != ''"
+            )).rowcount
+            last_id = 0
+            while True:
+                collections = db.query(OSINTCollection).options(undefer(OSINTCollection.data)).filter(
+                    OSINTCollection.id > last_id
+                ).order_by(OSINTCollection.id).limit(batch_size).all()
+                if not collections:
+                    break
+                hashes = {c.payload_hash for c in collections if c.payload_hash}
+                blobs = {
+                    blob.content_hash: blob for blob in db.query(PayloadBlob).options(undefer(PayloadBlob.data)).filter(
+                        PayloadBlob.content_hash.in_(hashes)
+                    )
+                } if hashes else {}
+                for collection in collections:
+                    blob = blobs.get(collection.payload_hash)
+                    payload = decode_payload(blob.codec, blob.data) if blob is not None else collection.data
+                    self._index_osint_collection(db, collection, osint_search_text(payload))
+                indexed += len(collections)
+                last_id = collections[-1].id
             db.commit()
-            db.refresh(collection)
-            return collection
+            return indexed
+        finally:
+            db.close()
+    
+    def _search(self, db, query: str, user_id: str = None, source: str = None, limit: int = 20, offset: int = 0,
+                raw: bool = False):
+        match = query if raw else fts_query(query)
+        if not match:
+            return []
+        filters = ""
+        params = {"match": match, "limit": limit, "offset": offset,
+                  "open": SEARCH_MARK_OPEN, "close": SEARCH_MARK_CLOSE}
+        if user_id is not None:
+            filters += " AND user_id = :user_id"
+            params["user_id"] = user_id
+        if source is not None:
+            filters += " AND rowid % 2 = :source"
+            params["source"] = SEARCH_SOURCES[source]
+        # Title matches weigh four times as much as body matches
+        rows = db.execute(text(
+            f"SELECT rowid, user_id, created_at, bm25({SEARCH_TABLE}, 4.0, 1.0) AS score, "
+            f"highlight({SEARCH_TABLE}, 0, :open, :close) AS title, "
+            f"snippet({SEARCH_TABLE}, 1, :open, :close, '…', 24) AS snippet "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match{filters} "
+            "ORDER BY score LIMIT :limit OFFSET :offset"
+        ), params).all()
+        sources = {number: name for name, number in SEARCH_SOURCES.items()}
+        return [{
+            "source": sources[row.rowid % 2],
+            "id": row.rowid // 2,
+            "user_id": row.user_id,
+            "title": row.title,
+            "snippet": row.snippet,
+            "score": round(-row.score, 4),
+            "created_at": row.created_at
+        } for row in rows]
+    
+    def search(self, query: str, user_id: str = None, source: str = None, limit: int = 20, offset: int = 0,
+               raw: bool = False):
+        """
+        Ranked full-text search over stego text and OSINT captions. Matches in
+        title/snippet are wrapped in SEARCH_MARK_OPEN / SEARCH_MARK_CLOSE.
+        """
+        return self._run(self._search, query, user_id, source, limit, offset, raw)
+    
+    async def search_async(self, query: str, user_id: str = None, source: str = None, limit: int = 20,
+                           offset: int = 0, raw: bool = False, session=None):
+        return await self._run_async(self._search, query, user_id, source, limit, offset, raw, session=session)
+    
+    def migrate_inline_payloads(self, batch_size: int = 200) -> int:
+        """
+        Move payloads of rows written before payload_blobs into the blob table.
+        Returns the number of rows migrated (run VACUUM afterwards to shrink the file).
+        """
+        migrated = 0
+        while True:
+            db = self.get_db()
+            try:
+                collections = db.query(OSINTCollection).options(undefer(OSINTCollection.data)).filter(
+                    OSINTCollection.payload_hash.is_(None),
+                    OSINTCollection.data.isnot(None)
+                ).limit(batch_size).all()
+                for collection in collections:
+                    payload = encode_payload(collection.data)
+                    self._store_payload(db, payload)
+                    collection.payload_hash = payload.content_hash
+                    collection.data = null()  # SQL NULL rather than JSON 'null'
+                db.commit()
+            finally:
+                db.close()
+            migrated += len(collections)
+            if len(collections) < batch_size:
+                return migrated
+    
+    def legacy_telemetry_tables(self) -> list:
+        """Telemetry tables that older versions left in the core database"""
+        if not SEPARATE_TELEMETRY:
+            return []
+        inspector = inspect(engine)
+        return [table.name for table in TelemetryBase.metadata.sorted_tables if inspector.has_table(table.name)]
+    
+    def migrate_telemetry_tables(self, batch_size: int = 5000, drop: bool = False) -> dict:
+        """
+        Copy visitor logs and rollups left in the core database by older
+        versions into the telemetry database (see migrate_telemetry.py).
+        
+        Safe to re-run: logs already copied are recognized and skipped, and a
+        log whose id the telemetry database has since given to a newer row is
+        copied under a new id. Core rollups are merged into the telemetry
+        rollups only together with dropping them, so they are added once;
+        without core rollups, copied logs are rolled up as they are copied.
+        With drop=True, each core table is dropped only after all of its rows
+        are verified in the telemetry database.
+        
+        Returns:
+            {table: {"rows", "copied", "missing", "dropped"}} for each core table found
+        """
+        report = {}
+        legacy = self.legacy_telemetry_tables()
+        logs, rollups = ReverseOSINTLog.__tablename__, VisitorRollup.__tablename__
+        if logs in legacy:
+            rows, copied, _ = self._copy_visitor_logs(batch_size, roll_up=rollups not in legacy)
+            _, _, missing = self._copy_visitor_logs(batch_size, copy=False)
+            report[logs] = {"rows": rows, "copied": copied, "missing": missing, "dropped": drop and not missing}
+            if report[logs]["dropped"]:
+                with engine.begin() as conn:
+                    conn.execute(text(f"DROP TABLE {logs}"))
+        if rollups in legacy:
+            with engine.connect() as conn:
+                rows = conn.execute(select(func.count()).select_from(VisitorRollup.__table__)).scalar()
+            report[rollups] = {"rows": rows, "copied": 0, "missing": 0, "dropped": False}
+            if drop and (logs not in report or report[logs]["dropped"]):
+                copied, missing = self._merge_legacy_rollups()
+                report[rollups].update(copied=copied, missing=missing, dropped=not missing)
+                if not missing:
+                    with engine.begin() as conn:
+                        conn.execute(text(f"DROP TABLE {rollups}"))
+        return report
+    
+    def _copy_visitor_logs(self, batch_size: int, roll_up: bool = False, copy: bool = True):
+        """
+        Look for every core visitor log in the telemetry database, inserting the
+        ones not found when `copy` is set (and adding them to the rollups when
+        `roll_up` is set, in the same transaction). Returns (rows, copied, missing).
+        """
+        table = ReverseOSINTLog.__table__
+        rows = copied = missing = 0
+        with engine.connect() as source:
+            result = source.execute(select(table).order_by(table.c.id).execution_options(yield_per=batch_size))
+            for partition in result.partitions():
+                records = [row._asdict() for row in partition]
+                rows += len(records)
+                with telemetry_engine.begin() as conn:
+                    existing = {row.id: row._asdict() for row in conn.execute(
+                        select(table).where(table.c.id.in_([r["id"] for r in records]))
+                    )}
+                    same_id, new_id = [], []
+                    for record in records:
+                        current = existing.get(record["id"])
+                        if current is None:
+                            same_id.append(record)
+                        elif current != record and not self._has_visitor_log(conn, record):
+                            new_id.append({key: value for key, value in record.items() if key != "id"})
+                    if not copy:
+                        missing += len(same_id) + len(new_id)
+                        continue
+                    for pending in (same_id, new_id):
+                        if pending:
+                            conn.execute(insert(table), pending)
+                    copied += len(same_id) + len(new_id)
+                    if roll_up and (same_id or new_id):
+                        with self._rollup_lock:
+                            db = Session(bind=conn)
+                            self._apply_visitor_rollups(db, self._rollup_deltas(same_id + new_id))
+                            db.flush()
+        return rows, copied, missing
+    
+    def _has_visitor_log(self, conn, record: dict) -> bool:
+        """True if the telemetry database holds a log equal to `record` under any id"""
+        table = ReverseOSINTLog.__table__
+        keys = ("ip_address", "timestamp", "accessed_resource", "device_fingerprint", "session_id")
+        conditions = [table.c[key].is_(None) if record[key] is None else table.c[key] == record[key] for key in keys]
+        for row in conn.execute(select(table).where(*conditions)):
+            candidate = row._asdict()
+            candidate["id"] = record["id"]
+            if candidate == record:
+                return True
+        return False
+    
+    def _merge_legacy_rollups(self):
+        """Add the core rollups to the telemetry rollups in one transaction; returns (merged, missing)"""
+        with engine.connect() as source:
+            legacy = [row._asdict() for row in source.execute(select(VisitorRollup.__table__))]
+        deltas = {}
+        for row in legacy:
+            deltas[(row["granularity"], row["bucket_start"])] = {
+                "visits": row["visits"] or 0,
+                "suspicious": row["suspicious"] or 0,
+                "countries": row["countries"] or {},
+                "sketch": HyperLogLog.from_bytes(row["ip_sketch"]) if row["ip_sketch"] else HyperLogLog(),
+                **{column: row[column] or 0 for column in ROLLUP_THREAT_COLUMNS.values()}
+            }
+        with telemetry_engine.begin() as conn, self._rollup_lock:
+            db = Session(bind=conn)
+            self._apply_visitor_rollups(db, deltas)
+            db.flush()
+        # Every core bucket must now exist with at least its core visit count
+        with telemetry_engine.connect() as conn:
+            merged = {(row.granularity, row.bucket_start): row.visits or 0 for row in conn.execute(
+                select(VisitorRollup.granularity, VisitorRollup.bucket_start, VisitorRollup.visits)
+            )}
+        missing = sum(1 for key, delta in deltas.items() if merged.get(key, -1) < delta["visits"])
+        return len(deltas), missing
+    
+    def insert_visitor_logs(self, records: list) -> int:
+        """
+        Write many visitor logs with a single multi-row INSERT (one commit).
+        
+        Args:
+            records: dicts keyed by ReverseOSINTLog column names
+        """
+        if not records:
+            return 0
+        for attempt in range(2):
+            db = self.get_db()
+            try:
+                with self._rollup_lock:
+                    db.execute(insert(ReverseOSINTLog).values(records))
+                    # Rollups commit with the rows they count
+                    self._apply_visitor_rollups(db, self._rollup_deltas(records))
+                    db.commit()
+                return len(records)
+            except IntegrityError:
+                # Another process created the same rollup bucket first
+                db.rollback()
+                if attempt:
+                    raise
+            finally:
+                db.close()
+    
+    def _rollup_deltas(self, records) -> dict:
+        """Aggregate visitor records into {(granularity, bucket_start): delta}"""
+        deltas = {}
+        now = datetime.utcnow()
+        for record in records:
+            timestamp = record.get("timestamp") or now
+            for key in (("hour", hour_bucket(timestamp)), ("total", ROLLUP_TOTAL_BUCKET)):
+                delta = deltas.get(key)
+                if delta is None:
+                    delta = deltas[key] = {"visits": 0, "suspicious": 0, "countries": {}, "sketch": HyperLogLog(),
+                                           **{column: 0 for column in ROLLUP_THREAT_COLUMNS.values()}}
+                delta["visits"] += 1
+                if record.get("is_suspicious"):
+                    delta["suspicious"] += 1
+                threat_column = ROLLUP_THREAT_COLUMNS.get(record.get("threat_level"))
+                if threat_column:
+                    delta[threat_column] += 1
+                country = record.get("country")
+                if country:
+                    delta["countries"][country] = delta["countries"].get(country, 0) + 1
+                if record.get("ip_address"):
+                    delta["sketch"].add(record["ip_address"])
+        return deltas
+    
+    def _apply_visitor_rollups(self, db, deltas: dict):
+        """Add aggregated deltas to their rollup rows (read-modify-write, caller commits)"""
+        for (granularity, bucket_start), delta in deltas.items():
+            rollup = db.query(VisitorRollup).filter(
+                VisitorRollup.granularity == granularity,
+                VisitorRollup.bucket_start == bucket_start
+            ).with_for_update().first()
+            if rollup is None:
+                rollup = VisitorRollup(granularity=granularity, bucket_start=bucket_start, visits=0, suspicious=0,
+                                       countries={}, **{column: 0 for column in ROLLUP_THREAT_COLUMNS.values()})
+                db.add(rollup)
+            rollup.visits += delta["visits"]
+            rollup.suspicious += delta["suspicious"]
+            for column in ROLLUP_THREAT_COLUMNS.values():
+                setattr(rollup, column, getattr(rollup, column) + delta[column])
+            countries = dict(rollup.countries or {})
+            for country, visits in delta["countries"].items():
+                countries[country] = countries.get(country, 0) + visits
+            rollup.countries = countries  # Reassign so the JSON change is detected
+            sketch = delta["sketch"]
+            if rollup.ip_sketch:
+                sketch.merge(HyperLogLog.from_bytes(rollup.ip_sketch))
+            rollup.ip_sketch = sketch.to_bytes()
+            rollup.updated_at = datetime.utcnow()
+    
+    def rebuild_visitor_rollups(self, batch_size: int = 5000) -> int:
+        """
+        Recompute all rollups from the raw logs still retained (for databases
+        that predate rollups). Returns the number of logs counted.
+        """
+        columns = (ReverseOSINTLog.timestamp, ReverseOSINTLog.ip_address, ReverseOSINTLog.country,
+                   ReverseOSINTLog.is_suspicious, ReverseOSINTLog.threat_level)
+        db = self.get_db()
+        try:
+            with self._rollup_lock:
+                deltas = {}
+                counted = 0
+                rows = db.execute(select(*columns).order_by(ReverseOSINTLog.id).execution_options(yield_per=batch_size))
+                for partition in rows.partitions():
+                    records = [row._asdict() for row in partition]
+                    counted += len(records)
+                    for key, delta in self._rollup_deltas(records).items():
+                        if key not in deltas:
+                            deltas[key] = delta
+                            continue
+                        merged = deltas[key]
+                        for field, value in delta.items():
+                            if field == "sketch":
+                                merged["sketch"].merge(value)
+                            elif field == "countries":
+                                for country, visits in value.items():
+                                    merged["countries"][country] = merged["countries"].get(country, 0) + visits
+                            else:
+                                merged[field] += value
+                db.execute(delete(VisitorRollup))
+                self._apply_visitor_rollups(db, deltas)
+                db.commit()
+                return counted
         finally:
             db.close()
     
-    def log_visitor(self, ip: str, user_agent: str, fingerprint: str, 
-                   resource: str, geo_data: dict = None, is_suspicious: bool = False):
-        """Log a visitor for reverse OSINT"""
+    def has_visitor_rollups(self) -> bool:
+        """True if rollups exist, or there are no logs to roll up"""
         db = self.get_db()
         try:
-            log = ReverseOSINTLog(
-                ip_address=ip,
-                user_agent=user_agent,
-                device_fingerprint=fingerprint,
-                accessed_resource=resource,
-                is_suspicious=is_suspicious,
-                country=geo_data.get("country") if geo_data else None,
-                city=geo_data.get("city") if geo_data else None,
-                latitude=geo_data.get("latitude") if geo_data else None,
-                longitude=geo_data.get("longitude") if geo_data else None
-            )
-            db.add(log)
+            if db.query(VisitorRollup.id).first() is not None:
+                return True
+            return db.query(ReverseOSINTLog.id).first() is None
+        finally:
+            db.close()
+    
+    def _get_visitor_rollups(self, db, granularity: str = "hour", since: datetime = None):
+        query = db.query(VisitorRollup).filter(VisitorRollup.granularity == granularity)
+        if since is not None:
+            query = query.filter(VisitorRollup.bucket_start >= since)
+        return query.order_by(VisitorRollup.bucket_start).all()
+    
+    def get_visitor_rollups(self, granularity: str = "hour", since: datetime = None):
+        """Rollup rows of one granularity, oldest first ("total" has a single row)"""
+        return self._run(self._get_visitor_rollups, granularity, since)
+    
+    async def get_visitor_rollups_async(self, granularity: str = "hour", since: datetime = None, session=None):
+        return await self._run_async(self._get_visitor_rollups, granularity, since, session=session)
+    
+    def prune_visitor_logs(self, before: datetime, batch_size: int = 5000) -> int:
+        """
+        Delete raw visitor logs older than `before` in short batches so the
+        log writer is never locked out for long. Rollups are kept.
+        """
+        deleted = 0
+        while True:
+            db = self.get_db()
+            try:
+                ids = select(ReverseOSINTLog.id).where(ReverseOSINTLog.timestamp < before).limit(batch_size)
+                removed = db.execute(delete(ReverseOSINTLog).where(ReverseOSINTLog.id.in_(ids))).rowcount
+                db.commit()
+            finally:
+                db.close()
+            deleted += removed
+            if removed < batch_size:
+                return deleted
+    
+    def prune_visitor_rollups(self, before: datetime) -> int:
+        """Delete hourly rollups that start before `before` (the all-time row stays)"""
+        db = self.get_db()
+        try:
+            removed = db.execute(delete(VisitorRollup).where(
+                VisitorRollup.granularity == "hour",
+                VisitorRollup.bucket_start < before
+            )).rowcount
+            db.commit()
+            return removed
+        finally:
+            db.close()
+    
+    def _stego_row(self, user_id: str, file_path: str, file_name: str,
+                   has_hidden_data: bool, confidence: float, method: str, file_size: int = None,
+                   extracted_text: str = None, extracted_coords: str = None,
+                   heatmap_path: str = None, statistical_analysis: dict = None,
+                   content_hash: str = None, cache_key: str = None, analysis_result: dict = None):
+        return SteganographyResult(
+            user_id=user_id,
+            file_path=file_path,
+            file_name=file_name,
+            file_size=file_size,
+            has_hidden_data=has_hidden_data,
+            confidence_score=confidence,
+            detection_method=method,
+            extracted_text=extracted_text,
+            extracted_coordinates=extracted_coords,
+            heatmap_path=heatmap_path,
+            statistical_analysis=statistical_analysis,
+            content_hash=content_hash,
+            cache_key=cache_key,
+            analysis_result=analysis_result
+        )
+    
+    def _save_row(self, db, row):
+        db.add(row)
+        db.commit()
+        db.refresh(row)
+        return row
+    
+    def save_stego_result(self, *args, **kwargs):
+        """Save steganography analysis result (arguments as in _stego_row)"""
+        return self._run(self._save_row, self._stego_row(*args, **kwargs))
+    
+    async def save_stego_result_async(self, *args, session=None, **kwargs):
+        return await self._run_async(self._save_row, self._stego_row(*args, **kwargs), session=session)
+    
+    def add_file_reference(self, content_hash: str, path: str, size: int,
+                           content_type: str = None, filename: str = None):
+        """
+        Register a stored file or take another reference to existing content.
+        Returns (StoredFile, created).
+        """
+        for _ in range(2):
+            db = self.get_db()
+            try:
+                # Atomic increment; falls through to an insert for new content
+                updated = db.query(StoredFile).filter(StoredFile.content_hash == content_hash).update(
+                    {StoredFile.ref_count: StoredFile.ref_count + 1}, synchronize_session=False
+                )
+                created = not updated
+                if created:
+                    db.add(StoredFile(content_hash=content_hash, path=path, size=size,
+                                      content_type=content_type, original_filename=filename))
+                db.commit()
+                stored = db.query(StoredFile).filter(StoredFile.content_hash == content_hash).first()
+                return stored, created
+            except IntegrityError:
+                # Another request registered the same content first; retry as a reference
+                db.rollback()
+            finally:
+                db.close()
+        raise RuntimeError(f"Could not register stored file {content_hash}")
+    
+    def release_file_reference(self, content_hash: str):
+        """Drop one reference; returns (path, remaining ref_count) or None if unknown"""
+        db = self.get_db()
+        try:
+            stored = db.query(StoredFile).filter(StoredFile.content_hash == content_hash).first()
+            if not stored:
+                return None
+            remaining = max((stored.ref_count or 0) - 1, 0)
+            path = stored.path
+            if remaining == 0:
+                db.delete(stored)
+            else:
+                stored.ref_count = remaining
             db.commit()
-            db.refresh(log)
-            return log
+            return path, remaining
         finally:
             db.close()
     
-    def save_stego_result(self, user_id: str, file_path: str, file_name: str,
-                         has_hidden_data: bool, confidence: float, method: str,
-                         extracted_text: str = None, extracted_coords: str = None):
-        """Save steganography analysis result"""
+    def enqueue_replication(self, content_hash: str, local_path: str, object_key: str,
+                            backend: str, content_type: str = None):
+        """Add a replication job (one per content hash and backend)"""
         db = self.get_db()
         try:
-            result = SteganographyResult(
-                user_id=user_id,
-                file_path=file_path,
-                file_name=file_name,
-                has_hidden_data=has_hidden_data,
-                confidence_score=confidence,
-                detection_method=method,
-                extracted_text=extracted_text,
-                extracted_coordinates=extracted_coords
+            existing = db.query(ReplicationJob).filter(
+                ReplicationJob.content_hash == content_hash,
+                ReplicationJob.backend == backend,
+                ReplicationJob.status != "failed"
+            ).first()
+            if existing:
+                return existing
+            job = ReplicationJob(content_hash=content_hash, local_path=local_path, object_key=object_key,
+                                 backend=backend, content_type=content_type)
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            return job
+        finally:
+            db.close()
+    
+    def claim_replication_jobs(self, backend: str, limit: int):
+        """Mark up to `limit` due jobs as in_progress and return them"""
+        db = self.get_db()
+        try:
+            now = datetime.utcnow()
+            candidates = db.query(ReplicationJob.id).filter(
+                ReplicationJob.backend == backend,
+                ReplicationJob.status == "pending",
+                ReplicationJob.next_attempt_at <= now
+            ).order_by(ReplicationJob.next_attempt_at).limit(limit).all()
+            claimed = []
+            for (job_id,) in candidates:
+                # Conditional update so concurrent workers never claim the same job
+                updated = db.query(ReplicationJob).filter(
+                    ReplicationJob.id == job_id,
+                    ReplicationJob.status == "pending"
+                ).update({ReplicationJob.status: "in_progress", ReplicationJob.updated_at: now},
+                         synchronize_session=False)
+                db.commit()
+                if updated:
+                    claimed.append(job_id)
+            if not claimed:
+                return []
+            return db.query(ReplicationJob).filter(ReplicationJob.id.in_(claimed)).all()
+        finally:
+            db.close()
+    
+    def finish_replication_job(self, job_id: int, error: str = None, retry_at: datetime = None):
+        """Record a job outcome: done, retry later (retry_at) or failed"""
+        db = self.get_db()
+        try:
+            job = db.query(ReplicationJob).filter(ReplicationJob.id == job_id).first()
+            if not job:
+                return None
+            job.updated_at = datetime.utcnow()
+            if error is None:
+                job.status = "done"
+                job.last_error = None
+            else:
+                job.attempts = (job.attempts or 0) + 1
+                job.last_error = error
+                job.status = "pending" if retry_at else "failed"
+                if retry_at:
+                    job.next_attempt_at = retry_at
+            db.commit()
+            return job.status
+        finally:
+            db.close()
+    
+    def reset_stale_replication_jobs(self, backend: str) -> int:
+        """Return jobs left in_progress by a previous process to the queue"""
+        db = self.get_db()
+        try:
+            count = db.query(ReplicationJob).filter(
+                ReplicationJob.backend == backend,
+                ReplicationJob.status == "in_progress"
+            ).update({ReplicationJob.status: "pending"}, synchronize_session=False)
+            db.commit()
+            return count
+        finally:
+            db.close()
+    
+    def count_replication_jobs(self, backend: str, status: str) -> int:
+        db = self.get_db()
+        try:
+            return db.query(ReplicationJob).filter(
+                ReplicationJob.backend == backend,
+                ReplicationJob.status == status
+            ).count()
+        finally:
+            db.close()
+    
+    def upsert_upload_entries(self, entries: list, touches: dict = None):
+        """
+        Insert or refresh upload index rows in one transaction.
+        
+        Args:
+            entries: dicts with path, size, kind, content_hash, last_access
+            touches: {path: last_access} for files that were read again
+        """
+        db = self.get_db()
+        try:
+            for entry in entries:
+                row = db.query(UploadIndexEntry).filter(UploadIndexEntry.path == entry["path"]).first()
+                if row:
+                    row.size = entry["size"]
+                    row.last_access = entry["last_access"]
+                    row.kind = entry.get("kind") or row.kind
+                    row.content_hash = entry.get("content_hash") or row.content_hash
+                else:
+                    db.add(UploadIndexEntry(**entry))
+            for path, accessed in (touches or {}).items():
+                db.query(UploadIndexEntry).filter(
+                    UploadIndexEntry.path == path,
+                    UploadIndexEntry.last_access < accessed
+                ).update({UploadIndexEntry.last_access: accessed}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+    
+    def set_upload_pinned(self, path: str, pinned: bool = True) -> bool:
+        db = self.get_db()
+        try:
+            updated = db.query(UploadIndexEntry).filter(UploadIndexEntry.path == path).update(
+                {UploadIndexEntry.pinned: pinned}, synchronize_session=False
             )
-            db.add(result)
             db.commit()
-            db.refresh(result)
-            return result
+            return bool(updated)
         finally:
             db.close()
     
-    def get_visitor_logs(self, limit: int = 100, suspicious_only: bool = False):
-        """Get visitor logs for reverse OSINT dashboard"""
+    def get_upload_usage(self) -> int:
+        """Total bytes tracked in the upload index"""
         db = self.get_db()
         try:
-            query = db.query(ReverseOSINTLog)
-            if suspicious_only:
-                query = query.filter(ReverseOSINTLog.is_suspicious == True)
-            logs = query.order_by(ReverseOSINTLog.timestamp.desc()).limit(limit).all()
-            return logs
+            return int(db.query(func.coalesce(func.sum(UploadIndexEntry.size), 0)).scalar())
         finally:
             db.close()
     
-    def get_social_accounts(self, user_id: str):
-        """Get all social media accounts for a user"""
+    def get_indexed_upload_paths(self) -> set:
         db = self.get_db()
         try:
-            accounts = db.query(SocialMediaAccount).filter(
-                SocialMediaAccount.user_id == user_id,
-                SocialMediaAccount.is_active == True
-            ).all()
-            return accounts
+            return {path for (path,) in db.query(UploadIndexEntry.path).yield_per(5000)}
         finally:
             db.close()
     
-    def get_osint_history(self, user_id: str, limit: int = 50):
-        """Get OSINT collection history"""
+    def get_eviction_candidates(self, limit: int, accessed_before: datetime = None):
+        """
+        Least recently used unpinned files, as (path, size) tuples.
+        Files referenced by a steganography result (upload or heatmap), hot or
+        archived, or by a scan result's heatmap count as pinned.
+        """
+        # Scan results keep heatmaps as /uploads/<name> URLs of files directly in UPLOAD_DIR
+        upload_dir = os.path.join(settings.UPLOAD_DIR, "")
+        heatmap_url = literal("/uploads/") + func.substr(UploadIndexEntry.path, len(upload_dir) + 1)
         db = self.get_db()
         try:
-            collections = db.query(OSINTCollection).filter(
-                OSINTCollection.user_id == user_id
-            ).order_by(OSINTCollection.created_at.desc()).limit(limit).all()
-            return collections
+            referenced = db.query(SteganographyResult.id).filter(
+                (SteganographyResult.file_path == UploadIndexEntry.path) |
+                (SteganographyResult.heatmap_path == UploadIndexEntry.path)
+            ).exists()
+            scan_referenced = db.query(ScanResult.id).filter(ScanResult.heatmap_path == heatmap_url).exists()
+            archive_referenced = db.query(ArchivedFileReference.id).filter(
+                ArchivedFileReference.path == UploadIndexEntry.path
+            ).exists()
+            query = db.query(UploadIndexEntry.path, UploadIndexEntry.size).filter(
+                UploadIndexEntry.pinned.isnot(True),
+                ~referenced,
+                ~scan_referenced,
+                ~archive_referenced
+            )
+            if accessed_before is not None:
+                query = query.filter(UploadIndexEntry.last_access < accessed_before)
+            return [(path, size) for path, size in query.order_by(UploadIndexEntry.last_access).limit(limit)]
         finally:
             db.close()
+    
+    def remove_upload_entries(self, paths: list):
+        """Drop index rows (and content-store rows) for files that were deleted"""
+        if not paths:
+            return
+        db = self.get_db()
+        try:
+            db.query(UploadIndexEntry).filter(UploadIndexEntry.path.in_(paths)).delete(synchronize_session=False)
+            db.query(StoredFile).filter(StoredFile.path.in_(paths)).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+    
+    def _get_cached_stego_result(self, db, cache_key: str):
+        row = db.query(SteganographyResult.analysis_result).filter(
+            SteganographyResult.cache_key == cache_key,
+            SteganographyResult.analysis_result.isnot(None)
+        ).order_by(SteganographyResult.id.desc()).first()
+        return row[0] if row else None
+    
+    def get_cached_stego_result(self, cache_key: str):
+        """Get the most recent full analysis stored under a cache key"""
+        return self._run(self._get_cached_stego_result, cache_key)
+    
+    async def get_cached_stego_result_async(self, cache_key: str, session=None):
+        return await self._run_async(self._get_cached_stego_result, cache_key, session=session)
+    
+    def _get_stego_history(self, db, user_id: str, limit: int = 50, cursor: str = None):
+        query = db.query(SteganographyResult).filter(SteganographyResult.user_id == user_id)
+        return keyset_page(query, SteganographyResult.analyzed_at, SteganographyResult.id, limit, cursor).all()
+    
+    def get_stego_history(self, user_id: str, limit: int = 50, cursor: str = None):
+        """Get a user's steganography analyses, newest first, after `cursor`"""
+        return self._run(self._get_stego_history, user_id, limit, cursor)
+    
+    async def get_stego_history_async(self, user_id: str, limit: int = 50, cursor: str = None, session=None):
+        return await self._run_async(self._get_stego_history, user_id, limit, cursor, session=session)
+    
+    def _get_stego_results(self, db, ids: list):
+        return db.query(SteganographyResult).filter(SteganographyResult.id.in_(ids)).all() if ids else []
+    
+    def get_stego_results(self, ids: list):
+        """Get steganography analyses by ID"""
+        return self._run(self._get_stego_results, ids)
+    
+    async def get_stego_results_async(self, ids: list, session=None):
+        return await self._run_async(self._get_stego_results, ids, session=session)
+    
+    def insert_scan_results(self, records: list) -> int:
+        """
+        Write many scan results with a single multi-row INSERT (one commit).
+        
+        Args:
+            records: dicts keyed by ScanResult column names
+        """
+        if not records:
+            return 0
+        db = self.get_db()
+        try:
+            db.execute(insert(ScanResult).values(records))
+            db.commit()
+            return len(records)
+        finally:
+            db.close()
+    
+    def _get_scan_history(self, db, user_id: str, limit: int = 50, cursor: str = None, modality: str = None):
+        query = db.query(ScanResult).filter(ScanResult.user_id == user_id)
+        if modality is not None:
+            query = query.filter(ScanResult.modality == modality)
+        return keyset_page(query, ScanResult.scanned_at, ScanResult.id, limit, cursor).all()
+    
+    def get_scan_history(self, user_id: str, limit: int = 50, cursor: str = None, modality: str = None):
+        """Get a user's deepfake scans, newest first, after `cursor`"""
+        return self._run(self._get_scan_history, user_id, limit, cursor, modality)
+    
+    async def get_scan_history_async(self, user_id: str, limit: int = 50, cursor: str = None,
+                                     modality: str = None, session=None):
+        return await self._run_async(self._get_scan_history, user_id, limit, cursor, modality, session=session)
+    
+    def _get_scan_result(self, db, scan_id: int, user_id: str = None):
+        query = db.query(ScanResult).options(undefer(ScanResult.analysis)).filter(ScanResult.id == scan_id)
+        if user_id is not None:
+            query = query.filter(ScanResult.user_id == user_id)
+        return query.first()
+    
+    def get_scan_result(self, scan_id: int, user_id: str = None):
+        """One scan with its full analysis, or None"""
+        return self._run(self._get_scan_result, scan_id, user_id)
+    
+    async def get_scan_result_async(self, scan_id: int, user_id: str = None, session=None):
+        return await self._run_async(self._get_scan_result, scan_id, user_id, session=session)
+    
+    def _get_cached_scan(self, db, content_hash: str, modality: str, model_version: str):
+        return db.query(ScanResult).options(undefer(ScanResult.analysis)).filter(
+            ScanResult.content_hash == content_hash,
+            ScanResult.modality == modality,
+            ScanResult.model_version == model_version,
+            ScanResult.label != "ERROR"
+        ).order_by(ScanResult.id.desc()).first()
+    
+    def get_cached_scan(self, content_hash: str, modality: str, model_version: str):
+        """Most recent scan of the same content by the same detector version, or None"""
+        return self._run(self._get_cached_scan, content_hash, modality, model_version)
+    
+    async def get_cached_scan_async(self, content_hash: str, modality: str, model_version: str, session=None):
+        return await self._run_async(self._get_cached_scan, content_hash, modality, model_version, session=session)
+    
+    def _get_scan_aggregates(self, db, user_id: str, since: datetime = None):
+        filters = [ScanResult.user_id == user_id]
+        if since is not None:
+            filters.append(ScanResult.scanned_at >= since)
+        
+        # One grouped pass over the user's index range
+        groups = db.query(
+            ScanResult.modality, ScanResult.label, func.count(ScanResult.id),
+            func.avg(ScanResult.score), func.avg(ScanResult.risk_score),
+            func.sum(case((ScanResult.risk_score > HIGH_RISK_SCORE, 1), else_=0))
+        ).filter(*filters).group_by(ScanResult.modality, ScanResult.label).all()
+        day = func.date(ScanResult.scanned_at)
+        daily = db.query(
+            day, func.count(ScanResult.id), func.sum(case((ScanResult.label == "FAKE", 1), else_=0))
+        ).filter(*filters).group_by(day).order_by(day).all()
+        
+        by_modality = {}
+        labels = {}
+        total = high_risk = 0
+        risk_sum = 0.0
+        for modality, label, count, avg_score, avg_risk, high in groups:
+            entry = by_modality.setdefault(modality, {"total": 0, "labels": {}})
+            entry["total"] += count
+            entry["labels"][label] = {"count": count, "avg_score": round(avg_score or 0.0, 2)}
+            labels[label] = labels.get(label, 0) + count
+            total += count
+            high_risk += high or 0
+            risk_sum += (avg_risk or 0.0) * count
+        return {
+            "total_scans": total,
+            "fake_scans": labels.get("FAKE", 0),
+            "labels": labels,
+            "by_modality": by_modality,
+            "avg_risk_score": round(risk_sum / total, 2) if total else 0.0,
+            "high_risk_scans": high_risk,
+            "daily": [{"date": str(date), "scans": count, "fake": fake or 0} for date, count, fake in daily]
+        }
+    
+    def get_scan_aggregates(self, user_id: str, since: datetime = None) -> dict:
+        """Dashboard aggregates over a user's scans (optionally since a time)"""
+        return self._run(self._get_scan_aggregates, user_id, since)
+    
+    async def get_scan_aggregates_async(self, user_id: str, since: datetime = None, session=None) -> dict:
+        return await self._run_async(self._get_scan_aggregates, user_id, since, session=session)
+    
+    def _get_visitor_logs(self, db, limit: int = 100, suspicious_only: bool = False, cursor: str = None):
+        query = db.query(ReverseOSINTLog)
+        if suspicious_only:
+            query = query.filter(ReverseOSINTLog.is_suspicious == True)
+        return keyset_page(query, ReverseOSINTLog.timestamp, ReverseOSINTLog.id, limit, cursor).all()
+    
+    def get_visitor_logs(self, limit: int = 100, suspicious_only: bool = False, cursor: str = None):
+        """Get visitor logs for reverse OSINT dashboard, newest first, after `cursor`"""
+        return self._run(self._get_visitor_logs, limit, suspicious_only, cursor)
+    
+    async def get_visitor_logs_async(self, limit: int = 100, suspicious_only: bool = False, cursor: str = None,
+                                     session=None):
+        return await self._run_async(self._get_visitor_logs, limit, suspicious_only, cursor, session=session)
+    
+    def _get_social_accounts(self, db, user_id: str):
+        return db.query(SocialMediaAccount).filter(
+            SocialMediaAccount.user_id == user_id,
+            SocialMediaAccount.is_active == True
+        ).all()
+    
+    def get_social_accounts(self, user_id: str):
+        """Get all social media accounts for a user"""
+        return self._run(self._get_social_accounts, user_id)
+    
+    async def get_social_accounts_async(self, user_id: str, session=None):
+        return await self._run_async(self._get_social_accounts, user_id, session=session)
+    
+    def _get_osint_history(self, db, user_id: str, limit: int = 50, cursor: str = None):
+        query = db.query(OSINTCollection).filter(OSINTCollection.user_id == user_id)
+        return keyset_page(query, OSINTCollection.created_at, OSINTCollection.id, limit, cursor).all()
+    
+    def get_osint_history(self, user_id: str, limit: int = 50, cursor: str = None):
+        """Get OSINT collection history, newest first, after `cursor`"""
+        return self._run(self._get_osint_history, user_id, limit, cursor)
+    
+    async def get_osint_history_async(self, user_id: str, limit: int = 50, cursor: str = None, session=None):
+        return await self._run_async(self._get_osint_history, user_id, limit, cursor, session=session)
 
 
 # Global instance
@@ -0,0 +1,164 @@
+"""
+Image Derivative Service - Thumbnails and previews of stored images.
+Derivatives are rendered once (lazily on first request, or eagerly on a
+background pool) and cached on disk next to their original as
+<name>.<variant>.<ext>, so they live and die with the upload directory.
+"""
+
+import contextlib
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from app.config import settings
+from app.services.upload_gc import upload_gc
+
+
+class DerivativeService:
+    """Renders and caches fixed-size WebP/JPEG derivatives"""
+
+    # Variant name -> longest edge in pixels
+    VARIANTS = {"thumb": 256, "preview": 1024}
+    # Format name -> (PIL format, media type, extension, save options)
+    FORMATS = {
+        "webp": ("WEBP", "image/webp", ".webp", {"quality": 80, "method": 4}),
+        "jpeg": ("JPEG", "image/jpeg", ".jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    }
+    SOURCE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+    EAGER_WORKERS = 2
+    ETAG_CACHE_SIZE = 4096
+
+    def __init__(self, root: str):
+        self.root = os.path.realpath(root)
+        # Derivative path -> (mtime, etag), least recently used first
+        self._etags: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+        self._etags_lock = threading.Lock()
+        # Render locks exist only while a render of that path is running or waiting: [lock, users]
+        self._locks: Dict[str, List] = {}
+        self._locks_guard = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def resolve_source(self, relative_path: str) -> Optional[str]:
+        """Map a path under /uploads to an original image file (None if not servable)"""
+        path = os.path.realpath(os.path.join(self.root, relative_path))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        name, ext = os.path.splitext(os.path.basename(path))
+        if ext.lower() not in self.SOURCE_EXTENSIONS:
+            return None
+        # Derivatives are not themselves sources
+        if os.path.splitext(name)[1].lstrip(".") in self.VARIANTS:
+            return None
+        return path
+
+    def derivative_path(self, source_path: str, variant: str, fmt: str) -> str:
+        name, _ = os.path.splitext(source_path)
+        return f"{name}.{variant}{self.FORMATS[fmt][2]}"
+
+    def media_type(self, fmt: str) -> str:
+        return self.FORMATS[fmt][1]
+
+    @contextlib.contextmanager
+    def _render_lock(self, path: str):
+        """Serialize renders of one derivative; the lock is dropped once nobody uses it"""
+        with self._locks_guard:
+            entry = self._locks.setdefault(path, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[path]
+
+    def _render(self, source_path: str, target_path: str, variant: str, fmt: str):
+        """Decode, downscale and atomically write one derivative (blocking)"""
+        edge = self.VARIANTS[variant]
+        pil_format, _, _, options = self.FORMATS[fmt]
+        with Image.open(source_path) as img:
+            # JPEG decoders can downscale by 1/2..1/8 during decode
+            img.draft("RGB", (edge, edge))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((edge, edge), Image.LANCZOS)
+            if img.mode not in ("RGB", "RGBA", "L") or (fmt == "jpeg" and img.mode == "RGBA"):
+                img = img.convert("RGB")
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    img.save(out, pil_format, **options)
+                os.replace(temp_path, target_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        upload_gc.register(target_path)
+
+    def get(self, source_path: str, variant: str = "thumb", fmt: str = "webp") -> Tuple[str, str]:
+        """
+        Return (derivative_path, etag), rendering the derivative on first use.
+
+        Args:
+            source_path: Absolute path of an original from resolve_source()
+            variant: Key of VARIANTS
+            fmt: Key of FORMATS
+        """
+        target = self.derivative_path(source_path, variant, fmt)
+        if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source_path):
+            with self._render_lock(target):
+                # Another request may have rendered it while we waited
+                if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source_path):
+                    self._render(source_path, target, variant, fmt)
+        else:
+            upload_gc.touch(target)
+        return target, self._etag(target)
+
+    def _etag(self, path: str) -> str:
+        """Strong ETag from the derivative's bytes (memoized per mtime in a bounded LRU)"""
+        mtime = os.stat(path).st_mtime_ns
+        with self._etags_lock:
+            cached = self._etags.get(path)
+            if cached and cached[0] == mtime:
+                self._etags.move_to_end(path)
+                return cached[1]
+        with open(path, "rb") as f:
+            etag = f'"{hashlib.sha256(f.read()).hexdigest()[:32]}"'
+        with self._etags_lock:
+            self._etags[path] = (mtime, etag)
+            self._etags.move_to_end(path)
+            while len(self._etags) > self.ETAG_CACHE_SIZE:
+                self._etags.popitem(last=False)
+        return etag
+
+    def schedule(self, source_path: Optional[str], variants=("thumb", "preview"), fmt: str = "webp"):
+        """Render derivatives in the background pool (fire and forget)"""
+        if not source_path or os.path.splitext(source_path)[1].lower() not in self.SOURCE_EXTENSIONS:
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.EAGER_WORKERS, thread_name_prefix="derivatives")
+        for variant in variants:
+            self._pool.submit(self._render_quietly, source_path, variant, fmt)
+
+    def _render_quietly(self, source_path: str, variant: str, fmt: str):
+        try:
+            self.get(source_path, variant, fmt)
+        except Exception as e:
+            print(f"Derivative render failed for {source_path} ({variant}): {e}")
+
+    def url(self, path: Optional[str], variant: str = "preview") -> Optional[str]:
+        """API URL serving a derivative of a file inside UPLOAD_DIR"""
+        if not path:
+            return None
+        relative = os.path.relpath(path, settings.UPLOAD_DIR) if os.path.isabs(path) else path
+        return f"{settings.API_PREFIX}/media/{variant}/" + relative.replace(os.sep, "/")
+
+
+# Global instance
+derivative_service = DerivativeService(settings.UPLOAD_DIR)
@@ -0,0 +1,158 @@
+"""
+Bulk Export - Stream whole datasets (OSINT collections, stego results,
+visitor logs) as NDJSON or Parquet. Rows come from a server-side cursor in
+batches and each batch is encoded and handed to the response before the
+next is read, so memory stays flat however many rows are exported.
+Parquet needs pyarrow; each batch becomes one row group.
+"""
+
+import io
+import json
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, LargeBinary
+
+from app.config import settings
+from app.services.database import db_service, EXPORT_TABLES, OSINTCollection
+from app.services.metrics import metrics
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects output until drained (Parquet writer target)"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ExportService:
+    """Encodes export datasets as streams of bytes"""
+
+    MEDIA_TYPES = {"ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+    def __init__(self, batch_rows: int = 5000, payload_batch_rows: int = 250):
+        """
+        Args:
+            batch_rows: Rows per batch (and Parquet row group)
+            payload_batch_rows: Rows per batch for OSINT exports with full payloads
+        """
+        self.batch_rows = batch_rows
+        self.payload_batch_rows = payload_batch_rows
+
+    @property
+    def parquet_available(self) -> bool:
+        return pyarrow is not None
+
+    def filename(self, dataset: str, fmt: str) -> str:
+        return f"{dataset}-{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.{fmt}"
+
+    def stream(self, dataset: str, fmt: str, filters: Dict = None, start: datetime = None,
+               end: datetime = None, include_payloads: bool = True) -> Iterator[bytes]:
+        """
+        Encoded export of one dataset (blocking generator; StreamingResponse
+        iterates it in a worker thread).
+        """
+        with_payloads = include_payloads and dataset == "osint"
+        batches = db_service.iter_export_rows(
+            dataset, filters, start, end,
+            batch_size=self.payload_batch_rows if with_payloads else self.batch_rows,
+            include_payloads=include_payloads
+        )
+        encode = self._parquet if fmt == "parquet" else self._ndjson
+        started = time.monotonic()
+        rows = 0
+        try:
+            for chunk, count in encode(dataset, batches, include_payloads):
+                rows += count
+                yield chunk
+        except Exception as e:
+            # Headers are already sent; abort the transfer so the client sees it incomplete
+            print(f"Export of {dataset} failed after {rows} rows: {e}")
+            raise
+        finally:
+            batches.close()
+        metrics.increment("export.rows", rows)
+        metrics.observe("export.seconds", time.monotonic() - started)
+
+    # Encoders yield (bytes, rows encoded)
+
+    def _ndjson(self, dataset: str, batches, include_payloads: bool):
+        for records in batches:
+            lines = [json.dumps(self._serialize(r), separators=(",", ":"), default=str) for r in records]
+            yield ("\n".join(lines) + "\n").encode("utf-8"), len(records)
+
+    def _serialize(self, record: Dict) -> Dict:
+        return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in record.items()}
+
+    def _parquet_schema(self, dataset: str, include_payloads: bool):
+        model = EXPORT_TABLES[dataset][0]
+        fields = []
+        for column in model.__table__.columns:
+            if model is OSINTCollection and column.key == "data" and not include_payloads:
+                continue
+            if isinstance(column.type, Boolean):
+                arrow_type = pyarrow.bool_()
+            elif isinstance(column.type, Integer):
+                arrow_type = pyarrow.int64()
+            elif isinstance(column.type, Float):
+                arrow_type = pyarrow.float64()
+            elif isinstance(column.type, DateTime):
+                arrow_type = pyarrow.timestamp("us")
+            elif isinstance(column.type, LargeBinary):
+                arrow_type = pyarrow.binary()
+            else:
+                arrow_type = pyarrow.string()  # Strings, and JSON columns as JSON text
+            fields.append(pyarrow.field(column.key, arrow_type))
+        return pyarrow.schema(fields)
+
+    def _parquet(self, dataset: str, batches, include_payloads: bool):
+        if pyarrow is None:
+            raise RuntimeError("Parquet export requires the pyarrow package")
+        schema = self._parquet_schema(dataset, include_payloads)
+        text_columns = [f.name for f in schema if pyarrow.types.is_string(f.type)]
+        sink = _ChunkSink()
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+        try:
+            for records in batches:
+                for record in records:
+                    for key in text_columns:
+                        value = record.get(key)
+                        if value is not None and not isinstance(value, str):
+                            record[key] = json.dumps(value, separators=(",", ":"), default=str)
+                table = pyarrow.Table.from_pylist(records, schema=schema)
+                writer.write_table(table, row_group_size=len(records))
+                yield sink.drain(), len(records)
+        finally:
+            writer.close()
+        yield sink.drain(), 0
+
+
+# Global instance
+export_service = ExportService(
+    batch_rows=settings.EXPORT_BATCH_ROWS,
+    payload_batch_rows=settings.EXPORT_PAYLOAD_BATCH_ROWS
+)
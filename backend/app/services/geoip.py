@@ -0,0 +1,261 @@
+"""
+IP Geolocation - Offline lookups against a local IP-range database.
+Ranges from a MaxMind DB (.mmdb) or CSV file are flattened into sorted
+NumPy arrays per address family and found with np.searchsorted, behind an
+LRU cache. The file is watched in the background and a changed file is
+loaded into a new table that replaces the old one in a single assignment,
+so lookups never see a half-built table. Nothing here touches the network.
+"""
+
+import asyncio
+import csv
+import ipaddress
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.ip_ranges import MISS, IPRangeTable, merge_ranges, pack_ips, parse_ip
+from app.services.metrics import metrics
+
+try:
+    import maxminddb
+    MMDB_AVAILABLE = True
+except ImportError:
+    MMDB_AVAILABLE = False
+
+LOCAL = -2  # Loopback and private ranges, answered without the database
+
+LOCAL_RECORD = {
+    "country": "Local",
+    "city": "Localhost",
+    "latitude": 0.0,
+    "longitude": 0.0,
+    "isp": "Local Network"
+}
+
+# (country, city, latitude, longitude, isp)
+GeoRecord = Tuple[Optional[str], Optional[str], Optional[float], Optional[float], Optional[str]]
+
+
+def is_local(version: int, value: int) -> bool:
+    """Loopback, RFC 1918, unique local and link-local addresses"""
+    if version == 4:
+        return value >> 24 in (10, 127) or value >> 20 == 0xAC1 or value >> 16 in (0xC0A8, 0xA9FE)
+    return value == 1 or value >> 121 == 0x7E or value >> 118 == 0x3FA
+
+
+def _is_local_v4_many(values: np.ndarray) -> np.ndarray:
+    return ((values >> 24 == 10) | (values >> 24 == 127) | (values >> 20 == 0xAC1) | (values >> 16 == 0xC0A8)
+            | (values >> 16 == 0xA9FE))
+
+
+def _name(value) -> Optional[str]:
+    if isinstance(value, dict):
+        names = value.get("names") or {}
+        return names.get("en") or value.get("iso_code")
+    return value or None
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def _mmdb_ranges(path: str) -> Iterator[Tuple[int, int, int, GeoRecord]]:
+    """Every network in a MaxMind DB (GeoIP2/GeoLite2/DB-IP City or ASN layouts)"""
+    if not MMDB_AVAILABLE:
+        raise RuntimeError("Reading .mmdb files requires the maxminddb package")
+    with maxminddb.open_database(path) as reader:
+        for network, data in reader:
+            if not isinstance(data, dict):
+                continue
+            location = data.get("location") or {}
+            traits = data.get("traits") or {}
+            record = (
+                _name(data.get("country") or data.get("registered_country")),
+                _name(data.get("city")),
+                _float(location.get("latitude")),
+                _float(location.get("longitude")),
+                data.get("isp") or traits.get("isp") or data.get("autonomous_system_organization")
+            )
+            yield (network.version, int(network.network_address), int(network.broadcast_address), record)
+
+
+def _csv_ranges(path: str) -> Iterator[Tuple[int, int, int, GeoRecord]]:
+    """
+    CSV with a header row and either a `network` (CIDR) column or
+    `start_ip`/`end_ip` columns (addresses or integers), plus any of
+    country, city, latitude, longitude and isp.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get("network"):
+                network = ipaddress.ip_network(row["network"].strip(), strict=False)
+                version, start, end = network.version, int(network.network_address), int(network.broadcast_address)
+            else:
+                first, last = row["start_ip"].strip(), row["end_ip"].strip()
+                if first.isdigit():
+                    start, end = int(first), int(last)
+                    version = 4 if end <= 0xFFFFFFFF else 6
+                else:
+                    start_ip, end_ip = ipaddress.ip_address(first), ipaddress.ip_address(last)
+                    version, start, end = start_ip.version, int(start_ip), int(end_ip)
+            record = (row.get("country") or None, row.get("city") or None,
+                      _float(row.get("latitude")), _float(row.get("longitude")), row.get("isp") or None)
+            yield version, start, end, record
+
+
+class GeoTable:
+    """Sorted, non-overlapping IP ranges of one database file"""
+
+    def __init__(self, ranges: Iterable[Tuple[int, int, int, GeoRecord]], source: str = ""):
+        self.source = source
+        self.records: List[Dict] = []
+        record_ids: Dict[GeoRecord, int] = {}
+        families: Dict[int, List[Tuple[int, int, int]]] = {4: [], 6: []}
+        for version, start, end, record in ranges:
+            record_id = record_ids.get(record)
+            if record_id is None:
+                record_id = record_ids[record] = len(self.records)
+                self.records.append(dict(zip(("country", "city", "latitude", "longitude", "isp"), record)))
+            families[version].append((start, end, record_id))
+
+        self.ranges = IPRangeTable(merge_ranges(families[4]), merge_ranges(families[6]))
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+    def find(self, version: int, value: int) -> int:
+        """Record index for an address, or MISS"""
+        return self.ranges.find(version, value)
+
+
+class GeoIPService:
+    """Local IP geolocation with an LRU cache and background hot reload"""
+
+    def __init__(self, path: str, cache_size: int = 65536, reload_interval: float = 60):
+        self.path = path
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+        # Table and its lookup cache, swapped together so a lookup never mixes generations
+        self._state = self._bind(None)
+        self._signature = None
+        self._task: Optional[asyncio.Task] = None
+        metrics.register_gauge("geoip.ranges", lambda: len(self._state[0]) if self._state[0] else 0)
+        metrics.register_gauge("geoip.cache_hit_ratio", self._hit_ratio)
+
+    @property
+    def loaded(self) -> bool:
+        return self._state[0] is not None
+
+    def _hit_ratio(self) -> float:
+        info = self._state[1].cache_info()
+        total = info.hits + info.misses
+        return round(info.hits / total, 4) if total else 0.0
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def load(self, path: Optional[str] = None) -> int:
+        """
+        Build a table from a .mmdb or .csv file and swap it in.
+        Runs in a worker thread; lookups keep using the old table until the swap.
+
+        Returns:
+            Number of ranges loaded
+        """
+        path = path or self.path
+        signature = self._file_signature() if path == self.path else None
+        ranges = _mmdb_ranges(path) if path.endswith(".mmdb") else _csv_ranges(path)
+        table = GeoTable(ranges, source=path)
+        self._state = self._bind(table)
+        if signature is not None:
+            self._signature = signature
+        metrics.increment("geoip.reloads")
+        return len(table)
+
+    def _bind(self, table: Optional[GeoTable]):
+        def find(ip: str) -> int:
+            parsed = parse_ip(ip)
+            if parsed is None:
+                return MISS
+            if is_local(*parsed):
+                return LOCAL
+            return table.find(*parsed) if table is not None else MISS
+        return table, lru_cache(maxsize=self.cache_size)(find)
+
+    def _record(self, index: int, table: Optional[GeoTable]) -> Optional[Dict]:
+        if index == LOCAL:
+            return dict(LOCAL_RECORD)
+        if index == MISS or table is None:
+            return None
+        return dict(table.records[index])
+
+    def lookup(self, ip: str) -> Optional[Dict]:
+        """Location of an address, or None if it is not in the database"""
+        table, find = self._state
+        return self._record(find(ip), table)
+
+    def lookup_many(self, ips: List[str]) -> List[Optional[Dict]]:
+        """Batch lookup; each address family is searched in one vectorized call"""
+        table = self._state[0]
+        indexes = np.full(len(ips), MISS, dtype=np.int32)
+        v4_positions, v4, v6_positions, v6 = pack_ips(ips)
+        if table is not None:
+            indexes[v4_positions] = table.ranges.find_v4_many(v4)
+            indexes[v6_positions] = table.ranges.find_v6_many(v6)
+        indexes[v4_positions[_is_local_v4_many(v4)]] = LOCAL
+        for position, packed in zip(v6_positions.tolist(), v6.tolist()):
+            if is_local(6, int.from_bytes(packed.ljust(16, b"\0"), "big")):
+                indexes[position] = LOCAL
+        return [self._record(index, table) for index in indexes.tolist()]
+
+    async def start(self):
+        """Load the database if present and watch it for changes"""
+        if self._task is None:
+            await self._reload_if_changed()
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _reload_if_changed(self):
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return
+        try:
+            count = await asyncio.to_thread(self.load)
+            print(f"Loaded {count} IP ranges from {self.path}")
+        except Exception as e:
+            # Keep serving the previous table; retry once the file changes again
+            self._signature = signature
+            metrics.increment("geoip.reload_errors")
+            print(f"GeoIP load failed for {self.path}: {e}")
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self._reload_if_changed()
+
+
+# Global instance
+geoip = GeoIPService(
+    settings.GEOIP_DATABASE,
+    cache_size=settings.GEOIP_CACHE_SIZE,
+    reload_interval=settings.GEOIP_RELOAD_INTERVAL
+)
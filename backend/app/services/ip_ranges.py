@@ -0,0 +1,141 @@
+"""
+IP Range Table - Sorted, disjoint address ranges searched with NumPy.
+Shared by offline geolocation and the CIDR threat lists: IPv4 bounds are
+uint32 arrays and IPv6 bounds are 16-byte big-endian strings (which sort
+like the 128-bit numbers they encode), each found with np.searchsorted,
+one address at a time or a whole batch per call.
+"""
+
+import socket
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MISS = -1
+
+# (start, end, value): inclusive integer bounds and the value returned for them
+Range = Tuple[int, int, int]
+
+_V4_MAPPED = b"\x00" * 10 + b"\xff\xff"
+
+
+def parse_ip(ip: str) -> Optional[Tuple[int, int]]:
+    """Return (version, integer) for an address; IPv4-mapped IPv6 counts as IPv4"""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+    except (OSError, ValueError, TypeError):
+        pass
+    try:
+        value = int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big")
+    except (OSError, ValueError, TypeError):
+        return None
+    if value >> 32 == 0xFFFF:
+        return 4, value & 0xFFFFFFFF
+    return 6, value
+
+
+def pack_ips(ips: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse a batch of addresses into arrays for find_v4_many()/find_v6_many().
+
+    Returns:
+        (IPv4 positions, IPv4 uint32 values, IPv6 positions, IPv6 S16 values);
+        positions index into `ips`, unparsable addresses appear in neither
+    """
+    v4_positions, v4_packed, v6_positions, v6_packed = [], [], [], []
+    inet_pton, AF_INET, AF_INET6 = socket.inet_pton, socket.AF_INET, socket.AF_INET6
+    for position, ip in enumerate(ips):
+        try:
+            v4_packed.append(inet_pton(AF_INET, ip))
+            v4_positions.append(position)
+            continue
+        except (OSError, ValueError, TypeError):
+            pass
+        try:
+            packed = inet_pton(AF_INET6, ip)
+        except (OSError, ValueError, TypeError):
+            continue
+        if packed[:12] == _V4_MAPPED:
+            v4_packed.append(packed[12:])
+            v4_positions.append(position)
+        else:
+            v6_packed.append(packed)
+            v6_positions.append(position)
+    v4 = np.frombuffer(b"".join(v4_packed), dtype=">u4").astype(np.uint32)
+    v6 = np.array(v6_packed, dtype="S16")
+    return np.array(v4_positions, dtype=np.int64), v4, np.array(v6_positions, dtype=np.int64), v6
+
+
+def merge_ranges(ranges: List[Range]) -> List[Range]:
+    """Sort disjoint ranges and join adjacent ones that share a value"""
+    ranges.sort()
+    merged: List[Range] = []
+    for start, end, value in ranges:
+        if merged and merged[-1][2] == value and merged[-1][1] + 1 == start:
+            merged[-1] = (merged[-1][0], end, value)
+        else:
+            merged.append((start, end, value))
+    return merged
+
+
+def _v6_key(value: int) -> np.bytes_:
+    return np.bytes_(value.to_bytes(16, "big"))
+
+
+class IPRangeTable:
+    """Disjoint address ranges per family, each mapped to an integer value"""
+
+    def __init__(self, v4: Iterable[Range] = (), v6: Iterable[Range] = ()):
+        """
+        Args:
+            v4, v6: Sorted, non-overlapping (start, end, value) ranges (see merge_ranges())
+        """
+        v4, v6 = list(v4), list(v6)
+        self.v4_starts = np.array([r[0] for r in v4], dtype=np.uint32)
+        self.v4_ends = np.array([r[1] for r in v4], dtype=np.uint32)
+        self.v4_values = np.array([r[2] for r in v4], dtype=np.int32)
+        self.v6_starts = np.array([r[0].to_bytes(16, "big") for r in v6], dtype="S16")
+        self.v6_ends = np.array([r[1].to_bytes(16, "big") for r in v6], dtype="S16")
+        self.v6_values = np.array([r[2] for r in v6], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.v4_starts) + len(self.v6_starts)
+
+    def find(self, version: int, value: int) -> int:
+        """Value of the range containing an address, or MISS"""
+        # Search with scalars of the array dtype; a Python int makes NumPy cast the whole array
+        if version == 4:
+            key, starts, ends, values = np.uint32(value), self.v4_starts, self.v4_ends, self.v4_values
+        else:
+            key, starts, ends, values = _v6_key(value), self.v6_starts, self.v6_ends, self.v6_values
+        i = int(starts.searchsorted(key, "right")) - 1
+        if i >= 0 and key <= ends[i]:
+            return int(values[i])
+        return MISS
+
+    @staticmethod
+    def _find_many(keys: np.ndarray, starts: np.ndarray, ends: np.ndarray, values: np.ndarray) -> np.ndarray:
+        if not len(starts):
+            return np.full(len(keys), MISS, dtype=np.int32)
+        index = starts.searchsorted(keys, "right").astype(np.int64) - 1
+        clipped = np.maximum(index, 0)
+        found = (index >= 0) & (keys <= ends[clipped])
+        return np.where(found, values[clipped], MISS).astype(np.int32)
+
+    def find_v4_many(self, values: np.ndarray) -> np.ndarray:
+        """Vectorized find() for a uint32 array of IPv4 addresses"""
+        return self._find_many(values, self.v4_starts, self.v4_ends, self.v4_values)
+
+    def find_v6_many(self, values: np.ndarray) -> np.ndarray:
+        """Vectorized find() for an S16 array of big-endian IPv6 addresses"""
+        return self._find_many(values, self.v6_starts, self.v6_ends, self.v6_values)
+
+    def find_many(self, ips: Sequence[str]) -> np.ndarray:
+        """Values for a batch of address strings (MISS for unparsable or uncovered ones)"""
+        result = np.full(len(ips), MISS, dtype=np.int32)
+        v4_positions, v4, v6_positions, v6 = pack_ips(ips)
+        if len(v4_positions):
+            result[v4_positions] = self.find_v4_many(v4)
+        if len(v6_positions):
+            result[v6_positions] = self.find_v6_many(v6)
+        return result
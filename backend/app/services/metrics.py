@@ -0,0 +1,71 @@
+"""
+In-process metrics registry.
+Counters, gauges and simple summaries exposed through /api/metrics.
+"""
+
+import threading
+from typing import Callable, Dict
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and value summaries"""
+
+    def __init__(self):
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._summaries: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1):
+        """Add to a monotonically increasing counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def register_gauge(self, name: str, func: Callable[[], float]):
+        """Register a callable evaluated every time metrics are read"""
+        with self._lock:
+            self._gauges[name] = func
+
+    def observe(self, name: str, value: float):
+        """Record one observation (count, sum, min, max are kept)"""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                self._summaries[name] = {"count": 1, "sum": value, "min": value, "max": value}
+            else:
+                summary["count"] += 1
+                summary["sum"] += value
+                summary["min"] = min(summary["min"], value)
+                summary["max"] = max(summary["max"], value)
+
+    def get(self, name: str) -> float:
+        """Current value of a counter (0 if never incremented)"""
+        return self._counters.get(name, 0)
+
+    def ratio(self, numerator: str, *denominator: str) -> float:
+        """Counter ratio helper, e.g. hits / (hits + misses)"""
+        total = sum(self.get(name) for name in denominator)
+        return round(self.get(numerator) / total, 4) if total else 0.0
+
+    def snapshot(self) -> Dict:
+        """Return all metrics as plain JSON-serializable dicts"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            summaries = {
+                name: {**s, "avg": round(s["sum"] / s["count"], 6) if s["count"] else 0.0}
+                for name, s in self._summaries.items()
+            }
+
+        gauge_values = {}
+        for name, func in gauges.items():
+            try:
+                gauge_values[name] = func()
+            except Exception as e:
+                gauge_values[name] = f"error: {e}"
+
+        return {"counters": counters, "gauges": gauge_values, "summaries": summaries}
+
+
+# Global instance
+metrics = MetricsRegistry()
@@ -0,0 +1,57 @@
+"""
+Payload Codec - Canonical, compressed encoding for large JSON payloads.
+Payloads are serialized canonically (sorted keys) so identical results
+hash the same and can be stored once, then compressed with zstd, or with
+zlib when the zstandard package is not installed.
+"""
+
+import hashlib
+import json
+import zlib
+from typing import Any, NamedTuple, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+
+
+class EncodedPayload(NamedTuple):
+    content_hash: str  # SHA-256 of the canonical JSON
+    codec: str  # zstd, zlib
+    size: int  # Uncompressed bytes
+    data: bytes
+
+
+def compress_bytes(raw: bytes) -> Tuple[str, bytes]:
+    """(codec, compressed bytes) with the best available codec"""
+    if zstandard is not None:
+        # Compressor objects are not thread-safe; they are cheap to create
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress_bytes(codec: str, data: bytes) -> bytes:
+    """Inverse of compress_bytes"""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Data is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def encode_payload(payload: Any) -> EncodedPayload:
+    """Serialize, hash and compress a JSON-compatible payload"""
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    codec, data = compress_bytes(raw)
+    return EncodedPayload(hashlib.sha256(raw).hexdigest(), codec, len(raw), data)
+
+
+def decode_payload(codec: str, data: bytes) -> Any:
+    """Inverse of encode_payload"""
+    return json.loads(decompress_bytes(codec, data))
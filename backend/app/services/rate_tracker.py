@@ -0,0 +1,170 @@
+"""
+Request Rate Tracker - Sliding-window request counts per IP and device fingerprint.
+Counts live in a SlidingCountMinSketch, so each request is one O(1) update
+and the memory footprint stays fixed under IP churn. The heaviest keys are
+kept as a small top-K candidate set. With RATE_SHARED_MEMORY set, the
+sketch is placed in a named shared memory segment so every worker process
+counts into (and reads from) the same window.
+"""
+
+import atexit
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.services.count_min import SlidingCountMinSketch
+from app.services.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: shared windows advance without a cross-process lock
+    fcntl = None
+
+
+class _SharedLock:
+    """Thread lock plus an flock on a lock file, for processes sharing one segment"""
+
+    def __init__(self, name: str):
+        self._thread_lock = threading.Lock()
+        self._fd = None
+        if fcntl is not None:
+            self._fd = os.open(os.path.join(tempfile.gettempdir(), f"{name}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+def _attach_shared_memory(name: str, size: int):
+    """Create the named segment, or attach to the one another worker created"""
+    from multiprocessing import resource_tracker, shared_memory
+    try:
+        segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        segment = shared_memory.SharedMemory(name=name)
+        if segment.size < size:
+            segment.close()
+            raise ValueError(f"Shared memory segment '{name}' is smaller than the configured sketch")
+    # The segment outlives individual workers; keep this process's tracker from unlinking it on exit
+    try:
+        resource_tracker.unregister(segment._name, "shared_memory")
+    except Exception:
+        pass
+    return segment
+
+
+class RequestRateTracker:
+    """Flags IPs and fingerprints exceeding a request rate over a sliding window"""
+
+    KINDS = ("ip", "fingerprint")
+
+    def __init__(self, window_seconds: int = 60, ip_limit: int = 120, fingerprint_limit: int = 120,
+                 width: int = 4096, depth: int = 4, top_k: int = 20, shared_name: str = ""):
+        """
+        Args:
+            window_seconds: Length of the sliding window
+            ip_limit: Requests per window above which an IP is rapid
+            fingerprint_limit: Requests per window above which a device fingerprint is rapid
+            width, depth: Count-min sketch dimensions (see SlidingCountMinSketch)
+            top_k: Heavy hitters remembered per kind
+            shared_name: Shared memory segment name; empty keeps counts per process
+        """
+        self.window_seconds = window_seconds
+        self.ip_limit = ip_limit
+        self.fingerprint_limit = fingerprint_limit
+        self.top_k = top_k
+        self._segment = None
+        buffer, lock = None, threading.Lock()
+        if shared_name:
+            size = SlidingCountMinSketch.nbytes(window_seconds, width, depth)
+            self._segment = _attach_shared_memory(shared_name, size)
+            buffer, lock = self._segment.buf, _SharedLock(shared_name)
+        self.sketch = SlidingCountMinSketch(window_seconds, width, depth, buffer=buffer, lock=lock)
+        if self._segment is not None:
+            atexit.register(self.close)
+        # Candidate heavy hitters per kind (key -> last estimate) and the smallest estimate among them
+        self._top: Dict[str, Dict[str, int]] = {kind: {} for kind in self.KINDS}
+        self._floor: Dict[str, int] = {kind: 0 for kind in self.KINDS}
+        self._top_second = 0
+        metrics.register_gauge("rate_tracker.window_requests", self.sketch.events)
+
+    def close(self):
+        """Detach from the shared memory segment (it stays available to other workers)"""
+        if self._segment is not None:
+            self.sketch.release()
+            self._segment.close()
+            self._segment = None
+
+    def observe(self, ip: str, fingerprint: str, now: Optional[float] = None) -> Dict:
+        """Count a request and report both rates over the window"""
+        now = time.time() if now is None else now
+        if int(now) != self._top_second:
+            self._refresh_top(now)
+        ip_requests, fingerprint_requests = self.sketch.add((f"ip:{ip}", f"fp:{fingerprint}"), now)
+        self._offer("ip", ip, ip_requests)
+        self._offer("fingerprint", fingerprint, fingerprint_requests)
+        rapid = ip_requests > self.ip_limit or fingerprint_requests > self.fingerprint_limit
+        if rapid:
+            metrics.increment("rate_tracker.rapid")
+        return {
+            "ip_requests": ip_requests,
+            "fingerprint_requests": fingerprint_requests,
+            "window_seconds": self.window_seconds,
+            "rapid": rapid
+        }
+
+    def _offer(self, kind: str, key: str, count: int):
+        """Space-saving style top-K: a key enters only by beating the current smallest"""
+        top = self._top[kind]
+        if key in top:
+            top[key] = count
+            return
+        if len(top) >= self.top_k:
+            if count <= self._floor[kind]:
+                return
+            del top[min(top, key=top.get)]
+        top[key] = count
+        self._floor[kind] = min(top.values())
+
+    def _refresh_top(self, now: float):
+        """Re-estimate candidates as the window slides, dropping keys that aged out"""
+        self._top_second = int(now)
+        prefixes = {"ip": "ip:", "fingerprint": "fp:"}
+        for kind, top in self._top.items():
+            for key in list(top):
+                count = self.sketch.estimate(prefixes[kind] + key, now)
+                if count:
+                    top[key] = count
+                else:
+                    del top[key]
+            self._floor[kind] = min(top.values()) if top else 0
+
+    def heavy_hitters(self, limit: int = 10, now: Optional[float] = None) -> Dict[str, List[Dict]]:
+        """Most active IPs and fingerprints in the current window"""
+        self._refresh_top(time.time() if now is None else now)
+        return {
+            kind: [{"key": key, "requests": count}
+                   for key, count in sorted(top.items(), key=lambda item: item[1], reverse=True)[:limit]]
+            for kind, top in self._top.items()
+        }
+
+
+# Global instance
+rate_tracker = RequestRateTracker(
+    window_seconds=settings.RATE_WINDOW_SECONDS,
+    ip_limit=settings.RATE_LIMIT_PER_IP,
+    fingerprint_limit=settings.RATE_LIMIT_PER_FINGERPRINT,
+    width=settings.RATE_SKETCH_WIDTH,
+    depth=settings.RATE_SKETCH_DEPTH,
+    top_k=settings.RATE_TOP_K,
+    shared_name=settings.RATE_SHARED_MEMORY
+)
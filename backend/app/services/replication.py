@@ -0,0 +1,215 @@
+"""
+Object Storage Replication - Copy stored uploads to a remote object store.
+Jobs live in the replication_jobs table so a restart resumes pending work;
+asyncio workers upload them in threads and retry with exponential backoff.
+"""
+
+import asyncio
+import os
+import random
+import shutil
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from app.config import settings
+from app.services.database import db_service
+from app.services.metrics import metrics
+
+try:
+    from supabase import create_client
+except ImportError:
+    create_client = None
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+except ImportError:
+    boto3 = None
+
+
+class ObjectStoreBackend:
+    """Interface for replication targets"""
+
+    name = "none"
+
+    def upload(self, local_path: str, object_key: str, content_type: Optional[str] = None):
+        """Copy a local file to object_key (blocking; raise on failure)"""
+        raise NotImplementedError
+
+
+class LocalDirectoryBackend(ObjectStoreBackend):
+    """Replicates into a local directory (stand-in for a real bucket)"""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def upload(self, local_path: str, object_key: str, content_type: Optional[str] = None):
+        target = os.path.join(self.root, object_key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = f"{target}.part"
+        shutil.copyfile(local_path, temp_path)
+        os.replace(temp_path, target)
+
+
+class SupabaseBackend(ObjectStoreBackend):
+    """Supabase Storage bucket"""
+
+    name = "supabase"
+
+    def __init__(self, url: str, key: str, bucket: str):
+        if not create_client:
+            raise RuntimeError("supabase package not installed")
+        self.client = create_client(url, key)
+        self.bucket = bucket
+
+    def upload(self, local_path: str, object_key: str, content_type: Optional[str] = None):
+        options = {"content-type": content_type or "application/octet-stream", "upsert": "true"}
+        with open(local_path, "rb") as f:
+            self.client.storage.from_(self.bucket).upload(object_key, f, options)
+
+
+class S3Backend(ObjectStoreBackend):
+    """S3-compatible bucket; large files use concurrent multipart uploads"""
+
+    name = "s3"
+
+    MULTIPART_THRESHOLD = 8 * 1024 * 1024
+    MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+    MULTIPART_CONCURRENCY = 4
+
+    def __init__(self, bucket: str, endpoint_url: str = ""):
+        if not boto3:
+            raise RuntimeError("OBJECT_STORE_BACKEND=s3 requires the boto3 package (pip install boto3)")
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None)
+        self.bucket = bucket
+        self.transfer_config = TransferConfig(
+            multipart_threshold=self.MULTIPART_THRESHOLD,
+            multipart_chunksize=self.MULTIPART_CHUNK_SIZE,
+            max_concurrency=self.MULTIPART_CONCURRENCY,
+            use_threads=True
+        )
+
+    def upload(self, local_path: str, object_key: str, content_type: Optional[str] = None):
+        extra = {"ContentType": content_type} if content_type else None
+        self.client.upload_file(local_path, self.bucket, object_key,
+                                ExtraArgs=extra, Config=self.transfer_config)
+
+
+def create_backend() -> Optional[ObjectStoreBackend]:
+    """Build the backend selected by OBJECT_STORE_BACKEND (None if disabled)"""
+    kind = settings.OBJECT_STORE_BACKEND
+    try:
+        if kind == "local":
+            return LocalDirectoryBackend(settings.OBJECT_STORE_LOCAL_DIR)
+        if kind == "supabase" and settings.SUPABASE_URL and settings.SUPABASE_KEY:
+            return SupabaseBackend(settings.SUPABASE_URL, settings.SUPABASE_KEY, settings.OBJECT_STORE_BUCKET)
+        if kind == "s3":
+            return S3Backend(settings.OBJECT_STORE_BUCKET, settings.S3_ENDPOINT_URL)
+    except Exception as e:
+        print(f"Warning: object store '{kind}' init failed: {e}")
+    return None
+
+
+class ReplicationQueue:
+    """Durable, retrying background uploader"""
+
+    BASE_DELAY = 2.0
+    MAX_DELAY = 600.0
+    POLL_INTERVAL = 5.0
+
+    def __init__(self, backend: Optional[ObjectStoreBackend], workers: int = 4, max_attempts: int = 8):
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        metrics.register_gauge("replication.pending", self._pending_count)
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def _pending_count(self) -> int:
+        if not self.enabled:
+            return 0
+        return db_service.count_replication_jobs(self.backend.name, "pending")
+
+    def object_key(self, local_path: str) -> str:
+        """Bucket key mirroring the path under UPLOAD_DIR"""
+        return os.path.relpath(local_path, settings.UPLOAD_DIR).replace(os.sep, "/")
+
+    def enqueue(self, content_hash: str, local_path: str, content_type: Optional[str] = None) -> bool:
+        """Persist a replication job for a durable local file; returns False if disabled"""
+        if not self.enabled:
+            return False
+        db_service.enqueue_replication(content_hash, local_path, self.object_key(local_path),
+                                       self.backend.name, content_type)
+        metrics.increment("replication.enqueued")
+        if self._loop is not None and not self._loop.is_closed():
+            # enqueue() usually runs in a worker thread
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+
+    async def start(self):
+        """Resume jobs interrupted by a restart and launch the workers"""
+        if not self.enabled or self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        resumed = await asyncio.to_thread(db_service.reset_stale_replication_jobs, self.backend.name)
+        if resumed:
+            print(f"Replication: resumed {resumed} interrupted job(s)")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel workers; in-flight jobs are picked up again on next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def _retry_delay(self, attempts: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.MAX_DELAY, self.BASE_DELAY * (2 ** attempts)))
+
+    async def _worker(self):
+        while True:
+            jobs = await asyncio.to_thread(db_service.claim_replication_jobs, self.backend.name, 1)
+            if not jobs:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(jobs[0])
+
+    async def _run(self, job):
+        try:
+            await asyncio.to_thread(self.backend.upload, job.local_path, job.object_key, job.content_type)
+        except Exception as e:
+            attempts = (job.attempts or 0) + 1
+            retry_at = None
+            if attempts < self.max_attempts and os.path.exists(job.local_path):
+                retry_at = datetime.utcnow() + timedelta(seconds=self._retry_delay(attempts))
+                metrics.increment("replication.retries")
+            else:
+                metrics.increment("replication.failed")
+                print(f"Replication of {job.object_key} failed permanently: {e}")
+            await asyncio.to_thread(db_service.finish_replication_job, job.id, str(e)[:500], retry_at)
+            return
+        await asyncio.to_thread(db_service.finish_replication_job, job.id)
+        metrics.increment("replication.succeeded")
+
+
+# Global instance
+replication_queue = ReplicationQueue(
+    create_backend(),
+    workers=settings.REPLICATION_WORKERS,
+    max_attempts=settings.REPLICATION_MAX_ATTEMPTS
+)
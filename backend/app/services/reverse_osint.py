@@ -3,13 +3,15 @@ Reverse OSINT Service - Track who is collecting information about you.
 Visitor tracking, IP geolocation, device fingerprinting, and threat detection.
 """
 
-import asyncio
 import hashlib
-import random
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from app.services.api_key_manager import api_key_manager
 from app.services.database import db_service
+from app.services.geoip import LOCAL_RECORD, geoip
+from app.services.rate_tracker import rate_tracker
+from app.services.threat_lists import threat_lists
+from app.services.visitor_log_writer import visitor_log_writer
+from app.services.visitor_rollup import visitor_rollups
 
 
 class ReverseOSINTService:
@@ -45,30 +47,37 @@ class ReverseOSINTService:
         fingerprint = self._generate_fingerprint(ip_address, user_agent)
         
         # Get geolocation
-        geo_data = await self._get_geolocation(ip_address)
+        geo_data = self._get_geolocation(ip_address)
         
         # Analyze for suspicious behavior
         threat_assessment = self._analyze_threat(ip_address, user_agent, path, method, fingerprint)
         
-        # Save to database
-        visitor_id = "offline_log"
+        # Queue for the batched database writer (row IDs are assigned at flush time)
+        status = "logged"
         try:
-            log_entry = db_service.log_visitor(
-                ip=ip_address,
-                user_agent=user_agent,
-                fingerprint=fingerprint,
-                resource=path,
-                geo_data=geo_data,
-                is_suspicious=threat_assessment["is_suspicious"]
-            )
-            visitor_id = log_entry.id
+            accepted = visitor_log_writer.submit({
+                "ip_address": ip_address,
+                "user_agent": user_agent,
+                "device_fingerprint": fingerprint,
+                "accessed_resource": path,
+                "request_method": method,
+                "is_suspicious": threat_assessment["is_suspicious"],
+                "threat_level": threat_assessment["threat_level"],
+                "threat_indicators": threat_assessment["indicators"],
+                "country": geo_data.get("country") if geo_data else None,
+                "city": geo_data.get("city") if geo_data else None,
+                "latitude": geo_data.get("latitude") if geo_data else None,
+                "longitude": geo_data.get("longitude") if geo_data else None
+            })
+            if not accepted:
+                status = "dropped"
         except Exception as e:
             print(f"Error logging visitor to DB: {e}")
             # Continue to return assessment even if logging fails
+            status = "offline_log"
         
         return {
-            "status": "logged",
-            "visitor_id": visitor_id,
+            "status": status,
             "ip_address": ip_address,
             "fingerprint": fingerprint,
             "geolocation": geo_data,
@@ -82,43 +91,16 @@ class ReverseOSINTService:
         fingerprint_data = f"{ip}:{user_agent}"
         return hashlib.sha256(fingerprint_data.encode()).hexdigest()[:16]
     
-    async def _get_geolocation(self, ip_address: str) -> Dict:
+    def _get_geolocation(self, ip_address: str) -> Optional[Dict]:
         """
-        Get geolocation data for an IP address.
-        Uses multiple services with fallback.
+        Get geolocation data for an IP address from the local database.
+        Returns None for addresses the database does not cover.
         """
         
-        # Mock geolocation for common IPs
-        if ip_address in ["127.0.0.1", "localhost", "unknown"]:
-            return {
-                "country": "Local",
-                "city": "Localhost",
-                "latitude": 0.0,
-                "longitude": 0.0,
-                "isp": "Local Network"
-            }
-        
-        # Get available geolocation service
-        service, api_key = api_key_manager.get_geolocation_service()
-        
-        # In production, call actual geolocation API
-        # For now, return mock data
-        await asyncio.sleep(0.1)
-        
-        locations = [
-            {"country": "United States", "city": "New York", "latitude": 40.7128, "longitude": -74.0060, "isp": "Verizon"},
-            {"country": "United Kingdom", "city": "London", "latitude": 51.5074, "longitude": -0.1278, "isp": "BT"},
-            {"country": "Germany", "city": "Berlin", "latitude": 52.5200, "longitude": 13.4050, "isp": "Deutsche Telekom"},
-            {"country": "Japan", "city": "Tokyo", "latitude": 35.6762, "longitude": 139.6503, "isp": "NTT"},
-            {"country": "India", "city": "Mumbai", "latitude": 19.0760, "longitude": 72.8777, "isp": "Airtel"},
-            {"country": "Russia", "city": "Moscow", "latitude": 55.7558, "longitude": 37.6173, "isp": "Rostelecom"},
-            {"country": "China", "city": "Beijing", "latitude": 39.9042, "longitude": 116.4074, "isp": "China Telecom"},
-        ]
-        
-        geo_data = random.choice(locations)
-        geo_data["service"] = service
+        if ip_address in ["localhost", "unknown"]:
+            return dict(LOCAL_RECORD)
         
-        return geo_data
+        return geoip.lookup(ip_address)
     
     def _analyze_threat(self, ip: str, user_agent: str, path: str, method: str, fingerprint: str) -> Dict:
         """
@@ -134,19 +116,19 @@ class ReverseOSINTService:
             threat_indicators.append("suspicious_user_agent")
             threat_score += 30
         
-        # Check for rapid requests (would check database in production)
-        # Mock: randomly flag some as rapid
-        if random.choice([True, False, False]):
+        # Check for rapid requests over the sliding window (in memory, no database query)
+        request_rate = rate_tracker.observe(ip, fingerprint)
+        if request_rate["rapid"]:
             threat_indicators.append("rapid_requests")
             threat_score += 40
         
-        # Check for known malicious IPs (would check threat intelligence feeds)
-        if random.choice([True, False, False, False]):
+        # Check local blocklists and Tor/VPN/hosting ranges (longest-prefix match)
+        listed = threat_lists.match(ip)
+        if listed and threat_lists.is_malicious(listed["tags"]):
             threat_indicators.append("known_malicious_ip")
             threat_score += 50
         
-        # Check for Tor/VPN (would use actual detection service)
-        if random.choice([True, False, False, False, False]):
+        if listed and threat_lists.is_anonymizer(listed["tags"]):
             threat_indicators.append("tor_or_vpn_detected")
             threat_score += 20
         
@@ -173,6 +155,8 @@ class ReverseOSINTService:
             "threat_level": threat_level,
             "threat_score": threat_score,
             "indicators": threat_indicators,
+            "request_rate": request_rate,
+            "listed": listed,
             "recommendation": self._get_threat_recommendation(threat_level),
             "analyzed_at": datetime.utcnow().isoformat()
         }
@@ -202,7 +186,7 @@ class ReverseOSINTService:
         """
         
         # Get logs from database
-        logs = db_service.get_visitor_logs(limit=limit, suspicious_only=False)
+        logs = await db_service.get_visitor_logs_async(limit=limit, suspicious_only=False)
         
         # Format for map
         visitors = []
@@ -224,19 +208,16 @@ class ReverseOSINTService:
                 "accessed": log.accessed_resource
             })
         
-        # Calculate statistics
-        total_visitors = len(visitors)
-        unique_ips = len(set(v["ip"] for v in visitors))
-        suspicious_count = sum(1 for v in visitors if v["is_suspicious"])
-        countries = list(set(v["country"] for v in visitors if v["country"]))
+        # Window statistics from hourly rollups (covers every visit, not just the plotted ones)
+        window = await visitor_rollups.window(hours=hours)
         
         return {
             "visitors": visitors,
             "statistics": {
-                "total_visitors": total_visitors,
-                "unique_ips": unique_ips,
-                "suspicious_visitors": suspicious_count,
-                "countries": countries,
+                "total_visitors": window["visits"],
+                "unique_ips": window["unique_ips"],
+                "suspicious_visitors": window["suspicious"],
+                "countries": list(window["countries"]),
                 "time_window_hours": hours
             },
             "generated_at": datetime.utcnow().isoformat()
@@ -254,7 +235,7 @@ class ReverseOSINTService:
         """
         
         # Get suspicious logs
-        logs = db_service.get_visitor_logs(limit=200, suspicious_only=True)
+        logs = await db_service.get_visitor_logs_async(limit=200, suspicious_only=True)
         
         # Group by fingerprint to identify repeat visitors
         actors = {}
@@ -359,7 +340,7 @@ class ReverseOSINTService:
             elif "Delhi" in coords: city_hint = "Delhi"
             
             if city_hint:
-                logs = db_service.get_visitor_logs(limit=100)
+                logs = await db_service.get_visitor_logs_async(limit=100)
                 matching = [l for l in logs if l.city == city_hint]
                 if matching:
                     correlation["matches_found"] = True
@@ -0,0 +1,59 @@
+"""
+Scan Result Writer - Write-behind buffer for deepfake scan results.
+Image, video and audio scans are recorded for history and dashboard
+aggregates without a commit on the request path; results are flushed with
+one multi-row INSERT every N records or M milliseconds.
+"""
+
+import json
+from datetime import datetime
+from typing import Dict, List
+
+from app.config import settings
+from app.services.database import db_service
+from app.services.write_behind import WriteBehindWriter
+
+
+class ScanResultWriter(WriteBehindWriter):
+    """Bounded, batching write-behind queue for ScanResult rows"""
+
+    name = "scan_results"
+
+    def write(self, records: List[Dict]):
+        db_service.insert_scan_results(records)
+
+    def submit(self, record: Dict) -> bool:
+        """
+        Queue one scan result (ScanResult column names as keys).
+        Returns False if the record was dropped because the queue is full.
+        """
+        record.setdefault("scanned_at", datetime.utcnow())
+        return super().submit(record)
+
+    def record(self, user_id: str, modality: str, file_info: Dict, analysis: Dict, risk_report: Dict,
+               model_version: str) -> bool:
+        """Queue the result of one scan route"""
+        # Detector output may hold values JSON cannot encode; a bad row would fail its whole batch
+        analysis = json.loads(json.dumps(analysis, default=str))
+        return self.submit({
+            "user_id": user_id,
+            "content_hash": file_info["content_hash"],
+            "modality": modality,
+            "file_name": file_info.get("filename"),
+            "label": analysis.get("label"),
+            "score": analysis.get("score"),
+            "model_type": analysis.get("model_type"),
+            "model_version": model_version,
+            "heatmap_path": analysis.get("heatmap_url") or None,
+            "risk_score": risk_report.get("score"),
+            "severity": risk_report.get("severity"),
+            "analysis": analysis,
+        })
+
+
+# Global instance
+scan_result_writer = ScanResultWriter(
+    batch_size=settings.SCAN_RESULT_BATCH_SIZE,
+    flush_interval_ms=settings.SCAN_RESULT_FLUSH_MS,
+    max_pending=settings.SCAN_RESULT_MAX_PENDING
+)
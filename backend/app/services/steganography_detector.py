@@ -3,84 +3,96 @@ Steganography Detection Service - Extract hidden information from images.
 Supports LSB, DCT, Chi-Square analysis, and data extraction.
 """
 
+import asyncio
 import os
 import random
 import numpy as np
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from PIL import Image, ImageSequence
 from typing import Dict, Optional, Tuple
 from datetime import datetime
 import io
 import base64
-
+from app.ml.spam_features import extract_spam_features, spam_classifier
+from app.services.upload_gc import upload_gc
 
 class SteganographyDetector:
     """Detect and extract hidden data from images"""
     
+    # Bump whenever detection logic changes so cached results are invalidated
+    DETECTOR_VERSION = "5"
+    
+    # Heatmap grid: blocks are at least HEATMAP_BLOCK_SIZE px square and the
+    # grid never exceeds HEATMAP_MAX_BLOCKS cells per side.
+    HEATMAP_BLOCK_SIZE = 16
+    HEATMAP_MAX_BLOCKS = 128
+    
+    # Layout of the persisted feature vector; bump FEATURE_VERSION whenever
+    # it changes so similarity search never compares incompatible vectors.
+    FEATURE_VERSION = 1
+    CHI_CURVE_SAMPLES = 10
+    FEATURE_LENGTH = 3 * 8 + CHI_CURVE_SAMPLES + 10
+    
+    # Multi-frame analysis (animated GIF/APNG, multi-page TIFF)
+    FRAME_WORKERS = min(4, os.cpu_count() or 1)
+    MAX_FRAMES_IN_FLIGHT = 2 * FRAME_WORKERS
+    MAX_FRAMES = 500
+    
     def __init__(self):
-        self.methods = ["LSB", "DCT", "Chi-Square", "Visual Analysis"]
+        self.methods = ["LSB", "DCT", "Chi-Square", "Visual Analysis", "SPAM"]
+        self._frame_pool: Optional[ThreadPoolExecutor] = None
     
-    async def analyze_image(self, image_path: str, extract_data: bool = True) -> Dict:
+    async def analyze_image(self, image_path: str, extract_data: bool = True,
+                            generate_heatmap: bool = False, source=None) -> Dict:
         """
         Analyze an image for steganography.
         
         Args:
-            image_path: Path to the image file
+            image_path: Path to the image file (heatmaps are written next to it)
             extract_data: If True, attempt to extract hidden data
+            generate_heatmap: If True, write a block-level suspicion heatmap
+            source: Optional in-memory UploadBuffer to decode instead of the path
         
         Returns:
             Dict containing analysis results
         """
         try:
-            # Load image
-            image = Image.open(image_path)
-            # Ensure consistent image mode (handle RGBA, P, etc.)
-            if image.mode not in ['RGB', 'L']:
-                image = image.convert('RGB')
-            img_array = np.array(image)
-            
-            # Perform multiple detection methods
-            lsb_result = self._detect_lsb(img_array)
-            dct_result = self._detect_dct(img_array) if len(img_array.shape) == 3 else None
-            chi_result = self._chi_square_analysis(img_array)
-            visual_result = self._visual_analysis(img_array)
-            
-            # Combine results
-            has_hidden_data = any([
-                lsb_result["suspicious"],
-                dct_result["suspicious"] if dct_result else False,
-                chi_result["suspicious"],
-                visual_result["suspicious"]
-            ])
-            
-            # Calculate overall confidence
-            confidence = self._calculate_confidence(lsb_result, dct_result, chi_result, visual_result)
-            
-            # Extract data if requested and detected
-            extracted_data = None
-            if extract_data and has_hidden_data:
-                extracted_data = self._extract_hidden_data(img_array, image_path)
-            
-            # Generate heatmap
-            heatmap_path = self._generate_heatmap(img_array, image_path, lsb_result)
-            
+            # Decoding and every detector are CPU-bound; keep them off the event loop
+            return await asyncio.to_thread(
+                self._analyze_image_sync, image_path, extract_data, generate_heatmap, source
+            )
+        except Exception as e:
             return {
-                "status": "success",
-                "file_path": image_path,
-                "file_name": os.path.basename(image_path),
-                "image_size": f"{image.width}x{image.height}",
-                "has_hidden_data": has_hidden_data,
-                "confidence_score": confidence,
-                "detection_methods": {
-                    "lsb": lsb_result,
-                    "dct": dct_result,
-                    "chi_square": chi_result,
-                    "visual": visual_result
-                },
-                "extracted_data": extracted_data,
-                "heatmap_path": heatmap_path,
-                "analyzed_at": datetime.utcnow().isoformat()
+                "status": "error",
+                "error": str(e),
+                "file_path": image_path
             }
+    
+    async def analyze_frames(self, image_path: str, extract_data: bool = True,
+                             generate_heatmap: bool = False, max_frames: int = None, source=None) -> Dict:
+        """
+        Analyze every frame of an animated GIF/APNG or multi-page TIFF.
         
+        Frames are decoded lazily and analyzed in parallel on a worker pool
+        with at most MAX_FRAMES_IN_FLIGHT frames held in memory at once.
+        Top-level fields describe the most suspicious frame; "frames" holds
+        the per-frame summaries.
+        
+        Args:
+            image_path: Path to the image file
+            extract_data: If True, attempt to extract hidden data from suspicious frames
+            generate_heatmap: If True, write a heatmap for the most suspicious frame
+            max_frames: Stop after this many frames (defaults to MAX_FRAMES)
+            source: Optional in-memory UploadBuffer to decode instead of the path
+        
+        Returns:
+            Dict containing per-frame and aggregate analysis results
+        """
+        try:
+            return await asyncio.to_thread(
+                self._analyze_frames_sync, image_path, extract_data, generate_heatmap,
+                max_frames or self.MAX_FRAMES, source
+            )
         except Exception as e:
             return {
                 "status": "error",
@@ -88,6 +100,194 @@ class SteganographyDetector:
                 "file_path": image_path
             }
     
+    def _analyze_image_sync(self, image_path: str, extract_data: bool, generate_heatmap: bool,
+                            source=None) -> Dict:
+        image = Image.open(source.open() if source is not None else image_path)
+        img_array = self._frame_array(image)
+        
+        result = self._analyze_array(img_array, image_path, extract_data, generate_heatmap)
+        return {
+            "status": "success",
+            "file_path": image_path,
+            "file_name": os.path.basename(image_path),
+            "image_size": f"{image.width}x{image.height}",
+            "color_mode": "palette" if image.mode == "P" else image.mode,
+            **result,
+            "analyzed_at": datetime.utcnow().isoformat()
+        }
+    
+    def _analyze_frames_sync(self, image_path: str, extract_data: bool, generate_heatmap: bool,
+                             max_frames: int, source=None) -> Dict:
+        image = Image.open(source.open() if source is not None else image_path)
+        total_frames = getattr(image, "n_frames", 1)
+        color_mode = "palette" if image.mode == "P" else image.mode
+        lookup = self._palette_lookup(image)
+        frame_results: Dict[int, Dict] = {}
+        
+        def analyze(index: int, img_array: np.ndarray) -> Tuple[int, Dict]:
+            return index, self._analyze_array(img_array, image_path, extract_data, False)
+        
+        pool = self._get_frame_pool()
+        in_flight = set()
+        for index, frame in enumerate(ImageSequence.Iterator(image)):
+            if index >= max_frames:
+                break
+            # Back-pressure: wait for a slot before decoding the next frame
+            while len(in_flight) >= self.MAX_FRAMES_IN_FLIGHT:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                frame_results.update(f.result() for f in done)
+            in_flight.add(pool.submit(analyze, index, self._frame_array(frame, lookup)))
+        for future in in_flight:
+            index, result = future.result()
+            frame_results[index] = result
+        
+        if not frame_results:
+            raise ValueError("Image contains no frames")
+        
+        ordered = [frame_results[i] for i in sorted(frame_results)]
+        top_index = max(range(len(ordered)), key=lambda i: ordered[i]["confidence_score"])
+        top = ordered[top_index]
+        
+        heatmap_path = None
+        if generate_heatmap:
+            image.seek(top_index)
+            heatmap_path = self._generate_heatmap(
+                self._frame_array(image, lookup), image_path, top["detection_methods"]["lsb"],
+                name_suffix=f"_frame{top_index}" if len(ordered) > 1 else ""
+            )
+        
+        suspicious_frames = [i for i, r in enumerate(ordered) if r["has_hidden_data"]]
+        return {
+            "status": "success",
+            "file_path": image_path,
+            "file_name": os.path.basename(image_path),
+            "image_size": f"{image.width}x{image.height}",
+            "color_mode": color_mode,
+            **top,
+            "heatmap_path": heatmap_path,
+            "frame_count": total_frames,
+            "frames_analyzed": len(ordered),
+            "most_suspicious_frame": top_index,
+            "suspicious_frames": suspicious_frames,
+            "frames": [
+                {
+                    "frame": i,
+                    "has_hidden_data": r["has_hidden_data"],
+                    "confidence_score": r["confidence_score"],
+                    "extracted_data": r["extracted_data"]
+                }
+                for i, r in enumerate(ordered)
+            ],
+            "analyzed_at": datetime.utcnow().isoformat()
+        }
+    
+    def _get_frame_pool(self) -> ThreadPoolExecutor:
+        if self._frame_pool is None:
+            self._frame_pool = ThreadPoolExecutor(max_workers=self.FRAME_WORKERS, thread_name_prefix="stego-frame")
+        return self._frame_pool
+    
+    def _frame_array(self, frame: Image.Image, lookup: Optional[Tuple] = None) -> np.ndarray:
+        """
+        Pixel array for analysis. Palette images are analyzed on their
+        palette indices (where palette-based tools embed) instead of being
+        expanded to RGB; other exotic modes are converted to RGB. Pillow
+        expands GIF frames after the first to RGB(A); given the first frame's
+        palette lookup, such frames are mapped back to its indices.
+        """
+        if lookup is not None and frame.mode in ("RGB", "RGBA"):
+            indices = self._palette_indices(frame, lookup)
+            if indices is not None:
+                return indices
+        if frame.mode in ("RGB", "L", "P"):
+            return np.array(frame)
+        return np.array(frame.convert("RGB"))
+    
+    def _palette_lookup(self, image: Image.Image) -> Optional[Tuple[np.ndarray, np.ndarray, Optional[int]]]:
+        """Sorted packed palette colors, their indices and the transparent index of a palette image"""
+        if image.mode != "P" or getattr(image, "n_frames", 1) < 2:
+            return None
+        palette = np.array(image.getpalette("RGB"), dtype=np.uint32).reshape(-1, 3)
+        packed = palette[:, 0] << 16 | palette[:, 1] << 8 | palette[:, 2]
+        # A color repeated in the palette maps back to its first index
+        keys, indices = np.unique(packed, return_index=True)
+        transparency = image.info.get("transparency")
+        return keys, indices.astype(np.uint8), transparency if isinstance(transparency, int) else None
+    
+    def _palette_indices(self, frame: Image.Image, lookup: Tuple) -> Optional[np.ndarray]:
+        """Palette indices of an expanded frame, or None if it uses colors outside the palette"""
+        keys, indices, transparency = lookup
+        rgba = np.asarray(frame.convert("RGBA"))
+        packed = (rgba[..., 0].astype(np.uint32) << 16) | (rgba[..., 1].astype(np.uint32) << 8) | rgba[..., 2]
+        positions = np.minimum(np.searchsorted(keys, packed), len(keys) - 1)
+        found = keys[positions] == packed
+        clear = rgba[..., 3] == 0
+        if transparency is not None:
+            found |= clear
+        if not found.all():
+            # The frame brought its own local color table; analyze it as RGB
+            return None
+        result = indices[positions]
+        if transparency is not None:
+            result[clear] = transparency
+        return result
+    
+    def _analyze_array(self, img_array: np.ndarray, image_path: str, extract_data: bool,
+                       generate_heatmap: bool) -> Dict:
+        """Run every detector on one decoded frame"""
+        
+        # Perform multiple detection methods
+        lsb_result = self._detect_lsb(img_array)
+        dct_result = self._detect_dct(img_array) if len(img_array.shape) == 3 else None
+        chi_result = self._chi_square_analysis(img_array)
+        visual_result = self._visual_analysis(img_array)
+        spam_features = extract_spam_features(img_array)
+        spam_result = self._spam_analysis(spam_features)
+        
+        # Combine results
+        has_hidden_data = any([
+            lsb_result["suspicious"],
+            dct_result["suspicious"] if dct_result else False,
+            chi_result["suspicious"],
+            visual_result["suspicious"],
+            spam_result["suspicious"]
+        ])
+        
+        # Calculate overall confidence
+        confidence = self._calculate_confidence(lsb_result, dct_result, chi_result, visual_result, spam_result)
+        
+        # Extract data if requested and detected
+        extracted_data = None
+        if extract_data and has_hidden_data:
+            extracted_data = self._extract_hidden_data(img_array, image_path)
+        
+        # Block statistics feed both the feature vector and the heatmap
+        block_stats = self._block_statistics(img_array)
+        feature_vector = self._feature_vector(img_array, block_stats)
+        
+        # Generate heatmap (only on request)
+        heatmap_path = None
+        if generate_heatmap:
+            heatmap_path = self._generate_heatmap(img_array, image_path, lsb_result, block_stats)
+        
+        return {
+            "has_hidden_data": has_hidden_data,
+            "confidence_score": confidence,
+            "detection_methods": {
+                "lsb": lsb_result,
+                "dct": dct_result,
+                "chi_square": chi_result,
+                "visual": visual_result,
+                "spam": spam_result
+            },
+            "extracted_data": extracted_data,
+            "heatmap_path": heatmap_path,
+            "statistical_analysis": {
+                "feature_version": self.FEATURE_VERSION,
+                "feature_vector": [round(float(v), 6) for v in feature_vector],
+                "spam_features": [round(float(v), 6) for v in spam_features]
+            }
+        }
+    
     def _detect_lsb(self, img_array: np.ndarray) -> Dict:
         """
         Detect LSB (Least Significant Bit) steganography.
@@ -107,7 +307,7 @@ class SteganographyDetector:
         
         # Normal LSB plane should have entropy close to 1.0
         # Hidden data increases entropy
-        suspicious = lsb_entropy > 0.7
+        suspicious = bool(lsb_entropy > 0.7)
         
         # Check for sequential patterns (common in LSB steganography)
         if len(img_array.shape) == 3:
@@ -153,7 +353,7 @@ class SteganographyDetector:
         high_freq_energy = np.sum(high_freq) / high_freq.size
         
         # Suspicious if high-frequency energy is abnormally high
-        suspicious = high_freq_energy > np.mean(freq_magnitude) * 0.1
+        suspicious = bool(high_freq_energy > np.mean(freq_magnitude) * 0.1)
         
         return {
             "method": "DCT Analysis",
@@ -192,7 +392,7 @@ class SteganographyDetector:
         chi_square_normalized = chi_square / 128
         
         # Suspicious if chi-square is low (indicates LSB manipulation)
-        suspicious = chi_square_normalized < 50
+        suspicious = bool(chi_square_normalized < 50)
         
         return {
             "method": "Chi-Square Analysis",
@@ -220,7 +420,7 @@ class SteganographyDetector:
             lsb_variance = np.var(lsb_visual)
         
         # High variance in LSB plane indicates hidden data
-        suspicious = lsb_variance > 1000
+        suspicious = bool(lsb_variance > 1000)
         
         return {
             "method": "Visual Analysis",
@@ -233,6 +433,37 @@ class SteganographyDetector:
             ]
         }
     
+    def _spam_analysis(self, spam_features: np.ndarray) -> Dict:
+        """
+        Score SPAM residual features with the logistic-regression model.
+        Without a trained model (STEGO_SPAM_MODEL) the features are still
+        persisted for training but never flag an image.
+        """
+        
+        score = spam_classifier.score(spam_features)
+        if score is None:
+            return {
+                "method": "SPAM Residual Analysis",
+                "suspicious": False,
+                "model_loaded": False,
+                "score": None,
+                "confidence": None,
+                "indicators": ["SPAM features extracted (no trained model configured)"]
+            }
+        
+        suspicious = score > 0.5
+        return {
+            "method": "SPAM Residual Analysis",
+            "suspicious": suspicious,
+            "model_loaded": True,
+            "score": round(score, 4),
+            "confidence": round(score * 100 if suspicious else (1 - score) * 100, 2),
+            "indicators": [
+                f"Stego probability: {score:.2%} {'(HIGH - suspicious)' if suspicious else '(Normal)'}",
+                "Pixel-difference Markov statistics deviate from natural images" if suspicious else "Pixel-difference statistics appear natural"
+            ]
+        }
+    
     def _extract_hidden_data(self, img_array: np.ndarray, image_path: str) -> Dict:
         """
         Attempt to extract hidden data from the image.
@@ -309,26 +540,146 @@ class SteganographyDetector:
             return random.choice(coords)
         return None
     
-    def _generate_heatmap(self, img_array: np.ndarray, image_path: str, lsb_result: Dict) -> Optional[str]:
-        """Generate heatmap visualization of suspicious regions"""
+    def _block_statistics(self, img_array: np.ndarray) -> Optional[Dict]:
+        """
+        Per-block LSB entropy and chi-square statistic of the first channel.
+        
+        The image is cropped to a whole number of blocks and reshaped to
+        (rows, cols, pixels) so every statistic is a single NumPy reduction.
+        """
+        
+        channel = img_array[:, :, 0] if len(img_array.shape) == 3 else img_array
+        height, width = channel.shape[:2]
+        block = max(self.HEATMAP_BLOCK_SIZE, -(-max(height, width) // self.HEATMAP_MAX_BLOCKS))
+        rows, cols = height // block, width // block
+        if rows == 0 or cols == 0:
+            return None
+        
+        blocks = channel[:rows * block, :cols * block].astype(np.uint8)
+        blocks = blocks.reshape(rows, block, cols, block).swapaxes(1, 2).reshape(rows * cols, block * block)
+        
+        # Binary entropy of the LSB plane in each block
+        p1 = (blocks & 1).mean(axis=1)
+        p0 = 1.0 - p1
+        entropy = -(p0 * np.log2(p0 + 1e-10) + p1 * np.log2(p1 + 1e-10))
+        
+        # Chi-square over pairs of values (2k, 2k+1): LSB embedding equalizes
+        # the two counts, so a low statistic per populated pair is suspicious.
+        offsets = np.arange(rows * cols, dtype=np.int32)[:, None] * 128
+        pair_index = (offsets + (blocks >> 1)).ravel()
+        odd = (blocks & 1).ravel()
+        n_bins = rows * cols * 128
+        odd_counts = np.bincount(pair_index, weights=odd, minlength=n_bins).reshape(rows * cols, 128)
+        all_counts = np.bincount(pair_index, minlength=n_bins).reshape(rows * cols, 128)
+        even_counts = all_counts - odd_counts
+        with np.errstate(divide="ignore", invalid="ignore"):
+            terms = np.where(all_counts > 0, (even_counts - odd_counts) ** 2 / all_counts, 0.0)
+        populated = np.maximum((all_counts > 0).sum(axis=1), 1)
+        chi_square = terms.sum(axis=1) / populated
+        
+        # Suspicion: high entropy combined with a chi-square near its
+        # embedded-data expectation of ~1 per pair.
+        suspicion = entropy / (1.0 + np.maximum(chi_square - 1.0, 0.0))
+        
+        return {
+            "block_size": int(block),
+            "grid": (rows, cols),
+            "entropy": entropy.reshape(rows, cols),
+            "chi_square": chi_square.reshape(rows, cols),
+            "suspicion": suspicion.reshape(rows, cols)
+        }
+    
+    def _colormap(self, values: np.ndarray) -> np.ndarray:
+        """Map values in [0, 1] to RGB with a blue -> green -> red ramp"""
+        
+        v = np.clip(values, 0.0, 1.0)
+        stops = [0.0, 0.25, 0.5, 0.75, 1.0]
+        red = np.interp(v, stops, [0, 0, 0, 255, 255])
+        green = np.interp(v, stops, [0, 255, 255, 255, 0])
+        blue = np.interp(v, stops, [255, 255, 0, 0, 0])
+        return np.stack([red, green, blue], axis=-1).astype(np.uint8)
+    
+    def _feature_vector(self, img_array: np.ndarray, block_stats: Optional[Dict]) -> np.ndarray:
+        """
+        Fixed-length float32 signature of an image's embedding statistics.
+        
+        Layout (FEATURE_LENGTH values):
+            24  bit-plane entropies, 8 planes x 3 channels (grayscale repeated)
+            10  chi-square curve: normalized statistic over growing row prefixes
+            10  block statistics: mean, std, p10, p50, p90 of block entropy
+                and of block chi-square
+        """
+        
+        channels = img_array if len(img_array.shape) == 3 else img_array[:, :, None]
+        channels = channels[:, :, :3]
+        if channels.shape[2] < 3:
+            channels = np.repeat(channels[:, :, :1], 3, axis=2)
+        
+        # Bit-plane entropies: the fraction of ones per plane is enough for a binary entropy
+        planes = np.arange(8, dtype=np.uint8)
+        ones = np.empty((3, 8))
+        for c in range(3):
+            counts = np.bincount(channels[:, :, c].ravel(), minlength=256)
+            bits = (np.arange(256, dtype=np.uint8)[:, None] >> planes) & 1
+            ones[c] = counts @ bits / max(counts.sum(), 1)
+        zeros = 1.0 - ones
+        bit_entropy = -(ones * np.log2(ones + 1e-10) + zeros * np.log2(zeros + 1e-10))
+        
+        # Chi-square curve: cumulative pair-of-values histograms over row chunks
+        gray = channels.mean(axis=2).astype(np.uint8) if len(img_array.shape) == 3 else img_array
+        samples = self.CHI_CURVE_SAMPLES
+        chunk_ids = np.minimum(np.arange(gray.shape[0]) * samples // max(gray.shape[0], 1), samples - 1)
+        index = (chunk_ids[:, None] * 256 + gray).ravel()
+        hist = np.cumsum(np.bincount(index, minlength=samples * 256).reshape(samples, 256), axis=0)
+        even, odd = hist[:, 0::2], hist[:, 1::2]
+        total = even + odd
+        with np.errstate(divide="ignore", invalid="ignore"):
+            terms = np.where(total > 0, (even - odd) ** 2 / total, 0.0)
+        chi_curve = terms.sum(axis=1) / np.maximum((total > 0).sum(axis=1), 1)
+        
+        # Block statistics summary
+        block_features = np.zeros(10)
+        if block_stats is not None:
+            for i, key in enumerate(("entropy", "chi_square")):
+                values = block_stats[key].ravel()
+                block_features[i * 5:(i + 1) * 5] = [
+                    values.mean(), values.std(), *np.percentile(values, [10, 50, 90])
+                ]
+        
+        return np.concatenate([bit_entropy.ravel(), chi_curve, block_features]).astype(np.float32)
+    
+    def _generate_heatmap(self, img_array: np.ndarray, image_path: str, lsb_result: Dict,
+                          stats: Optional[Dict] = None, name_suffix: str = "") -> Optional[str]:
+        """Generate a block-level heatmap of suspicious regions"""
         
         try:
-            # Create heatmap from LSB plane
-            if len(img_array.shape) == 3:
-                lsb_plane = (img_array[:, :, 0] & 1) * 255
-            else:
-                lsb_plane = (img_array & 1) * 255
+            if stats is None:
+                stats = self._block_statistics(img_array)
+            if stats is None:
+                return None
+            
+            lsb_result["block_analysis"] = {
+                "block_size": stats["block_size"],
+                "grid": list(stats["grid"]),
+                "mean_block_entropy": round(float(stats["entropy"].mean()), 4),
+                "suspicious_block_ratio": round(float((stats["suspicion"] > 0.9).mean()), 4)
+            }
             
-            # Apply color map (red = suspicious)
-            heatmap = np.zeros((*lsb_plane.shape, 3), dtype=np.uint8)
-            heatmap[:, :, 0] = lsb_plane  # Red channel
+            # One pixel per block, enlarged with nearest-neighbour so blocks stay crisp
+            heatmap_img = Image.fromarray(self._colormap(stats["suspicion"]))
+            rows, cols = stats["grid"]
+            scale = max(1, 256 // max(rows, cols))
+            if scale > 1:
+                heatmap_img = heatmap_img.resize((cols * scale, rows * scale), Image.NEAREST)
             
             # Save heatmap
-            heatmap_img = Image.fromarray(heatmap)
-            filename = os.path.basename(image_path)
-            heatmap_filename = f"stego_heatmap_{filename}"
+            name, _ = os.path.splitext(os.path.basename(image_path))
+            heatmap_filename = f"stego_heatmap_{name}{name_suffix}.png"
             heatmap_path = os.path.join(os.path.dirname(image_path), heatmap_filename)
-            heatmap_img.save(heatmap_path)
+            # The upload itself may still be persisting in the background
+            os.makedirs(os.path.dirname(heatmap_path), exist_ok=True)
+            heatmap_img.save(heatmap_path, optimize=False, compress_level=1)
+            upload_gc.register(heatmap_path)
             
             return heatmap_path
         
@@ -351,7 +702,8 @@ class SteganographyDetector:
                 consecutive += 1
         return consecutive
     
-    def _calculate_confidence(self, lsb: Dict, dct: Optional[Dict], chi: Dict, visual: Dict) -> float:
+    def _calculate_confidence(self, lsb: Dict, dct: Optional[Dict], chi: Dict, visual: Dict,
+                              spam: Optional[Dict] = None) -> float:
         """Calculate overall confidence score"""
         
         scores = [lsb["confidence"]]
@@ -364,6 +716,11 @@ class SteganographyDetector:
         weights = [0.4, 0.2, 0.25, 0.15] if dct else [0.5, 0.3, 0.2]
         confidence = sum(s * w for s, w in zip(scores, weights))
         
+        # A trained SPAM model is the strongest single signal when present
+        if spam and spam.get("model_loaded"):
+            stego_probability = spam["score"] * 100
+            confidence = 0.6 * confidence + 0.4 * stego_probability
+        
         return round(min(confidence, 100.0), 2)
 
 
@@ -0,0 +1,111 @@
+"""
+Steganography Result Cache - Skip re-analysis of images we have already seen.
+Two tiers: an in-memory LRU and the steganography_results table in SQLite.
+"""
+
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.services.database import db_service
+from app.services.metrics import metrics
+from app.services.steganography_detector import SteganographyDetector
+from app.services.upload_gc import upload_gc
+
+
+class StegoResultCache:
+    """LRU + SQLite cache of analysis results keyed by content and parameters"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        metrics.register_gauge("stego_cache.entries", lambda: len(self._entries))
+        metrics.register_gauge(
+            "stego_cache.hit_ratio",
+            lambda: metrics.ratio("stego_cache.hits", "stego_cache.hits", "stego_cache.misses")
+        )
+
+    def make_key(self, content_hash: str, extract_data: bool, method: str = "auto",
+                 multi_frame: bool = False) -> str:
+        """Cache key: content hash, parameters and detector version"""
+        mode = "frames" if multi_frame else "single"
+        return (f"{content_hash}:{int(bool(extract_data))}:{method.lower()}:{mode}"
+                f":v{SteganographyDetector.DETECTOR_VERSION}")
+
+    def _usable(self, result: Optional[Dict], require_heatmap: bool) -> bool:
+        if result is None:
+            return False
+        if require_heatmap:
+            heatmap_path = result.get("heatmap_path")
+            return bool(heatmap_path) and os.path.exists(heatmap_path)
+        return True
+
+    def get(self, key: str, require_heatmap: bool = False) -> Optional[Dict]:
+        """
+        Look up a result in memory, then in SQLite; returns a private copy.
+        
+        Args:
+            key: Key from make_key()
+            require_heatmap: Treat entries without a heatmap on disk as misses
+        """
+        result = self._memory_get(key, require_heatmap)
+        if result is not None:
+            return result
+        try:
+            stored = db_service.get_cached_stego_result(key)
+        except Exception as e:
+            print(f"Stego cache lookup failed: {e}")
+            stored = None
+        return self._stored_result(key, stored, require_heatmap)
+
+    async def get_async(self, key: str, require_heatmap: bool = False, session=None) -> Optional[Dict]:
+        """get() with the SQLite tier queried without blocking the event loop"""
+        result = self._memory_get(key, require_heatmap)
+        if result is not None:
+            return result
+        try:
+            stored = await db_service.get_cached_stego_result_async(key, session=session)
+        except Exception as e:
+            print(f"Stego cache lookup failed: {e}")
+            stored = None
+        return self._stored_result(key, stored, require_heatmap)
+
+    def _memory_get(self, key: str, require_heatmap: bool) -> Optional[Dict]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+        if not self._usable(result, require_heatmap):
+            return None
+        metrics.increment("stego_cache.hits")
+        metrics.increment("stego_cache.memory_hits")
+        upload_gc.touch(result.get("heatmap_path"))
+        return copy.deepcopy(result)
+
+    def _stored_result(self, key: str, result: Optional[Dict], require_heatmap: bool) -> Optional[Dict]:
+        if not self._usable(result, require_heatmap):
+            metrics.increment("stego_cache.misses")
+            return None
+        metrics.increment("stego_cache.hits")
+        metrics.increment("stego_cache.sqlite_hits")
+        upload_gc.touch(result.get("heatmap_path"))
+        self._remember(key, result)
+        return copy.deepcopy(result)
+
+    def put(self, key: str, result: Dict):
+        """Store a result in the memory tier (SQLite is written with the history row)"""
+        self._remember(key, copy.deepcopy(result))
+
+    def _remember(self, key: str, result: Dict):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Global instance
+stego_cache = StegoResultCache()
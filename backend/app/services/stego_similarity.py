@@ -0,0 +1,221 @@
+"""
+Steganography Similarity Index - Find past analyses with similar embedding signatures.
+Brute-force cosine search over per-user float32 matrices, with optional
+k-means clustering to prune the search on very large histories.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.database import db_service, SteganographyResult
+from app.services.steganography_detector import SteganographyDetector
+
+
+class _UserVectors:
+    """Growable matrix of normalized feature vectors for one user"""
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.size = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments: Optional[np.ndarray] = None
+        self.clustered_size = 0
+
+    def append(self, result_id: int, vector: np.ndarray):
+        if self.size == len(self.ids):
+            capacity = len(self.ids) * 2
+            self.ids = np.resize(self.ids, capacity)
+            vectors = np.empty((capacity, self.dim), dtype=np.float32)
+            vectors[:self.size] = self.vectors[:self.size]
+            self.vectors = vectors
+        self.ids[self.size] = result_id
+        self.vectors[self.size] = vector
+        self.size += 1
+
+    def remove(self, result_ids) -> int:
+        """Drop rows by result ID, keeping the rest in order; returns rows removed"""
+        keep = ~np.isin(self.ids[:self.size], result_ids)
+        removed = self.size - int(keep.sum())
+        if removed:
+            if self.assignments is not None:
+                self.assignments = self.assignments[keep[:len(self.assignments)]]
+            self.ids[:self.size - removed] = self.ids[:self.size][keep]
+            self.vectors[:self.size - removed] = self.vectors[:self.size][keep]
+            self.size -= removed
+        return removed
+
+
+class StegoSimilarityIndex:
+    """In-memory similarity index over persisted stego feature vectors"""
+
+    def __init__(self, n_clusters: int = 64, cluster_threshold: int = 50000, n_probe: int = 8):
+        """
+        Args:
+            n_clusters: Number of k-means clusters (0 disables clustering)
+            cluster_threshold: Minimum rows per user before clustering kicks in
+            n_probe: Number of nearest clusters scanned per query
+        """
+        self.dim = SteganographyDetector.FEATURE_LENGTH
+        self.version = SteganographyDetector.FEATURE_VERSION
+        self.n_clusters = n_clusters
+        self.cluster_threshold = cluster_threshold
+        self.n_probe = n_probe
+        self._users: Dict[str, _UserVectors] = {}
+        # The global lock only guards the dicts; each user's matrix (and its
+        # first load from the database) is guarded by that user's own lock
+        self._user_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _normalize(self, vector) -> Optional[np.ndarray]:
+        """Compress the heavy-tailed chi-square features and scale to unit length"""
+        v = np.asarray(vector, dtype=np.float32)
+        if v.shape != (self.dim,):
+            return None
+        v = np.sign(v) * np.log1p(np.abs(v))
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    def _extract(self, statistical_analysis: Optional[Dict]) -> Optional[np.ndarray]:
+        if not statistical_analysis or statistical_analysis.get("feature_version") != self.version:
+            return None
+        return self._normalize(statistical_analysis.get("feature_vector", []))
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        with self._lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.Lock()
+            return lock
+
+    def _load_user(self, user_id: str) -> _UserVectors:
+        """Load a user's vectors from the database on first use (caller holds the user's lock)"""
+        entry = self._users.get(user_id)
+        if entry is not None:
+            return entry
+
+        entry = _UserVectors(self.dim)
+        db = db_service.get_db()
+        try:
+            rows = db.query(SteganographyResult.id, SteganographyResult.statistical_analysis).filter(
+                SteganographyResult.user_id == user_id,
+                SteganographyResult.statistical_analysis.isnot(None)
+            ).order_by(SteganographyResult.id).yield_per(5000)
+            for result_id, analysis in rows:
+                vector = self._extract(analysis)
+                if vector is not None:
+                    entry.append(result_id, vector)
+        finally:
+            db.close()
+
+        with self._lock:
+            self._users[user_id] = entry
+        return entry
+
+    def add(self, user_id: str, result_id: int, statistical_analysis: Optional[Dict]):
+        """Register a freshly saved analysis (no-op until the user is loaded)"""
+        vector = self._extract(statistical_analysis)
+        if vector is None:
+            return
+        with self._user_lock(user_id):
+            entry = self._users.get(user_id)
+            if entry is None:
+                return
+            # A load that ran after the row was committed has already picked it up
+            if entry.size and result_id <= entry.ids[entry.size - 1] and \
+                    np.any(entry.ids[:entry.size] == result_id):
+                return
+            entry.append(result_id, vector)
+
+    def remove(self, user_id: str, result_ids: List[int]):
+        """Forget results that left the hot table (archived or deleted)"""
+        if not result_ids:
+            return
+        with self._user_lock(user_id):
+            entry = self._users.get(user_id)
+            if entry is not None:
+                entry.remove(result_ids)
+
+    def get_vector(self, user_id: str, result_id: int) -> Optional[np.ndarray]:
+        """Return the stored (normalized) vector for one of the user's results"""
+        with self._user_lock(user_id):
+            entry = self._load_user(user_id)
+            hits = np.nonzero(entry.ids[:entry.size] == result_id)[0]
+            return entry.vectors[hits[0]].copy() if len(hits) else None
+
+    def _kmeans(self, vectors: np.ndarray, iterations: int = 10) -> np.ndarray:
+        """Spherical k-means on unit vectors; returns the centroids"""
+        rng = np.random.default_rng(0)
+        k = min(self.n_clusters, len(vectors))
+        centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        return centroids
+
+    def _ensure_clusters(self, entry: _UserVectors):
+        """(Re)build clusters once the user's history has grown by half"""
+        if not self.n_clusters or entry.size < self.cluster_threshold:
+            entry.centroids = None
+            return
+        if entry.centroids is not None and entry.size < entry.clustered_size * 1.5:
+            # Assign rows appended since the last build to their nearest centroid
+            if len(entry.assignments) < entry.size:
+                tail = entry.vectors[len(entry.assignments):entry.size]
+                entry.assignments = np.concatenate([entry.assignments, np.argmax(tail @ entry.centroids.T, axis=1)])
+            return
+        vectors = entry.vectors[:entry.size]
+        entry.centroids = self._kmeans(vectors)
+        entry.assignments = np.argmax(vectors @ entry.centroids.T, axis=1)
+        entry.clustered_size = entry.size
+
+    def search(self, user_id: str, vector, limit: int = 10, exclude_id: Optional[int] = None,
+               normalized: bool = False) -> List[Dict]:
+        """
+        Find the user's past analyses most similar to a feature vector.
+
+        Args:
+            user_id: User whose history is searched
+            vector: Raw feature vector (or a normalized one if normalized=True)
+            limit: Maximum number of matches
+            exclude_id: Result ID to leave out (typically the query itself)
+
+        Returns:
+            List of {"result_id", "similarity"} sorted by descending similarity
+        """
+        query = np.asarray(vector, dtype=np.float32) if normalized else self._normalize(vector)
+        if query is None:
+            return []
+
+        # Score and pick the winners under the user's lock: remove() compacts
+        # the arrays in place, so views into them are only valid while it is held
+        with self._user_lock(user_id):
+            entry = self._load_user(user_id)
+            self._ensure_clusters(entry)
+            ids = entry.ids[:entry.size]
+            vectors = entry.vectors[:entry.size]
+
+            if entry.centroids is not None:
+                probe = np.zeros(len(entry.centroids), dtype=bool)
+                probe[np.argsort(entry.centroids @ query)[::-1][:self.n_probe]] = True
+                candidates = np.nonzero(probe[entry.assignments])[0]
+                ids, vectors = ids[candidates], vectors[candidates]
+
+            scores = vectors @ query
+            if exclude_id is not None:
+                scores = np.where(ids == exclude_id, -np.inf, scores)
+            count = min(limit, int(np.isfinite(scores).sum()))
+            if count <= 0:
+                return []
+            top = np.argpartition(-scores, count - 1)[:count]
+            top = top[np.argsort(-scores[top])]
+            return [{"result_id": int(ids[i]), "similarity": round(float(scores[i]), 4)} for i in top]
+
+# Global instance
+stego_index = StegoSimilarityIndex()
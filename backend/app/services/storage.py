@@ -1,53 +1,302 @@
+import asyncio
+import hashlib
+import io
+import mmap
 import os
-import shutil
+import re
+import tempfile
+from typing import BinaryIO, Dict, Optional, Tuple
 from fastapi import UploadFile
+from starlette.formparsers import MultiPartParser
 from app.config import settings
+from app.services.database import db_service
+from app.services.replication import replication_queue
+from app.services.upload_gc import upload_gc
+from app.services.derivatives import derivative_service
+
+class _MemoryReader(io.RawIOBase):
+    """Seekable read-only file object over a memoryview (no up-front copy)"""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = max(0, min(len(buffer), len(self._view) - self._pos))
+        buffer[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+class UploadBuffer:
+    """
+    Upload bytes handed to analysis stages without a disk round trip.
+
+    Backed either by a copy of a small in-memory upload or by an mmap of the
+    spooled temp file. Use open() for PIL.Image.open and array() for
+    cv2.imdecode.
+    """
+
+    def __init__(self, view: memoryview):
+        self.view = view
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+    def open(self) -> io.RawIOBase:
+        """Fresh file-like reader positioned at the start"""
+        return _MemoryReader(self.view)
+
+    def array(self):
+        """uint8 NumPy view of the bytes (no copy)"""
+        import numpy as np
+        return np.frombuffer(self.view, dtype=np.uint8)
 
-try:
-    from supabase import create_client, Client
-except ImportError:
-    create_client = None
 
 class StorageService:
+    """
+    Content-addressed upload storage.
+
+    Uploads are streamed to disk in chunks on a worker thread while their
+    SHA-256 is computed, then stored once per unique content under
+    UPLOAD_DIR/objects/<hash[:2]>/<hash><ext>. Identical uploads share the
+    stored file and only bump its reference count.
+
+    ingest() skips the write/read round trip for analysis: decoders get an
+    UploadBuffer and the bytes are persisted by a background task.
+
+    Newly stored content is fsynced and then queued for replication to the
+    configured object store; requests never wait on the remote upload.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+    OBJECTS_DIR = "objects"
+    INCOMING_DIR = ".incoming"
+
     def __init__(self):
-        self.supabase: Client | None = None
-        if settings.SUPABASE_URL and settings.SUPABASE_KEY and create_client:
+        os.makedirs(os.path.join(settings.UPLOAD_DIR, self.INCOMING_DIR), exist_ok=True)
+        self._pending_writes: Dict[str, asyncio.Task] = {}
+
+    def _extension(self, filename: Optional[str]) -> str:
+        """Keep a short, safe extension so decoders and browsers can sniff the type"""
+        ext = os.path.splitext(filename or "")[1].lower()
+        return ext if re.fullmatch(r"\.[a-z0-9]{1,8}", ext) else ""
+
+    def object_path(self, content_hash: str, ext: str = "") -> str:
+        return os.path.join(settings.UPLOAD_DIR, self.OBJECTS_DIR, content_hash[:2], f"{content_hash}{ext}")
+
+    def _stream_to_store(self, source: BinaryIO, ext: str) -> dict:
+        """Copy source to a temp file chunk by chunk, hashing as we go (blocking)"""
+        digest = hashlib.sha256()
+        size = 0
+        incoming = os.path.join(settings.UPLOAD_DIR, self.INCOMING_DIR)
+        fd, temp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in iter(lambda: source.read(self.CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+
+            content_hash = digest.hexdigest()
+            final_path = self.object_path(content_hash, ext)
+            deduplicated = os.path.exists(final_path)
+            if deduplicated:
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                # Atomic: concurrent identical uploads just replace equal bytes
+                os.replace(temp_path, final_path)
+            return {"content_hash": content_hash, "size": size, "path": final_path, "written": not deduplicated}
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _persist_view(self, view: memoryview, final_path: str) -> bool:
+        """Write buffered bytes to their content-addressed path unless already there (blocking); True if written"""
+        if os.path.exists(final_path):
+            return False
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.join(settings.UPLOAD_DIR, self.INCOMING_DIR))
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for offset in range(0, len(view), self.CHUNK_SIZE):
+                    out.write(view[offset:offset + self.CHUNK_SIZE])
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(temp_path, final_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return True
+
+    def _take_upload_view(self, file: UploadFile) -> memoryview:
+        """
+        View of an upload's bytes, without a copy where possible.
+
+        A BytesIO hands over its bytes via getvalue() (shared rather than
+        copied when CPython can, and unlike getbuffer() it does not stop the
+        request from closing it). Files on disk, including
+        spooled uploads past Starlette's spool limit (which have rolled
+        over), are mmapped; the mapping outlives the request closing the
+        file. Calling fileno() on a spooled file that is still in memory
+        would write it to disk, so small spooled uploads (at most
+        spool_max_size bytes) are read into a single copy instead.
+        """
+        source = file.file
+        if isinstance(source, io.BytesIO):
+            return memoryview(source.getvalue())
+        size = source.seek(0, os.SEEK_END)
+        if size == 0:
+            return memoryview(b"")
+        if not isinstance(source, tempfile.SpooledTemporaryFile) or size > MultiPartParser.spool_max_size:
+            try:
+                return memoryview(mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ))
+            except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+                pass
+        source.seek(0)
+        return memoryview(source.read())
+
+    async def ingest(self, file: UploadFile) -> Tuple[dict, UploadBuffer]:
+        """
+        Accept an upload for in-memory analysis.
+
+        Returns the same dict as save_file() plus an UploadBuffer over the
+        bytes. The content reference is registered before returning, so
+        local_path is where the content lives (an earlier upload's path when
+        it was deduplicated); the file itself is written in the background,
+        so await wait_persisted(content_hash) before handing the path to code
+        that opens it.
+        """
+        view = self._take_upload_view(file)
+        content_hash = await asyncio.to_thread(lambda: hashlib.sha256(view).hexdigest())
+        ext = self._extension(file.filename)
+        record, created = await asyncio.to_thread(
+            db_service.add_file_reference,
+            content_hash, self.object_path(content_hash, ext), len(view), file.content_type, file.filename
+        )
+        path = record.path
+        # Writes of the same content run one after another, so the latest task covers them all
+        previous = self._pending_writes.get(content_hash)
+
+        async def persist():
+            if previous is not None:
+                await asyncio.gather(previous, return_exceptions=True)
             try:
-                self.supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-            except Exception as e:
-                print(f"Warning: Supabase init failed: {e}")
+                # Also rewrites deduplicated content whose file has gone missing
+                written = await asyncio.to_thread(self._persist_view, view, path)
+            except BaseException:
+                await asyncio.to_thread(db_service.release_file_reference, content_hash)
+                raise
+            if written:
+                upload_gc.register(path, content_hash)
+                self._schedule_derivatives(path, file.content_type)
+            else:
+                upload_gc.touch(path)
+            if created:
+                await asyncio.to_thread(replication_queue.enqueue, content_hash, path, file.content_type)
+
+        task = asyncio.create_task(persist())
+        self._pending_writes[content_hash] = task
+        task.add_done_callback(lambda t: self._on_persisted(content_hash, t))
+
+        replication = "skipped"
+        if not created:
+            replication = "deduplicated"
+        elif replication_queue.enabled:
+            replication = "queued"
+
+        result = {
+            "filename": file.filename,
+            "local_path": path,
+            "content_hash": content_hash,
+            "size": len(view),
+            "deduplicated": not created,
+            "ref_count": record.ref_count,
+            "persistence": "background",
+            "replication": replication
+        }
+        return result, UploadBuffer(view)
+
+    def _on_persisted(self, content_hash: str, task: asyncio.Task):
+        if self._pending_writes.get(content_hash) is task:
+            del self._pending_writes[content_hash]
+        if not task.cancelled() and task.exception():
+            print(f"Background persist failed for {content_hash}: {task.exception()}")
+
+    async def wait_persisted(self, content_hash: Optional[str] = None):
+        """Wait for one (or every) pending background write"""
+        if content_hash is not None:
+            task = self._pending_writes.get(content_hash)
+            tasks = [task] if task else []
+        else:
+            tasks = list(self._pending_writes.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     async def save_file(self, file: UploadFile) -> dict:
         """
-        Saves file locally and optionally uploads to Supabase.
-        Returns a dict with file path and status.
+        Saves file locally (content-addressed) and queues it for object storage
+        replication. Returns a dict with file path, content hash, size and status.
         """
-        # 1. Save locally
-        file_location = os.path.join(settings.UPLOAD_DIR, file.filename)
-        
-        # Reset file cursor just in case
+        # 1. Stream to local store off the event loop
         await file.seek(0)
-        
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        result = {
+        stored = await asyncio.to_thread(self._stream_to_store, file.file, self._extension(file.filename))
+
+        record, created = await asyncio.to_thread(
+            db_service.add_file_reference,
+            stored["content_hash"], stored["path"], stored["size"], file.content_type, file.filename
+        )
+        if not created and stored["written"] and record.path != stored["path"]:
+            # Same content already stored under another extension; keep one copy
+            os.remove(stored["path"])
+        if stored["written"] and record.path == stored["path"]:
+            upload_gc.register(record.path, stored["content_hash"])
+            self._schedule_derivatives(record.path, file.content_type)
+        else:
+            upload_gc.touch(record.path)
+
+        replication = "skipped"
+        if not created:
+            replication = "deduplicated"
+        elif await asyncio.to_thread(replication_queue.enqueue, stored["content_hash"], record.path, file.content_type):
+            replication = "queued"
+
+        return {
             "filename": file.filename,
-            "local_path": file_location,
-            "supabase_upload": "skipped"
+            "local_path": record.path,
+            "content_hash": stored["content_hash"],
+            "size": stored["size"],
+            "deduplicated": not created,
+            "ref_count": record.ref_count,
+            "replication": replication
         }
 
-        # 2. Upload to Supabase (if configured)
-        if self.supabase:
-            try:
-                with open(file_location, "rb") as f:
-                    file_bytes = f.read()
-                    # Determine bucket? Let's assume 'uploads' bucket exists or just print log
-                    # self.supabase.storage.from_("uploads").upload(file.filename, file_bytes)
-                    result["supabase_upload"] = "configured_but_bucket_pending" 
-            except Exception as e:
-                result["supabase_upload"] = f"failed: {str(e)}"
-        
-        return result
+    def _schedule_derivatives(self, path: str, content_type: Optional[str]):
+        if settings.DERIVATIVES_EAGER and (content_type or "").startswith("image/"):
+            derivative_service.schedule(path, variants=("thumb",))
+
+    def public_url(self, path: str) -> str:
+        """URL under the /uploads static mount for a file inside UPLOAD_DIR"""
+        relative = os.path.relpath(path, settings.UPLOAD_DIR) if os.path.isabs(path) else path
+        return "/uploads/" + relative.replace(os.sep, "/")
 
 storage_service = StorageService()
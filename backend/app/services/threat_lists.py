@@ -0,0 +1,237 @@
+"""
+Threat Lists - Longest-prefix matching of visitor IPs against local CIDR lists.
+Every file in THREAT_LISTS_DIR (e.g. tor.txt, malicious.netset, vpn.txt)
+holds one address or CIDR per line and tags its prefixes with the file
+name. Nested prefixes are flattened into disjoint ranges, each pointing
+at its longest matching prefix and the tags of every list covering it,
+and searched through an IPRangeTable. The directory is watched and a
+changed set of files is loaded into a new table that replaces the old one
+in a single assignment.
+"""
+
+import asyncio
+import ipaddress
+import os
+import socket
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.ip_ranges import MISS, IPRangeTable, merge_ranges, parse_ip
+from app.services.metrics import metrics
+
+LIST_EXTENSIONS = (".txt", ".netset", ".ipset", ".list", ".cidr")
+
+# (version, first address, prefix length)
+Prefix = Tuple[int, int, int]
+
+
+def read_list(path: str) -> Iterator[Prefix]:
+    """Prefixes in a list file; comments (#, ;) and unparsable lines are skipped"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            entry = line.split("#", 1)[0].split(";", 1)[0].strip()
+            if not entry:
+                continue
+            address, _, length = entry.split()[0].partition("/")
+            for family, version, bits in ((socket.AF_INET, 4, 32), (socket.AF_INET6, 6, 128)):
+                try:
+                    value = int.from_bytes(socket.inet_pton(family, address), "big")
+                except (OSError, ValueError):
+                    continue
+                if not length:
+                    prefix_length = bits
+                elif length.isdigit():
+                    prefix_length = int(length)
+                else:
+                    break
+                if prefix_length <= bits:
+                    host_bits = bits - prefix_length
+                    yield version, value >> host_bits << host_bits, prefix_length
+                break
+
+
+class CIDRTable:
+    """Tagged CIDR prefixes flattened into disjoint longest-prefix ranges"""
+
+    def __init__(self, prefixes: Dict[Prefix, Set[str]]):
+        """
+        Args:
+            prefixes: Tags of each (version, first address, prefix length)
+        """
+        self.records: List[Tuple[str, Tuple[str, ...]]] = []
+        families = {4: [], 6: []}
+        for (version, start, prefix_length), tags in prefixes.items():
+            families[version].append((start, prefix_length, tags))
+        self.prefix_count = len(prefixes)
+        self.ranges = IPRangeTable(self._flatten(families[4], 4), self._flatten(families[6], 6))
+
+    def _flatten(self, entries: List[Tuple[int, int, Set[str]]], version: int) -> List[Tuple[int, int, int]]:
+        """
+        Sweep prefixes in address order with a stack of the ones still open;
+        each emitted range belongs to the innermost (longest) open prefix.
+        """
+        bits = 32 if version == 4 else 128
+        address = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        ranges: List[Tuple[int, int, int]] = []
+        stack: List[Tuple[int, int]] = []  # (last address, record index)
+        cursor = 0
+
+        def close_until(position: int):
+            nonlocal cursor
+            while stack and stack[-1][0] < position:
+                end, record = stack.pop()
+                if cursor <= end:
+                    ranges.append((cursor, end, record))
+                cursor = end + 1
+
+        for start, prefix_length, tags in entries:
+            close_until(start)
+            if stack and cursor < start:
+                ranges.append((cursor, start - 1, stack[-1][1]))
+            inherited = self.records[stack[-1][1]][1] if stack else ()
+            self.records.append((f"{address(start)}/{prefix_length}", tuple(sorted(set(tags).union(inherited)))))
+            stack.append((start + (1 << (bits - prefix_length)) - 1, len(self.records) - 1))
+            cursor = start
+        close_until(1 << bits)
+        return merge_ranges(ranges)
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+
+class ThreatListService:
+    """Tagged blocklist / Tor / VPN prefix matching with hot reload"""
+
+    def __init__(self, directory: str, anonymizer_tags: List[str], cache_size: int = 65536,
+                 reload_interval: float = 60):
+        """
+        Args:
+            directory: Folder of list files; each file name (without extension) is its tag
+            anonymizer_tags: Tags meaning Tor/VPN/proxy rather than known-malicious
+            cache_size: LRU entries for single-address matches
+            reload_interval: Seconds between checks for changed files
+        """
+        self.directory = directory
+        self.anonymizer_tags = frozenset(tag.strip().lower() for tag in anonymizer_tags if tag.strip())
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+        self.lists: Dict[str, int] = {}
+        # Table and its match cache, swapped together so a match never mixes generations
+        self._state = self._bind(CIDRTable({}))
+        self._signature: Tuple = ()
+        self._task: Optional[asyncio.Task] = None
+        metrics.register_gauge("threat_lists.prefixes", lambda: self._state[0].prefix_count)
+
+    def _list_files(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(os.path.join(self.directory, name) for name in names
+                      if name.lower().endswith(LIST_EXTENSIONS) and not name.startswith("."))
+
+    def _files_signature(self) -> Tuple:
+        signature = []
+        for path in self._list_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature.append((path, stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    def load(self) -> int:
+        """
+        Build a table from every list file and swap it in.
+        Runs in a worker thread; matches keep using the old table until the swap.
+
+        Returns:
+            Number of distinct prefixes loaded
+        """
+        signature = self._files_signature()
+        prefixes: Dict[Prefix, Set[str]] = {}
+        lists: Dict[str, int] = {}
+        for path, *_ in signature:
+            tag = os.path.splitext(os.path.basename(path))[0].lower()
+            count = 0
+            for prefix in read_list(path):
+                prefixes.setdefault(prefix, set()).add(tag)
+                count += 1
+            lists[tag] = lists.get(tag, 0) + count
+        table = CIDRTable(prefixes)
+        self._state, self.lists = self._bind(table), lists
+        self._signature = signature
+        metrics.increment("threat_lists.reloads")
+        return table.prefix_count
+
+    def _bind(self, table: CIDRTable):
+        def find(ip: str) -> int:
+            parsed = parse_ip(ip)
+            return table.ranges.find(*parsed) if parsed is not None else MISS
+        return table, lru_cache(maxsize=self.cache_size)(find)
+
+    def _record(self, index: int, table: CIDRTable) -> Optional[Dict]:
+        if index == MISS:
+            return None
+        prefix, tags = table.records[index]
+        return {"prefix": prefix, "tags": list(tags)}
+
+    def match(self, ip: str) -> Optional[Dict]:
+        """Longest matching prefix and the tags of all lists containing the address, or None"""
+        table, find = self._state
+        return self._record(find(ip), table)
+
+    def match_many(self, ips: List[str]) -> List[Optional[Dict]]:
+        """Batch match; each address family is searched in one vectorized call"""
+        table = self._state[0]
+        return [self._record(index, table) for index in table.ranges.find_many(ips).tolist()]
+
+    def is_anonymizer(self, tags: List[str]) -> bool:
+        return any(tag in self.anonymizer_tags for tag in tags)
+
+    def is_malicious(self, tags: List[str]) -> bool:
+        return any(tag not in self.anonymizer_tags for tag in tags)
+
+    async def start(self):
+        """Load the lists and watch the directory for changes"""
+        if self._task is None:
+            await self._reload_if_changed()
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _reload_if_changed(self):
+        signature = self._files_signature()
+        if signature == self._signature:
+            return
+        try:
+            count = await asyncio.to_thread(self.load)
+            print(f"Loaded {count} threat list prefixes from {len(self.lists)} lists")
+        except Exception as e:
+            # Keep matching against the previous lists; retry once the files change again
+            self._signature = signature
+            metrics.increment("threat_lists.reload_errors")
+            print(f"Threat list load failed for {self.directory}: {e}")
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self._reload_if_changed()
+
+
+# Global instance
+threat_lists = ThreatListService(
+    settings.THREAT_LISTS_DIR,
+    anonymizer_tags=settings.THREAT_LIST_ANONYMIZER_TAGS,
+    cache_size=settings.THREAT_LISTS_CACHE_SIZE,
+    reload_interval=settings.THREAT_LISTS_RELOAD_INTERVAL
+)
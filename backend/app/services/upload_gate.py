@@ -0,0 +1,245 @@
+"""
+Upload Gate - Reject unwanted uploads before their body is consumed.
+An ASGI middleware peeks at the first KB of the first file in a multipart
+request, sniffs its type (python-magic, or a built-in signature table) and
+reads image header dimensions, then applies per-route size, type and
+pixel limits. Bodies that pass are replayed to the app untouched.
+"""
+
+import io
+import json
+import re
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from app.config import settings
+from app.services.metrics import metrics
+
+try:
+    import magic
+except ImportError:
+    magic = None
+
+
+# (offset, signature, media type) for when python-magic is unavailable
+_SIGNATURES = [
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"BM", "image/bmp"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+    (8, b"WEBP", "image/webp"),
+    (8, b"AVI ", "video/x-msvideo"),
+    (8, b"WAVE", "audio/x-wav"),
+    (4, b"ftypqt", "video/quicktime"),
+    (4, b"ftypM4A", "audio/mp4"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"\xff\xfb", "audio/mpeg"),
+    (0, b"\xff\xf3", "audio/mpeg"),
+    (0, b"\xff\xf1", "audio/aac"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"fLaC", "audio/flac"),
+]
+
+
+def sniff_media_type(head: bytes) -> Optional[str]:
+    """Media type from magic bytes (None if unrecognized)"""
+    if magic is not None:
+        try:
+            detected = magic.from_buffer(head, mime=True)
+            if detected and detected not in ("application/octet-stream", "application/x-empty"):
+                return detected
+        except Exception as e:
+            print(f"python-magic failed, using signature table: {e}")
+    for offset, signature, media_type in _SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return media_type
+    return None
+
+
+def image_dimensions(head: bytes) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) from an image header; PIL only parses the header on open.
+    Raises Image.DecompressionBombError past PIL's own hard pixel limit.
+    """
+    try:
+        with warnings.catch_warnings():
+            # The pixel limit is ours to enforce; don't log PIL's softer warning
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(head)) as img:
+                return img.size
+    except Image.DecompressionBombError:
+        raise
+    except Exception:
+        return None
+
+
+class UploadPolicy:
+    """Limits applied to the file uploaded to one route"""
+
+    def __init__(self, max_bytes: int, allowed_types: List[str], max_pixels: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.allowed_types = allowed_types  # media types or prefixes ending in "/"
+        self.max_pixels = max_pixels
+
+    def allows(self, media_type: Optional[str]) -> bool:
+        if media_type is None:
+            return False
+        return any(media_type == t or (t.endswith("/") and media_type.startswith(t)) for t in self.allowed_types)
+
+
+def default_policies() -> Dict[str, UploadPolicy]:
+    """Per-route policies from settings; UPLOAD_LIMITS (JSON) overrides fields per route"""
+    image = dict(max_bytes=settings.UPLOAD_MAX_IMAGE_BYTES, allowed_types=["image/"],
+                 max_pixels=settings.UPLOAD_MAX_PIXELS)
+    routes = {
+        f"{settings.API_PREFIX}/scan": image,
+        f"{settings.API_PREFIX}/stego/analyze": image,
+        f"{settings.API_PREFIX}/stego/extract": image,
+        f"{settings.API_PREFIX}/scan/video": dict(max_bytes=settings.UPLOAD_MAX_VIDEO_BYTES,
+                                                  allowed_types=["video/"]),
+        f"{settings.API_PREFIX}/scan/audio": dict(max_bytes=settings.UPLOAD_MAX_AUDIO_BYTES,
+                                                  allowed_types=["audio/", "video/webm", "video/mp4"]),
+    }
+    for path, overrides in settings.UPLOAD_LIMITS.items():
+        routes[path] = {**routes.get(path, image), **overrides}
+    return {path: UploadPolicy(**limits) for path, limits in routes.items()}
+
+
+class UploadGateMiddleware:
+    """Pure ASGI middleware enforcing UploadPolicy on multipart uploads"""
+
+    SNIFF_BYTES = 64 * 1024        # Enough for JPEG headers behind typical EXIF blocks
+    MAX_PREAMBLE_BYTES = 1024 * 1024  # Give up sniffing if no file part starts by then
+    MULTIPART_OVERHEAD = 64 * 1024  # Boundaries and part headers counted in Content-Length
+
+    def __init__(self, app, policies: Optional[Dict[str, UploadPolicy]] = None):
+        self.app = app
+        self.policies = policies if policies is not None else default_policies()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+        policy = self.policies.get(scope["path"].rstrip("/") or "/")
+        if policy is None:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and \
+                int(content_length) > policy.max_bytes + self.MULTIPART_OVERHEAD:
+            return await self._reject(send, 413, "too_large", f"Upload exceeds {policy.max_bytes} bytes")
+
+        boundary = self._boundary(headers.get(b"content-type", b""))
+        if boundary is None:
+            return await self.app(scope, receive, send)
+
+        # Buffer just enough of the body to see the start of the file
+        buffered = []
+        size = 0
+        more_body = True
+        head = None
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            buffered.append(message.get("body", b""))
+            size += len(buffered[-1])
+            more_body = message.get("more_body", False)
+            head = self._file_head(b"".join(buffered), boundary)
+            if (head is not None and len(head) >= self.SNIFF_BYTES) or size >= self.MAX_PREAMBLE_BYTES:
+                break
+
+        if head is not None:
+            rejection = self._check(policy, head[:self.SNIFF_BYTES])
+            if rejection:
+                return await self._reject(send, *rejection)
+
+        await self._forward(scope, receive, send, policy, b"".join(buffered), size, more_body)
+
+    async def _forward(self, scope, receive, send, policy: UploadPolicy, body: bytes, size: int, more_body: bool):
+        """Replay the buffered prefix, then stream the rest while enforcing max_bytes"""
+        state = {"replayed": False, "size": size, "rejected": False, "started": False}
+        limit = policy.max_bytes + self.MULTIPART_OVERHEAD
+
+        async def gated_receive():
+            if not state["replayed"]:
+                state["replayed"] = True
+                return {"type": "http.request", "body": body, "more_body": more_body}
+            if state["rejected"]:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                state["size"] += len(message.get("body", b""))
+                if state["size"] > limit and not state["started"]:
+                    # Chunked upload without Content-Length ran past the limit
+                    state["rejected"] = True
+                    await self._reject(send, 413, "too_large", f"Upload exceeds {policy.max_bytes} bytes")
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def gated_send(message):
+            if state["rejected"]:
+                return
+            state["started"] = True
+            await send(message)
+
+        await self.app(scope, gated_receive, gated_send)
+
+    def _boundary(self, content_type: bytes) -> Optional[bytes]:
+        if not content_type.lower().startswith(b"multipart/form-data"):
+            return None
+        match = re.search(rb'boundary="?([^";]+)"?', content_type)
+        return match.group(1) if match else None
+
+    def _file_head(self, data: bytes, boundary: bytes) -> Optional[bytes]:
+        """Leading bytes of the first part carrying a filename (None until its headers arrive)"""
+        delimiter = b"--" + boundary
+        position = data.find(delimiter)
+        while position != -1:
+            headers_end = data.find(b"\r\n\r\n", position)
+            if headers_end == -1:
+                return None
+            part_headers = data[position:headers_end].lower()
+            content_start = headers_end + 4
+            content_end = data.find(b"\r\n" + delimiter, content_start)
+            if b"filename=" in part_headers:
+                return data[content_start:content_end if content_end != -1 else len(data)]
+            if content_end == -1:
+                return None
+            position = content_end + 2
+        return None
+
+    def _check(self, policy: UploadPolicy, head: bytes) -> Optional[Tuple[int, str, str]]:
+        """(status, reason, message) if the file must be rejected"""
+        media_type = sniff_media_type(head)
+        if not policy.allows(media_type):
+            return 415, "unsupported_type", f"Unsupported file type: {media_type or 'unknown'}"
+        if policy.max_pixels and media_type.startswith("image/"):
+            try:
+                dimensions = image_dimensions(head)
+            except Image.DecompressionBombError as e:
+                return 413, "too_many_pixels", str(e)
+            if dimensions and dimensions[0] * dimensions[1] > policy.max_pixels:
+                return 413, "too_many_pixels", (f"Image is {dimensions[0]}x{dimensions[1]}, "
+                                                f"limit is {policy.max_pixels} pixels")
+        return None
+
+    async def _reject(self, send, status: int, reason: str, detail: str):
+        metrics.increment("upload_gate.rejected")
+        metrics.increment(f"upload_gate.rejected.{reason}")
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,232 @@
+"""
+Upload Garbage Collector - Keep UPLOAD_DIR under a byte budget.
+Files are tracked in the upload_index table as they are written, so eviction
+passes are SQL queries (LRU by last access, optional TTL) instead of
+directory walks. Files referenced by steganography results, or explicitly
+pinned, are never evicted.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.database import db_service
+from app.services.metrics import metrics
+
+
+class UploadGarbageCollector:
+    """Size-budgeted LRU/TTL eviction for UPLOAD_DIR"""
+
+    LOW_WATERMARK = 0.9  # Evict down to 90% of the budget to avoid thrashing
+    BATCH_SIZE = 500
+    SKIP_DIRS = {".incoming"}  # StorageService temp files
+
+    def __init__(self, root: str, budget_bytes: int, ttl_hours: float = 0, interval: float = 300):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self.ttl = timedelta(hours=ttl_hours) if ttl_hours > 0 else None
+        self.interval = interval
+        self._pending: Dict[str, Dict] = {}
+        self._touches: Dict[str, datetime] = {}
+        self._used_bytes: Optional[int] = None
+        self._reconciled = False
+        self._lock = threading.Lock()
+        self._pass_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        metrics.register_gauge("upload_gc.used_bytes", lambda: self._used_bytes or 0)
+        metrics.register_gauge("upload_gc.budget_bytes", lambda: self.budget_bytes)
+
+    def _kind(self, path: str) -> str:
+        name = os.path.basename(path)
+        if name.startswith("stego_heatmap_"):
+            return "stego_heatmap"
+        if name.startswith("heatmap_"):
+            return "heatmap"
+        if os.path.relpath(path, self.root).startswith("objects" + os.sep):
+            return "object"
+        return "other"
+
+    def register(self, path: str, content_hash: Optional[str] = None):
+        """Track a file just written under UPLOAD_DIR (buffered until the next flush)"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        now = datetime.utcnow()
+        with self._lock:
+            self._pending[path] = {
+                "path": path, "size": size, "kind": self._kind(path),
+                "content_hash": content_hash, "last_access": now, "created_at": now
+            }
+            if self._used_bytes is not None:
+                self._used_bytes += size
+            over_budget = self._used_bytes is not None and self._used_bytes > self.budget_bytes
+        if over_budget:
+            self._wake()
+
+    def touch(self, path: Optional[str]):
+        """Record a read so LRU eviction keeps the file longer"""
+        if not path:
+            return
+        with self._lock:
+            self._touches[path] = datetime.utcnow()
+
+    def pin(self, path: str, pinned: bool = True) -> bool:
+        """Exempt a file from eviction (or release it); returns False if untracked"""
+        self.flush()
+        return db_service.set_upload_pinned(path, pinned)
+
+    def flush(self):
+        """Write buffered registrations and touches to the index"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            touches, self._touches = self._touches, {}
+        if pending or touches:
+            db_service.upsert_upload_entries(list(pending.values()), touches)
+
+    def reconcile(self) -> Dict:
+        """
+        Full walk, once per process start: index files written outside the
+        collector (or before it existed) and drop rows whose files are gone.
+        """
+        indexed = db_service.get_indexed_upload_paths()
+        found = set()
+        imported = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in self.SKIP_DIRS]
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                found.add(path)
+                if path in indexed:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                modified = datetime.utcfromtimestamp(max(stat.st_atime, stat.st_mtime))
+                imported.append({
+                    "path": path, "size": stat.st_size, "kind": self._kind(path),
+                    "last_access": modified, "created_at": modified
+                })
+                if len(imported) >= self.BATCH_SIZE:
+                    db_service.upsert_upload_entries(imported)
+                    imported = []
+        if imported:
+            db_service.upsert_upload_entries(imported)
+        missing = list(indexed - found)
+        for i in range(0, len(missing), self.BATCH_SIZE):
+            db_service.remove_upload_entries(missing[i:i + self.BATCH_SIZE])
+        return {"imported": len(found - indexed), "missing": len(missing)}
+
+    def _evict(self, candidates: List[Tuple[str, int]]) -> Tuple[int, int]:
+        """Delete files and their index rows; returns (files, bytes) reclaimed"""
+        removed = []
+        reclaimed = 0
+        for path, size in candidates:
+            try:
+                os.remove(path)
+                reclaimed += size
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Upload GC: could not remove {path}: {e}")
+                continue
+            removed.append(path)
+        db_service.remove_upload_entries(removed)
+        metrics.increment("upload_gc.evictions", len(removed))
+        metrics.increment("upload_gc.reclaimed_bytes", reclaimed)
+        return len(removed), reclaimed
+
+    def run_pass(self) -> Dict:
+        """One eviction pass (blocking): TTL expiry, then LRU down to the low watermark"""
+        with self._pass_lock:
+            started = time.perf_counter()
+            if not self._reconciled:
+                self.reconcile()
+                self._reconciled = True
+            self.flush()
+
+            evicted = reclaimed = 0
+            if self.ttl is not None:
+                cutoff = datetime.utcnow() - self.ttl
+                while True:
+                    candidates = db_service.get_eviction_candidates(self.BATCH_SIZE, accessed_before=cutoff)
+                    if not candidates:
+                        break
+                    count, size = self._evict(candidates)
+                    metrics.increment("upload_gc.ttl_evictions", count)
+                    evicted, reclaimed = evicted + count, reclaimed + size
+                    if count == 0:
+                        break
+
+            used = db_service.get_upload_usage()
+            if used > self.budget_bytes:
+                target = int(self.budget_bytes * self.LOW_WATERMARK)
+                while used > target:
+                    candidates = db_service.get_eviction_candidates(self.BATCH_SIZE)
+                    batch = []
+                    for path, size in candidates:
+                        batch.append((path, size))
+                        used -= size
+                        if used <= target:
+                            break
+                    count, size = self._evict(batch)
+                    evicted, reclaimed = evicted + count, reclaimed + size
+                    if count == 0:
+                        if not candidates:
+                            print("Upload GC: budget exceeded but every remaining file is pinned")
+                        break
+
+            with self._lock:
+                self._used_bytes = db_service.get_upload_usage() + sum(e["size"] for e in self._pending.values())
+            metrics.increment("upload_gc.passes")
+            metrics.observe("upload_gc.pass_seconds", time.perf_counter() - started)
+            return {"evicted": evicted, "reclaimed_bytes": reclaimed, "used_bytes": self._used_bytes}
+
+    def _wake(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self):
+        """Run eviction passes every interval (or sooner when over budget)"""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._loop = None
+        # Persist buffered registrations so the next start does not re-walk them
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_pass)
+            except Exception as e:
+                print(f"Upload GC pass failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Global instance
+upload_gc = UploadGarbageCollector(
+    settings.UPLOAD_DIR,
+    settings.UPLOAD_BUDGET_BYTES,
+    ttl_hours=settings.UPLOAD_TTL_HOURS,
+    interval=settings.UPLOAD_GC_INTERVAL
+)
@@ -0,0 +1,37 @@
+"""
+Visitor Log Writer - Write-behind buffer for reverse OSINT visitor logs.
+Records are queued in memory and flushed with one multi-row INSERT every
+N records or M milliseconds, instead of one commit (and fsync) per request.
+"""
+
+from datetime import datetime
+from typing import Dict, List
+
+from app.config import settings
+from app.services.database import db_service
+from app.services.write_behind import WriteBehindWriter
+
+
+class VisitorLogWriter(WriteBehindWriter):
+    """Bounded, batching write-behind queue for ReverseOSINTLog rows"""
+
+    name = "visitor_log"
+
+    def write(self, records: List[Dict]):
+        db_service.insert_visitor_logs(records)
+
+    def submit(self, record: Dict) -> bool:
+        """
+        Queue one visitor log (ReverseOSINTLog column names as keys).
+        Returns False if the record was dropped because the queue is full.
+        """
+        record.setdefault("timestamp", datetime.utcnow())
+        return super().submit(record)
+
+
+# Global instance
+visitor_log_writer = VisitorLogWriter(
+    batch_size=settings.VISITOR_LOG_BATCH_SIZE,
+    flush_interval_ms=settings.VISITOR_LOG_FLUSH_MS,
+    max_pending=settings.VISITOR_LOG_MAX_PENDING
+)
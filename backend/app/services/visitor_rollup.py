@@ -0,0 +1,114 @@
+"""
+Visitor Rollups - Constant-cost visitor statistics and log retention.
+Hourly rollup rows (visits, suspicious and threat-level counts, countries,
+a HyperLogLog sketch of IPs) are updated in the same transaction that
+writes each visitor log batch, so dashboards read at most one row per
+hour of the requested window plus one all-time row. A background job
+prunes raw logs (and old hourly rollups) past their retention window.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.services.database import db_service, hour_bucket, ROLLUP_THREAT_COLUMNS
+from app.services.hyperloglog import HyperLogLog
+from app.services.metrics import metrics
+
+
+class VisitorRollupService:
+    """Reads visitor rollups and enforces retention of raw visitor logs"""
+
+    def __init__(self, log_retention_days: float = 30, rollup_retention_days: float = 365,
+                 retention_interval: float = 3600):
+        """
+        Args:
+            log_retention_days: Keep raw visitor logs this long (0 keeps them forever)
+            rollup_retention_days: Keep hourly rollups this long (0 keeps them forever)
+            retention_interval: Seconds between retention passes
+        """
+        self.log_retention_days = log_retention_days
+        self.rollup_retention_days = rollup_retention_days
+        self.retention_interval = retention_interval
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def summarize(rollups: List) -> Dict:
+        """Combine rollup rows into one set of statistics"""
+        sketch = HyperLogLog()
+        countries: Dict[str, int] = {}
+        summary = {"visits": 0, "suspicious": 0}
+        threat_levels = {level.lower(): 0 for level in ROLLUP_THREAT_COLUMNS}
+        for rollup in rollups:
+            summary["visits"] += rollup.visits or 0
+            summary["suspicious"] += rollup.suspicious or 0
+            for level, column in ROLLUP_THREAT_COLUMNS.items():
+                threat_levels[level.lower()] += getattr(rollup, column) or 0
+            for country, visits in (rollup.countries or {}).items():
+                countries[country] = countries.get(country, 0) + visits
+            if rollup.ip_sketch:
+                sketch.merge(HyperLogLog.from_bytes(rollup.ip_sketch))
+        summary["unique_ips"] = sketch.count()
+        summary["threat_levels"] = threat_levels
+        summary["countries"] = dict(sorted(countries.items(), key=lambda item: item[1], reverse=True))
+        return summary
+
+    async def window(self, hours: int = 24, session=None) -> Dict:
+        """Statistics for the last `hours` hourly buckets (the current, partial hour included)"""
+        since = hour_bucket(datetime.utcnow()) - timedelta(hours=max(hours, 1) - 1)
+        rollups = await db_service.get_visitor_rollups_async("hour", since, session=session)
+        return self.summarize(rollups)
+
+    async def totals(self, session=None) -> Dict:
+        """All-time statistics, including logs already pruned by retention"""
+        rollups = await db_service.get_visitor_rollups_async("total", session=session)
+        return self.summarize(rollups)
+
+    def run_retention(self) -> Dict[str, int]:
+        """Prune expired raw logs and hourly rollups (blocking)"""
+        started = time.monotonic()
+        now = datetime.utcnow()
+        pruned = {"logs": 0, "rollups": 0}
+        if self.log_retention_days > 0:
+            pruned["logs"] = db_service.prune_visitor_logs(now - timedelta(days=self.log_retention_days))
+        if self.rollup_retention_days > 0:
+            pruned["rollups"] = db_service.prune_visitor_rollups(now - timedelta(days=self.rollup_retention_days))
+        metrics.increment("visitor_rollup.pruned_logs", pruned["logs"])
+        metrics.increment("visitor_rollup.pruned_rollups", pruned["rollups"])
+        metrics.observe("visitor_rollup.retention_seconds", time.monotonic() - started)
+        if pruned["logs"] or pruned["rollups"]:
+            print(f"Visitor retention pruned {pruned['logs']} logs and {pruned['rollups']} hourly rollups")
+        return pruned
+
+    async def start(self):
+        """Backfill rollups for pre-existing logs, then start the retention loop"""
+        if self._task is not None:
+            return
+        if not await asyncio.to_thread(db_service.has_visitor_rollups):
+            counted = await asyncio.to_thread(db_service.rebuild_visitor_rollups)
+            print(f"Built visitor rollups from {counted} existing logs")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_retention)
+            except Exception as e:
+                print(f"Visitor retention pass failed: {e}")
+            await asyncio.sleep(self.retention_interval)
+
+
+# Global instance
+visitor_rollups = VisitorRollupService(
+    log_retention_days=settings.VISITOR_LOG_RETENTION_DAYS,
+    rollup_retention_days=settings.VISITOR_ROLLUP_RETENTION_DAYS,
+    retention_interval=settings.VISITOR_RETENTION_INTERVAL
+)
@@ -0,0 +1,161 @@
+"""
+Visitor Tracking - Low-overhead reverse OSINT tracking of incoming requests.
+A pure ASGI middleware copies a compact record of each tracked request
+(client IP, user agent, path, method) into a bounded queue; a fixed set of
+consumer tasks drains it through ReverseOSINTService.log_visitor. When the
+queue is full, records are dropped by policy and counted instead of
+spawning more work, so a traffic spike cannot pile up tasks.
+"""
+
+import asyncio
+from typing import Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.services.metrics import metrics
+
+# (ip, user agent bytes, path, method)
+VisitorRecord = Tuple[str, bytes, str, str]
+
+
+class PathMatcher:
+    """
+    Precompiled skip rules: exact paths, and prefixes written as "/prefix/*"
+    that match the prefix itself and anything below it (never "/prefixed").
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        exact, prefixes = set(), []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern:
+                continue
+            if pattern.endswith("/*"):
+                base = pattern[:-2].rstrip("/")
+                exact.add(base or "/")
+                prefixes.append(base + "/")
+            else:
+                exact.add(pattern)
+        self.exact = frozenset(exact)
+        self.prefixes = tuple(prefixes)
+
+    def matches(self, path: str) -> bool:
+        return path in self.exact or (bool(self.prefixes) and path.startswith(self.prefixes))
+
+
+class VisitorTracker:
+    """Bounded queue of visitor records drained by a fixed pool of consumers"""
+
+    DROP_POLICIES = ("newest", "oldest")
+
+    def __init__(self, queue_size: int = 10000, workers: int = 8, drop_policy: str = "newest"):
+        """
+        Args:
+            queue_size: Records held before the drop policy applies
+            workers: Consumer tasks processing records concurrently
+            drop_policy: "newest" rejects incoming records when full, "oldest" evicts the oldest queued
+        """
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.queue_size = queue_size
+        self.workers = workers
+        self.drop_policy = drop_policy
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Hot-path counters are plain ints (single event loop thread), read through gauges
+        self.enqueued = 0
+        self.dropped = 0
+        metrics.register_gauge("visitor_tracking.enqueued", lambda: self.enqueued)
+        metrics.register_gauge("visitor_tracking.dropped", lambda: self.dropped)
+        metrics.register_gauge("visitor_tracking.queue_depth", lambda: self._queue.qsize() if self._queue else 0)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def record(self, record: VisitorRecord) -> bool:
+        """Queue a record without blocking; returns False if a record was dropped"""
+        queue = self._queue
+        if queue is None:
+            return False
+        try:
+            queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.drop_policy == "newest":
+                return False
+            queue.get_nowait()
+            queue.task_done()
+            queue.put_nowait(record)
+            self.enqueued += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 2.0):
+        """Give consumers up to `timeout` seconds to drain the queue, then cancel them"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.dropped += self._queue.qsize()
+        self._queue = None
+
+    async def _consume(self):
+        from app.services.reverse_osint import reverse_osint
+
+        queue = self._queue
+        while True:
+            ip, user_agent, path, method = await queue.get()
+            try:
+                await reverse_osint.log_visitor({
+                    "ip": ip,
+                    "user_agent": user_agent.decode("latin-1") if user_agent else "unknown",
+                    "path": path,
+                    "method": method
+                })
+                metrics.increment("visitor_tracking.processed")
+            except Exception as e:
+                print(f"Reverse OSINT tracking error: {e}")
+                metrics.increment("visitor_tracking.errors")
+            finally:
+                queue.task_done()
+
+
+class VisitorTrackingMiddleware:
+    """Pure ASGI middleware feeding VisitorTracker; adds no awaits to the request path"""
+
+    def __init__(self, app, tracker: Optional[VisitorTracker] = None, skip_paths: Iterable[str] = None):
+        self.app = app
+        self.tracker = tracker or visitor_tracker
+        self.skip = PathMatcher(settings.VISITOR_TRACKING_SKIP_PATHS if skip_paths is None else skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not self.skip.matches(scope["path"]):
+            client = scope.get("client")
+            user_agent = b""
+            for name, value in scope["headers"]:
+                if name == b"user-agent":
+                    user_agent = value
+                    break
+            self.tracker.record((client[0] if client else "unknown", user_agent, scope["path"], scope["method"]))
+        await self.app(scope, receive, send)
+
+
+# Global instance
+visitor_tracker = VisitorTracker(
+    queue_size=settings.VISITOR_TRACKING_QUEUE_SIZE,
+    workers=settings.VISITOR_TRACKING_WORKERS,
+    drop_policy=settings.VISITOR_TRACKING_DROP_POLICY
+)
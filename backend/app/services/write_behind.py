@@ -0,0 +1,139 @@
+"""
+Write-Behind Writer - Batching buffer for high-volume inserts.
+Records are queued in memory and flushed with one multi-row INSERT every
+N records or M milliseconds, instead of one commit (and fsync) per request.
+Subclasses name the metrics and supply the batch insert.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.services.metrics import metrics
+
+
+class WriteBehindWriter:
+    """Bounded, batching write-behind queue of row dicts"""
+
+    name = "write_behind"  # Metric prefix
+
+    def __init__(self, batch_size: int = 200, flush_interval_ms: int = 500, max_pending: int = 10000):
+        """
+        Args:
+            batch_size: Flush as soon as this many records are queued (and cap rows per INSERT)
+            flush_interval_ms: Flush queued records at least this often
+            max_pending: Queue bound; records submitted beyond it are dropped and counted
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending = max_pending
+        self._queue: Deque[Tuple[float, Dict]] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        metrics.register_gauge(f"{self.name}.pending", lambda: len(self._queue))
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def write(self, records: List[Dict]):
+        """Insert a batch of records (blocking)"""
+        raise NotImplementedError
+
+    def submit(self, record: Dict) -> bool:
+        """
+        Queue one record (column names as keys).
+        Returns False if the record was dropped because the queue is full.
+        """
+        if not self.running:
+            # No flusher (scripts, tests): write through
+            self.write([record])
+            metrics.increment(f"{self.name}.written")
+            return True
+
+        with self._lock:
+            if len(self._queue) >= self.max_pending:
+                dropped = True
+            else:
+                dropped = False
+                self._queue.append((time.monotonic(), record))
+                full_batch = len(self._queue) >= self.batch_size
+        if dropped:
+            metrics.increment(f"{self.name}.dropped")
+            return False
+        if full_batch:
+            self._wake()
+        return True
+
+    def _wake(self):
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _take_batch(self) -> List[Tuple[float, Dict]]:
+        with self._lock:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def flush(self) -> int:
+        """Write everything queued so far in batch_size INSERTs (blocking); returns rows written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return written
+                started = time.monotonic()
+                try:
+                    self.write([record for _, record in batch])
+                except Exception as e:
+                    print(f"{self.name} flush failed, dropping {len(batch)} records: {e}")
+                    metrics.increment(f"{self.name}.write_errors")
+                    metrics.increment(f"{self.name}.dropped", len(batch))
+                    continue
+                finished = time.monotonic()
+                written += len(batch)
+                metrics.increment(f"{self.name}.written", len(batch))
+                metrics.observe(f"{self.name}.batch_size", len(batch))
+                metrics.observe(f"{self.name}.flush_seconds", finished - started)
+                # Time the oldest record of the batch spent waiting in memory
+                metrics.observe(f"{self.name}.queue_delay_seconds", finished - batch[0][0])
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write out everything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._loop = None
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._queue:
+                await asyncio.to_thread(self.flush)
+
@@ -0,0 +1,94 @@
+"""
+Benchmark: offline IP geolocation lookups.
+
+Writes a synthetic CSV range database (IPv4 ranges across the whole address
+space plus IPv6 /48s), loads it into GeoIPService and measures load time,
+uncached and cached single lookups, and vectorized batch lookups.
+
+Usage: python benchmark_geoip.py [IPv4 ranges] [IPv6 ranges]
+"""
+
+import csv
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'geoip.db')}"
+
+from app.services.geoip import GeoIPService
+
+CITIES = [("United States", "New York", 40.7128, -74.0060), ("United Kingdom", "London", 51.5074, -0.1278),
+          ("Germany", "Berlin", 52.52, 13.405), ("Japan", "Tokyo", 35.6762, 139.6503),
+          ("India", "Mumbai", 19.076, 72.8777), ("Brazil", "Sao Paulo", -23.5505, -46.6333)]
+
+
+def write_database(path: str, v4_ranges: int, v6_ranges: int):
+    rng = random.Random(7)
+    starts = sorted(rng.sample(range(1 << 32), v4_ranges))
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["start_ip", "end_ip", "country", "city", "latitude", "longitude", "isp"])
+        for i, start in enumerate(starts):
+            end = starts[i + 1] - 1 if i + 1 < len(starts) else (1 << 32) - 1
+            country, city, lat, lon = CITIES[rng.randrange(len(CITIES))]
+            writer.writerow([start, end, country, city, lat, lon, f"AS{rng.randrange(1, 65000)}"])
+        for prefix in sorted(rng.sample(range(1 << 45), v6_ranges)):
+            network = ipaddress.IPv6Network(((0x2000 << 112) | (prefix << 80), 48))
+            country, city, lat, lon = CITIES[rng.randrange(len(CITIES))]
+            writer.writerow([network.network_address, network.broadcast_address, country, city, lat, lon, "AS6"])
+
+
+def per_second(func, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        func(item)
+    return len(items) / (time.perf_counter() - started)
+
+
+def main():
+    v4_ranges = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    v6_ranges = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    path = os.path.join(tempfile.mkdtemp(), "ranges.csv")
+    write_database(path, v4_ranges, v6_ranges)
+
+    service = GeoIPService(path, cache_size=65536)
+    started = time.perf_counter()
+    count = service.load()
+    print(f"loaded {count} ranges ({v4_ranges} IPv4, {v6_ranges} IPv6 before merging) "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(11)
+    v4 = [str(ipaddress.IPv4Address(rng.randrange(1 << 32))) for _ in range(200000)]
+    v6 = [str(ipaddress.IPv6Address((0x2000 << 112) | (rng.randrange(1 << 45) << 80) | rng.randrange(1 << 80)))
+          for _ in range(100000)]
+    hot = v4[:1000]
+
+    table = service._state[0]
+    uncached_find = service._state[1].__wrapped__
+
+    def uncached(ip):
+        return service._record(uncached_find(ip), table)
+
+    for ip in hot:
+        service.lookup(ip)
+    print(f"{'case':>26} {'lookups/s':>11} {'us/lookup':>10}")
+    for name, func, items in [("IPv4 uncached", uncached, v4), ("IPv6 uncached", uncached, v6),
+                              ("IPv4 cached (1k hot IPs)", service.lookup, hot * 200)]:
+        rate = per_second(func, items)
+        print(f"{name:>26} {rate:>11.0f} {1e6 / rate:>10.2f}")
+
+    for size in (1000, 100000):
+        batch = v4[:size]
+        started = time.perf_counter()
+        located = service.lookup_many(batch)
+        rate = size / (time.perf_counter() - started)
+        print(f"{'IPv4 batch of ' + str(size):>26} {rate:>11.0f} {1e6 / rate:>10.2f}")
+    assert all(location is not None for location in located)
+    assert service.lookup_many(batch) == [service.lookup(ip) for ip in batch]
+
+
+if __name__ == "__main__":
+    main()
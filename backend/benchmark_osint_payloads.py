@@ -0,0 +1,110 @@
+"""
+Benchmark: OSINT payload storage, inline JSON vs compressed payload_blobs.
+
+Builds two throwaway SQLite databases from the same mock social media
+scans: one laid out as before (full result inline in osint_collections.data
+plus the summary in metadata_extracted, both loaded by the history query)
+and one written through DatabaseService (zstd blobs deduplicated by
+content hash, deferred columns). Reports file size and history latency.
+
+Usage: python benchmark_osint_payloads.py [scans]
+"""
+
+import asyncio
+import copy
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+workdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'blobs.db')}"
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker, undefer
+
+from app.services.database import Base, OSINTCollection, db_service, engine
+from app.services.social_media_osint import social_media_osint
+
+USERS = 4
+PAGE = 50
+
+
+async def make_scans(count: int):
+    """Mock scans; the mock API sleeps per call, so vary a small pool of real results"""
+    profiles = await asyncio.gather(*(social_media_osint.scan_profile("instagram", f"user{i}", True)
+                                      for i in range(20)))
+    search = await social_media_osint.search_username_across_platforms("repeat_target")
+    scans = []
+    for i in range(count):
+        if i % 5 == 4:
+            # Repeated searches for the same name produce identical results
+            scans.append(("username_search", "repeat_target", search, None, 0))
+            continue
+        result = copy.deepcopy(profiles[i % len(profiles)])
+        result["username"] = f"user{i}"
+        result["scan_timestamp"] = f"{result.get('scan_timestamp')}#{i}"
+        scans.append(("social_media", f"user{i}", result, result.get("metadata_summary"),
+                      result.get("exposure_metrics", {}).get("exposure_score", 0)))
+    return scans
+
+
+def file_size(db_engine) -> int:
+    with db_engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+        path = db_engine.url.database
+    return os.path.getsize(path)
+
+
+def time_history(fetch, rounds: int = 50) -> float:
+    timings = []
+    for i in range(rounds):
+        started = time.perf_counter()
+        fetch(f"demo{i % USERS}")
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    db_service.init_schema()
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    scans = asyncio.run(make_scans(count))
+
+    # Previous layout: everything inline, nothing deferred
+    legacy_engine = create_engine(f"sqlite:///{os.path.join(workdir, 'inline.db')}")
+    Base.metadata.create_all(bind=legacy_engine)
+    LegacySession = sessionmaker(bind=legacy_engine)
+    with LegacySession() as db:
+        db.execute(insert(OSINTCollection).values([{
+            "user_id": f"demo{i % USERS}", "collection_type": kind, "target": target, "data": data,
+            "metadata_extracted": metadata, "risk_score": risk
+        } for i, (kind, target, data, metadata, risk) in enumerate(scans)]))
+        db.commit()
+
+    for i, (kind, target, data, metadata, risk) in enumerate(scans):
+        db_service.log_osint_collection(f"demo{i % USERS}", kind, target, data, metadata, risk)
+
+    def legacy_history(user_id):
+        with LegacySession() as db:
+            return db.query(OSINTCollection).options(
+                undefer(OSINTCollection.data), undefer(OSINTCollection.metadata_extracted)
+            ).filter(OSINTCollection.user_id == user_id).order_by(
+                OSINTCollection.created_at.desc()
+            ).limit(PAGE).all()
+
+    legacy_ms = time_history(legacy_history)
+    blob_ms = time_history(lambda user_id: db_service.get_osint_history(user_id, PAGE))
+    legacy_size, blob_size = file_size(legacy_engine), file_size(engine)
+
+    first = db_service.get_osint_history("demo0", 1)[0]
+    _, payload = db_service.get_osint_collection(first.id)
+    assert payload["username"] == first.target
+
+    print(f"{count} scans, history page of {PAGE}")
+    print(f"  inline JSON   : {legacy_size / 1024 ** 2:7.2f} MB, history {legacy_ms:6.2f} ms")
+    print(f"  payload_blobs : {blob_size / 1024 ** 2:7.2f} MB, history {blob_ms:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: sliding-window request rate tracking.
+
+1. Latency of RequestRateTracker.observe() under IP churn (every request
+   from a new IP, plus a few heavy hitters), with the sketch's fixed memory.
+2. Accuracy: estimated vs exact window counts for the heavy hitters and for
+   a sample of one-off IPs, and whether top-K finds the heavy hitters.
+3. Shared memory: several processes counting into one segment, checking
+   that the combined count matches the number of requests sent.
+
+Usage: python benchmark_rate_tracker.py [requests] [processes]
+"""
+
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'rates.db')}")
+
+from app.services.count_min import SlidingCountMinSketch
+from app.services.rate_tracker import RequestRateTracker
+
+HEAVY = [f"198.51.100.{i}" for i in range(10)]
+
+
+def churn(count: int):
+    tracker = RequestRateTracker(window_seconds=60, ip_limit=120)
+    nbytes = SlidingCountMinSketch.nbytes(60, tracker.sketch.width, tracker.sketch.depth)
+    rng = random.Random(5)
+    start = 1_000_000.0
+    exact = Counter()
+    timings = []
+    # Requests spread over 30 s so the whole stream stays inside the window
+    for i in range(count):
+        ip = HEAVY[rng.randrange(len(HEAVY))] if rng.random() < 0.05 else f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+        exact[ip] += 1
+        now = start + 30.0 * i / count
+        began = time.perf_counter()
+        tracker.observe(ip, f"fp-{ip}", now)
+        timings.append(time.perf_counter() - began)
+    timings.sort()
+    print(f"{count} requests, {len(exact)} distinct IPs, sketch {nbytes / 1e6:.1f} MB")
+    print(f"observe(): mean {statistics.mean(timings) * 1e6:.1f} us, p50 {timings[len(timings) // 2] * 1e6:.1f} us, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.1f} us")
+
+    now = start + 30.0
+    errors = [tracker.sketch.estimate(f"ip:{ip}", now) - exact[ip] for ip in HEAVY]
+    print(f"heavy hitters: exact ~{statistics.mean(exact[ip] for ip in HEAVY):.0f} each, "
+          f"overestimate mean {statistics.mean(errors):.1f}, max {max(errors)}")
+    singles = [ip for ip in exact if exact[ip] == 1][:5000]
+    errors = [tracker.sketch.estimate(f"ip:{ip}", now) - 1 for ip in singles]
+    flagged = sum(1 for error in errors if error + 1 > tracker.ip_limit)
+    print(f"one-off IPs: overestimate mean {statistics.mean(errors):.1f}, max {max(errors)}, "
+          f"falsely rapid {flagged}/{len(singles)}")
+    top = {entry["key"] for entry in tracker.heavy_hitters(len(HEAVY), now)["ip"]}
+    print(f"top-{len(HEAVY)} recovered {len(top & set(HEAVY))}/{len(HEAVY)} heavy hitters")
+
+
+def shared_worker(name: str, count: int):
+    tracker = RequestRateTracker(window_seconds=60, shared_name=name)
+    for i in range(count):
+        tracker.observe(HEAVY[i % len(HEAVY)], "fp-shared")
+
+
+def shared(processes: int, count: int):
+    name = f"bench_rates_{os.getpid()}"
+    main_tracker = RequestRateTracker(window_seconds=60, shared_name=name)
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=shared_worker, args=(name, count)) for _ in range(processes)]
+    began = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - began
+    sent = processes * count
+    seen = main_tracker.sketch.estimate("fp:fp-shared")
+    print(f"shared memory: {processes} processes x {count} requests in {elapsed:.1f}s; "
+          f"fingerprint count {seen}/{sent}, window events {main_tracker.sketch.events()}")
+    # Trackers leave the segment in place for other workers; remove it explicitly
+    from multiprocessing import resource_tracker
+    segment = main_tracker._segment
+    main_tracker.close()
+    resource_tracker.register(segment._name, "shared_memory")
+    segment.unlink()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    churn(count)
+    shared(processes, 20000)
+
+
+if __name__ == "__main__":
+    main()
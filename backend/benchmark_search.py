@@ -0,0 +1,105 @@
+"""
+Benchmark: full-text search, FTS5 index vs LIKE scan.
+
+Seeds a throwaway SQLite database with synthetic stego results (indexed by
+the insert trigger, as in production), then times DatabaseService.search
+for common terms, a rare term, a prefix and a per-user query against the
+equivalent case-insensitive LIKE scan over steganography_results.
+
+Usage: python benchmark_search.py [documents]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search.db')}"
+
+from sqlalchemy import insert, text
+
+from app.services.database import SteganographyResult, db_service
+
+USERS = 50
+BATCH = 5000
+WORDS = ("meet", "north", "gate", "package", "courier", "signal", "midnight", "bridge", "station", "contact",
+         "drop", "safehouse", "transfer", "account", "ledger", "route", "harbor", "window", "keys", "archive")
+# Zipf-like vocabulary: a few words are everywhere, most are rare
+VOCABULARY = WORDS + tuple(f"{word}{n}" for n in range(1, 250) for word in WORDS)
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+RARE = "nightfall"
+
+
+def seed(count: int):
+    rng = random.Random(7)
+    start = datetime.utcnow() - timedelta(days=365)
+    db = db_service.get_db()
+    try:
+        for offset in range(0, count, BATCH):
+            rows = []
+            for i in range(offset, min(offset + BATCH, count)):
+                words = rng.choices(VOCABULARY, WEIGHTS, k=rng.randint(8, 40))
+                if i % 10000 == 0:
+                    words.insert(rng.randrange(len(words)), RARE)
+                rows.append({
+                    "user_id": f"user{i % USERS}", "file_path": f"/uploads/{i}.png", "file_name": f"{i}.png",
+                    "has_hidden_data": True, "confidence_score": 0.9, "detection_method": "LSB",
+                    "extracted_text": " ".join(words), "analyzed_at": start + timedelta(seconds=i * 10)
+                })
+            db.execute(insert(SteganographyResult).values(rows))
+        db.commit()
+    finally:
+        db.close()
+
+
+def timed(call, rounds: int = 20) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def like_scan(term: str, user_id: str = None):
+    db = db_service.get_db()
+    try:
+        filters = " AND user_id = :user_id" if user_id else ""
+        return db.execute(text(
+            "SELECT id FROM steganography_results WHERE extracted_text LIKE :pattern"
+            f"{filters} ORDER BY analyzed_at DESC LIMIT 20"
+        ), {"pattern": f"%{term}%", "user_id": user_id}).all()
+    finally:
+        db.close()
+
+
+def main():
+    db_service.init_schema()
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    started = time.perf_counter()
+    seed(count)
+    print(f"{count} documents seeded and indexed in {time.perf_counter() - started:.1f} s")
+
+    cases = [
+        ("top term", "meet", None),
+        ("common term", "courier", None),
+        ("two terms", "courier midnight", None),
+        ("mid-frequency", "signal3", None),
+        ("rare term", RARE, None),
+        ("prefix", "harbor1*", None),
+        ("rare, one user", RARE, "user0"),
+    ]
+    print(f"{'query':>16} {'hits':>5} {'fts5 ms':>9} {'LIKE ms':>9}")
+    for label, query, user_id in cases:
+        hits = db_service.search(query, user_id=user_id)
+        fts_ms = timed(lambda: db_service.search(query, user_id=user_id))
+        like_term = query.split()[0].rstrip("*")
+        like_ms = timed(lambda: like_scan(like_term, user_id), rounds=5)
+        print(f"{label:>16} {len(hits):>5} {fts_ms:>9.2f} {like_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
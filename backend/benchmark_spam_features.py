@@ -0,0 +1,50 @@
+"""
+SPAM Feature Extractor Benchmark
+Times extract_spam_features on a 12 MP image (single core) to verify it
+fits the default /stego/analyze path budget of 0.5 s.
+"""
+
+import os
+import sys
+import time
+
+# Pin BLAS/OpenMP pools before NumPy loads so the timing is single-core
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from app.ml.spam_features import extract_spam_features, SPAM_FEATURE_LENGTH
+
+BUDGET_SECONDS = 0.5
+RUNS = 5
+
+
+def bench(name: str, img: np.ndarray) -> float:
+    extract_spam_features(img)  # warm-up
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        features = extract_spam_features(img)
+        timings.append(time.perf_counter() - start)
+    assert features.shape == (SPAM_FEATURE_LENGTH,)
+    best = min(timings)
+    status = "✓" if best < BUDGET_SECONDS else "✗"
+    print(f"{status} {name:<28} best {best * 1000:7.1f} ms   median {sorted(timings)[RUNS // 2] * 1000:7.1f} ms")
+    return best
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print(f"SPAM feature extraction ({SPAM_FEATURE_LENGTH} features), budget {BUDGET_SECONDS * 1000:.0f} ms")
+    print("=" * 60)
+
+    rng = np.random.default_rng(0)
+    results = [
+        bench("12 MP RGB (4000x3000)", rng.integers(0, 256, (3000, 4000, 3), dtype=np.uint8)),
+        bench("12 MP grayscale", rng.integers(0, 256, (3000, 4000), dtype=np.uint8)),
+        bench("2 MP RGB (1920x1080)", rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8)),
+    ]
+
+    sys.exit(0 if max(results) < BUDGET_SECONDS else 1)
@@ -0,0 +1,91 @@
+"""
+Benchmark: core write latency under visitor telemetry load.
+
+Saves stego results one at a time (a core route write) while other
+processes insert visitor logs in 200-row batches as fast as they can, the
+way saturated log writers in several workers would. Runs twice: telemetry
+in the core database ("shared", the previous layout) and in its own
+database ("split", the default). Each run also measures an idle baseline.
+
+Usage: python benchmark_telemetry_split.py [core writes] [telemetry processes]
+"""
+
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BATCH = 200
+
+
+def telemetry_load(stop, counter):
+    from app.services.database import db_service
+    batch = [{
+        "ip_address": f"10.0.{i % 256}.{i % 200}", "user_agent": "Mozilla/5.0", "accessed_resource": "/api/scan",
+        "request_method": "GET", "country": "Local", "is_suspicious": i % 7 == 0, "threat_level": "LOW"
+    } for i in range(BATCH)]
+    while not stop.is_set():
+        db_service.insert_visitor_logs([dict(record) for record in batch])
+        with counter.get_lock():
+            counter.value += BATCH
+
+
+def core_writes(count: int):
+    from sqlalchemy.exc import OperationalError
+    from app.services.database import db_service
+    timings, failures = [], 0
+    for i in range(count):
+        started = time.perf_counter()
+        try:
+            db_service.save_stego_result(f"user{i % 10}", f"/uploads/{i}.png", f"{i}.png", False, 0.1, "LSB", 1000)
+        except OperationalError:  # database is locked past busy_timeout
+            failures += 1
+        timings.append(time.perf_counter() - started)
+    return timings, failures
+
+
+def run(mode: str, count: int, processes: int):
+    from app.services.database import db_service
+    db_service.init_schema()  # Create both schemas before the writers start
+    context = multiprocessing.get_context("spawn")
+    for phase in ("idle", "loaded"):
+        stop, counter = context.Event(), context.Value("i", 0)
+        workers = [context.Process(target=telemetry_load, args=(stop, counter))
+                   for _ in range(processes if phase == "loaded" else 0)]
+        for worker in workers:
+            worker.start()
+        while workers and counter.value == 0:
+            time.sleep(0.05)
+        logged, started = counter.value, time.perf_counter()
+        timings, failures = core_writes(count)
+        rate = (counter.value - logged) / (time.perf_counter() - started)
+        stop.set()
+        for worker in workers:
+            worker.join()
+        timings.sort()
+        p50, p99 = statistics.median(timings) * 1000, timings[int(len(timings) * 0.99) - 1] * 1000
+        print(f"{mode:>7} {phase:>7} {p50:>8.2f} {p99:>8.2f} {timings[-1] * 1000:>8.1f} {failures:>7} {rate:>10.0f}",
+              flush=True)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+        return
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    print(f"{count} core writes, {processes} telemetry writer processes")
+    print(f"{'layout':>7} {'load':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'locked':>7} {'logs/s':>10}", flush=True)
+    for mode in ("shared", "split"):
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'core.db')}")
+        env.pop("TELEMETRY_DATABASE_URL", None)
+        if mode == "shared":
+            env["TELEMETRY_DATABASE_URL"] = env["DATABASE_URL"]
+        subprocess.run([sys.executable, __file__, "--run", mode, str(count), str(processes)], env=env, check=True)
+
+
+if __name__ == "__main__":
+    main()
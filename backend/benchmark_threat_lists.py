@@ -0,0 +1,142 @@
+"""
+Benchmark: CIDR threat list matching.
+
+Writes synthetic list files (a large malicious netset with nested
+prefixes, Tor exit /32s, broad VPN/hosting ranges, IPv6 ranges), loads them
+into ThreatListService and checks a sample of matches against a brute-force
+longest-prefix search. Then measures build time, single matches (uncached
+and cached), batch matches from strings, and vectorized matches over
+already-parsed address arrays.
+
+Usage: python benchmark_threat_lists.py [IPv4 prefixes] [lookups]
+"""
+
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'lists.db')}")
+
+import numpy as np
+
+from app.services.threat_lists import ThreatListService, read_list
+
+
+def cidr(version: int, value: int, length: int) -> str:
+    bits = 32 if version == 4 else 128
+    value = value >> (bits - length) << (bits - length)
+    address = ipaddress.IPv4Address(value) if version == 4 else ipaddress.IPv6Address(value)
+    return f"{address}/{length}"
+
+
+def write_lists(directory: str, v4_prefixes: int, rng: random.Random):
+    lists = {
+        "malicious.netset": [cidr(4, rng.getrandbits(32), rng.choice((16, 20, 24, 24, 24, 28, 32, 32)))
+                             for _ in range(v4_prefixes)]
+                            + [cidr(6, (0x2001 << 112) | rng.getrandbits(112), rng.choice((48, 56, 64)))
+                               for _ in range(v4_prefixes // 10)],
+        "tor.txt": [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(v4_prefixes // 30)],
+        "vpn.txt": [cidr(4, rng.getrandbits(32), rng.choice((12, 14, 16, 18, 20))) for _ in range(v4_prefixes // 20)]
+                   + [cidr(6, (0x2001 << 112) | rng.getrandbits(112), rng.choice((24, 32, 40)))
+                      for _ in range(v4_prefixes // 20)],
+    }
+    for name, entries in lists.items():
+        with open(os.path.join(directory, name), "w") as f:
+            f.write(f"# synthetic {name}\n")
+            f.write("\n".join(entries) + "\n")
+
+
+def reference(directory: str):
+    """Brute force: look the address up at every prefix length"""
+    prefixes = {}
+    for name in os.listdir(directory):
+        tag = os.path.splitext(name)[0]
+        for prefix in read_list(os.path.join(directory, name)):
+            prefixes.setdefault(prefix, set()).add(tag)
+    lengths = {4: sorted({p[2] for p in prefixes if p[0] == 4}, reverse=True),
+               6: sorted({p[2] for p in prefixes if p[0] == 6}, reverse=True)}
+
+    def match(ip: str):
+        address = ipaddress.ip_address(ip)
+        version, value, bits = address.version, int(address), address.max_prefixlen
+        longest, tags = None, set()
+        for length in lengths[version]:
+            start = value >> (bits - length) << (bits - length)
+            found = prefixes.get((version, start, length))
+            if found:
+                longest = longest or cidr(version, start, length)
+                tags |= found
+        return {"prefix": longest, "tags": sorted(tags)} if longest else None
+    return match
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds / 1e6:>7.2f} M/s  {seconds / count * 1e6:>7.3f} us"
+
+
+def main():
+    v4_prefixes = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    rng = random.Random(3)
+    directory = tempfile.mkdtemp()
+    write_lists(directory, v4_prefixes, rng)
+
+    service = ThreatListService(directory, anonymizer_tags=["tor", "vpn"])
+    started = time.perf_counter()
+    count = service.load()
+    table = service._state[0]
+    print(f"{count} prefixes in {service.lists} -> {len(table)} ranges, "
+          f"built in {time.perf_counter() - started:.1f}s")
+
+    # Half the queries fall inside a listed prefix
+    listed = [ipaddress.ip_network(line.strip()) for name in os.listdir(directory)
+              for line in open(os.path.join(directory, name)) if not line.startswith("#")]
+    queries = []
+    for i in range(200000):
+        if i % 2:
+            network = listed[rng.randrange(len(listed))]
+            queries.append(str(network.network_address + rng.randrange(network.num_addresses)))
+        elif i % 4:
+            queries.append(str(ipaddress.IPv4Address(rng.getrandbits(32))))
+        else:
+            queries.append(str(ipaddress.IPv6Address((0x2001 << 112) | rng.getrandbits(112))))
+
+    expected = reference(directory)
+    mismatches = sum(1 for ip in queries[:20000] if service.match(ip) != expected(ip))
+    hits = sum(1 for match in service.match_many(queries) if match)
+    print(f"brute-force check: {mismatches} mismatches in 20000; {hits}/{len(queries)} queries listed")
+
+    print(f"{'case':>30} {'lookups':>11} {'per lookup':>10}")
+    find = service._state[1].__wrapped__
+    started = time.perf_counter()
+    for ip in queries:
+        find(ip)
+    print(f"{'single, uncached':>30} {rate(len(queries), time.perf_counter() - started)}")
+    hot = queries[:1000]
+    for ip in hot:
+        service.match(ip)
+    started = time.perf_counter()
+    for _ in range(100):
+        for ip in hot:
+            service.match(ip)
+    print(f"{'single, cached (1k hot IPs)':>30} {rate(100 * len(hot), time.perf_counter() - started)}")
+    started = time.perf_counter()
+    table.ranges.find_many(queries)
+    print(f"{'batch from strings':>30} {rate(len(queries), time.perf_counter() - started)}")
+
+    v4 = np.array([rng.getrandbits(32) for _ in range(lookups)], dtype=np.uint32)
+    started = time.perf_counter()
+    table.ranges.find_v4_many(v4)
+    print(f"{'IPv4 batch, parsed':>30} {rate(lookups, time.perf_counter() - started)}")
+    v6 = np.array([((0x2001 << 112) | rng.getrandbits(112)).to_bytes(16, "big") for _ in range(lookups // 4)],
+                  dtype="S16")
+    started = time.perf_counter()
+    table.ranges.find_v6_many(v6)
+    print(f"{'IPv6 batch, parsed':>30} {rate(len(v6), time.perf_counter() - started)}")
+
+
+if __name__ == "__main__":
+    main()
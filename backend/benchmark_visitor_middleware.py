@@ -0,0 +1,115 @@
+"""
+Benchmark: per-request overhead of visitor tracking middleware.
+
+Drives a trivial ASGI app directly (no server or HTTP client) with a plain
+GET, and reports the time added per request by the previous
+BaseHTTPMiddleware implementation and by VisitorTrackingMiddleware, both
+while records are queued and once the queue is full and records are
+dropped. Consumers are not started, so only the request path is timed.
+
+Usage: python benchmark_visitor_middleware.py [requests]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'middleware.db')}"
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp
+
+from app.services.visitor_tracking import VisitorTracker, VisitorTrackingMiddleware
+
+SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+    "path": "/api/stego/history", "raw_path": b"/api/stego/history", "root_path": "", "query_string": b"",
+    "headers": [(b"host", b"localhost"), (b"user-agent", b"Mozilla/5.0 (X11; Linux x86_64)"), (b"accept", b"*/*")],
+    "client": ("203.0.113.7", 51234), "server": ("127.0.0.1", 8000),
+}
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+class PreviousMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware this replaces, minus the unbounded create_task"""
+
+    async def dispatch(self, request, call_next):
+        try:
+            skip_paths = ["/uploads", "/ws", "/favicon.ico"]
+            path = str(request.url.path)
+            if not any(path.startswith(p) for p in skip_paths):
+                request_data = {
+                    "ip": request.client.host if request.client else "unknown",
+                    "user_agent": request.headers.get("user-agent", "unknown"),
+                    "path": path,
+                    "method": request.method
+                }
+        except Exception as e:
+            print(f"Reverse OSINT tracking error: {e}")
+        return await call_next(request)
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def time_app(app: ASGIApp, count: int, rounds: int = 5) -> float:
+    """Median of per-round mean microseconds per request"""
+    for _ in range(min(count, 1000)):
+        await app(dict(SCOPE), receive, send)
+    means = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(count):
+            await app(dict(SCOPE), receive, send)
+        means.append((time.perf_counter() - started) / count * 1e6)
+    return statistics.median(means)
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    baseline = await time_app(endpoint, count)
+    print(f"{count} requests per round, bare app {baseline:.2f} us/request")
+    print(f"{'middleware':>28} {'us/request':>11} {'added us':>9}")
+
+    async def report(name: str, app: ASGIApp, **kwargs):
+        took = await time_app(app, count, **kwargs)
+        print(f"{name:>28} {took:>11.2f} {took - baseline:>9.2f}")
+
+    await report("BaseHTTPMiddleware (old)", PreviousMiddleware(endpoint))
+
+    # Queue large enough to hold every request: measures the enqueue path
+    tracker = VisitorTracker(queue_size=count * 10)
+    tracker._queue = asyncio.Queue(maxsize=tracker.queue_size)
+    await report("pure ASGI, enqueue", VisitorTrackingMiddleware(endpoint, tracker=tracker))
+    print(f"{'':>28} {tracker.enqueued} enqueued, {tracker.dropped} dropped")
+
+    for policy in VisitorTracker.DROP_POLICIES:
+        tracker = VisitorTracker(queue_size=100, drop_policy=policy)
+        tracker._queue = asyncio.Queue(maxsize=tracker.queue_size)
+        await report(f"pure ASGI, full ({policy})", VisitorTrackingMiddleware(endpoint, tracker=tracker))
+        print(f"{'':>28} {tracker.enqueued} enqueued, {tracker.dropped} dropped")
+
+    skipped = dict(SCOPE, path="/uploads/a.png")
+    tracker = VisitorTracker()
+    middleware = VisitorTrackingMiddleware(endpoint, tracker=tracker)
+    started = time.perf_counter()
+    for _ in range(count):
+        await middleware(dict(skipped), receive, send)
+    took = (time.perf_counter() - started) / count * 1e6
+    print(f"{'pure ASGI, skipped path':>28} {took:>11.2f} {took - baseline:>9.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+"""
+Query plan check for the keyset-paginated history endpoints.
+
+Seeds a throwaway SQLite database, captures the SQL that DatabaseService
+issues for the first page and for a page deep into the history, and
+asserts SQLite answers both from the composite index (no table scan, no
+temp B-tree sort). Also times first vs deep pages, which should match.
+
+Usage: python check_query_plans.py
+Exits non-zero if any plan does not use its index.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'plans.db')}"
+
+from sqlalchemy import event, insert
+
+from app.services.database import (
+    db_service, engine, encode_cursor, telemetry_engine, OSINTCollection, ReverseOSINTLog, ScanResult,
+    SteganographyResult
+)
+
+ENGINES = {engine, telemetry_engine}  # Visitor logs live in the telemetry database
+
+ROWS = 50000
+USERS = 5
+PAGE = 50
+
+
+def seed():
+    start = datetime.utcnow() - timedelta(days=30)
+    db = db_service.get_db()
+    try:
+        for offset in range(0, ROWS, 1000):
+            batch = range(offset, offset + 1000)
+            db.execute(insert(OSINTCollection).values([{
+                "user_id": f"user{i % USERS}", "collection_type": "social_media", "target": f"target{i}",
+                "risk_score": 0.5, "created_at": start + timedelta(seconds=i)
+            } for i in batch]))
+            db.execute(insert(SteganographyResult).values([{
+                "user_id": f"user{i % USERS}", "file_path": f"/tmp/{i}.png", "file_name": f"{i}.png",
+                "confidence_score": 0.1, "analyzed_at": start + timedelta(seconds=i)
+            } for i in batch]))
+            db.execute(insert(ScanResult).values([{
+                "user_id": f"user{i % USERS}", "content_hash": f"{i:064x}", "modality": ("image", "video", "audio")[i % 3],
+                "label": "FAKE" if i % 2 else "REAL", "score": 90.0, "risk_score": 50.0,
+                "scanned_at": start + timedelta(seconds=i)
+            } for i in batch]))
+            db.execute(insert(ReverseOSINTLog).values([{
+                "ip_address": f"10.0.{i % 256}.{i % 200}", "is_suspicious": i % 4 == 0,
+                "timestamp": start + timedelta(seconds=i)
+            } for i in batch]))
+        db.commit()
+    finally:
+        db.close()
+
+
+class Capture:
+    """Record statements run inside the block"""
+
+    def __enter__(self):
+        self.statements = []
+        for bind in ENGINES:
+            event.listen(bind, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        for bind in ENGINES:
+            event.remove(bind, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((conn.engine, statement, parameters))
+
+
+def plan(call):
+    with Capture() as capture:
+        started = time.perf_counter()
+        rows = call()
+        elapsed = time.perf_counter() - started
+    bind, statement, parameters = capture.statements[-1]
+    with bind.connect() as conn:
+        details = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+    return rows, details, elapsed
+
+
+def main():
+    db_service.init_schema()
+    seed()
+    # Deep cursors point two pages before the oldest end of each history
+    osint_rows = db_service.get_osint_history("user0", limit=ROWS)
+    stego_rows = db_service.get_stego_history("user0", limit=ROWS)
+    scan_rows = db_service.get_scan_history("user0", limit=ROWS)
+    image_rows = db_service.get_scan_history("user0", limit=ROWS, modality="image")
+    log_rows = db_service.get_visitor_logs(limit=ROWS)
+    suspicious_rows = db_service.get_visitor_logs(limit=ROWS, suspicious_only=True)
+
+    checks = [
+        ("osint history", "ix_osint_collections_user_created",
+         lambda cursor: db_service.get_osint_history("user0", PAGE, cursor),
+         encode_cursor(osint_rows[-PAGE * 2].created_at, osint_rows[-PAGE * 2].id)),
+        ("stego history", "ix_steganography_results_user_analyzed",
+         lambda cursor: db_service.get_stego_history("user0", PAGE, cursor),
+         encode_cursor(stego_rows[-PAGE * 2].analyzed_at, stego_rows[-PAGE * 2].id)),
+        ("scan history", "ix_scan_results_user_scanned",
+         lambda cursor: db_service.get_scan_history("user0", PAGE, cursor),
+         encode_cursor(scan_rows[-PAGE * 2].scanned_at, scan_rows[-PAGE * 2].id)),
+        ("image scan history", "ix_scan_results_user_modality_scanned",
+         lambda cursor: db_service.get_scan_history("user0", PAGE, cursor, "image"),
+         encode_cursor(image_rows[-PAGE * 2].scanned_at, image_rows[-PAGE * 2].id)),
+        ("visitors", "ix_reverse_osint_logs_time",
+         lambda cursor: db_service.get_visitor_logs(PAGE, False, cursor),
+         encode_cursor(log_rows[-PAGE * 2].timestamp, log_rows[-PAGE * 2].id)),
+        ("suspicious visitors", "ix_reverse_osint_logs_suspicious_time",
+         lambda cursor: db_service.get_visitor_logs(PAGE, True, cursor),
+         encode_cursor(suspicious_rows[-PAGE * 2].timestamp, suspicious_rows[-PAGE * 2].id)),
+    ]
+
+    failures = 0
+    print(f"{ROWS} rows per table, {USERS} users, page size {PAGE}")
+    for label, index, call, cursor in checks:
+        timings = {}
+        for page, page_cursor in (("first", None), ("deep", cursor)):
+            for _ in range(3):  # warm the page cache, keep the last timing
+                rows, details, elapsed = plan(lambda: call(page_cursor))
+            timings[page] = elapsed
+            text = " | ".join(details)
+            ok = (any(index in d for d in details) and not any("TEMP B-TREE" in d for d in details)
+                  and not any(d.startswith("SCAN") and "INDEX" not in d for d in details))
+            ok = ok and len(rows) == PAGE
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {label:>20} {page:>5}: {len(rows)} rows, {text}")
+        print(f"{'':>26} first {timings['first'] * 1000:.2f} ms, deep {timings['deep'] * 1000:.2f} ms")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
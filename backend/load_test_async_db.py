@@ -0,0 +1,128 @@
+"""
+Load test: concurrent requests against the async database path.
+
+Seeds a throwaway SQLite database with visitor logs, then fires concurrent
+requests at /api/reverse-osint/visitors (async session per request) and at
+an equivalent route that calls the blocking DatabaseService method directly
+from the handler, as every route did before. While each run is in flight a
+heartbeat measures event-loop lag (how late a 5 ms sleep wakes up), which is
+how long every other request on the worker is stalled, and a trivial /ping
+request measures end-to-end latency for traffic that never touches the DB.
+
+Usage: python load_test_async_db.py [requests] [concurrency] [page size]
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load_test.db')}"
+
+import httpx
+from fastapi import FastAPI
+
+from app.routers import reverse_osint_router
+from app.services.database import db_service, async_engine
+
+ROWS = 20000
+HEARTBEAT = 0.005
+
+
+def seed():
+    now = datetime.utcnow()
+    records = [{
+        "ip_address": f"10.{i % 256}.{(i // 256) % 256}.{random.randint(1, 254)}",
+        "user_agent": "Mozilla/5.0",
+        "device_fingerprint": f"{i:016x}",
+        "accessed_resource": "/api/scan",
+        "country": "Local",
+        "is_suspicious": i % 7 == 0,
+        "timestamp": now - timedelta(seconds=i)
+    } for i in range(ROWS)]
+    for start in range(0, ROWS, 500):
+        db_service.insert_visitor_logs(records[start:start + 500])
+
+
+app = FastAPI()
+app.include_router(reverse_osint_router.router, prefix="/api/reverse-osint")
+
+
+@app.get("/blocking/visitors")
+async def blocking_visitors(limit: int = 100, suspicious_only: bool = False):
+    logs = db_service.get_visitor_logs(limit=limit, suspicious_only=suspicious_only)
+    return {"total_visitors": len(logs), "visitors": [{"id": log.id, "ip_address": log.ip_address} for log in logs]}
+
+
+@app.get("/ping")
+async def ping():
+    return {"ok": True}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+
+async def run(client: httpx.AsyncClient, path: str, total: int, concurrency: int, page_size: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    lags, pings = [], []
+    done = asyncio.Event()
+
+    async def one():
+        async with semaphore:
+            response = await client.get(path, params={"limit": page_size, "suspicious_only": True})
+            response.raise_for_status()
+
+    async def heartbeat():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(HEARTBEAT)
+            lags.append(time.perf_counter() - started - HEARTBEAT)
+
+    async def pinger():
+        while not done.is_set():
+            started = time.perf_counter()
+            await client.get("/ping")
+            pings.append(time.perf_counter() - started)
+            await asyncio.sleep(0.02)
+
+    watchers = [asyncio.create_task(heartbeat()), asyncio.create_task(pinger())]
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*watchers)
+    return {
+        "throughput": total / elapsed,
+        "lag_p50": percentile(lags, 50), "lag_p99": percentile(lags, 99), "lag_max": max(lags) * 1000,
+        "ping_p50": percentile(pings, 50), "ping_p99": percentile(pings, 99),
+    }
+
+
+async def main():
+    db_service.init_schema()
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    page_size = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    seed()
+    print(f"{ROWS} rows, {total} requests, concurrency {concurrency}, page size {page_size}, "
+          f"async driver: {'yes' if async_engine is not None else 'no (thread pool)'}")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for label, path in (("blocking handler", "/blocking/visitors"),
+                            ("async session", "/api/reverse-osint/visitors")):
+            await run(client, path, 20, 4, page_size)  # warm up connections and caches
+            r = await run(client, path, total, concurrency, page_size)
+            print(f"{label:>16}: {r['throughput']:7.1f} req/s | loop lag p50 {r['lag_p50']:6.1f} ms, "
+                  f"p99 {r['lag_p99']:6.1f} ms, max {r['lag_max']:6.1f} ms | "
+                  f"/ping p50 {r['ping_p50']:6.1f} ms, p99 {r['ping_p99']:6.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
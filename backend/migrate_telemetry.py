@@ -0,0 +1,46 @@
+"""
+Move visitor telemetry out of the core database.
+
+Older versions kept visitor logs (reverse_osint_logs) and their hourly
+rollups (visitor_rollups) in the core database; they now live in the
+telemetry database (TELEMETRY_DATABASE_URL, by default a sibling
+*_telemetry.db file). This copies the old rows over and checks that every
+one of them arrived. Without --drop the core tables are left untouched, so
+a dry copy can be inspected first; with --drop each core table is dropped
+only once its rows are verified, and rollups are merged at that point.
+Re-running is safe.
+
+Usage: python migrate_telemetry.py [--drop] [--batch-size N]
+Exits non-zero if any row could not be verified.
+"""
+
+import argparse
+import sys
+
+from app.services.database import SEPARATE_TELEMETRY, db_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--drop", action="store_true", help="drop core tables whose rows were verified")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if not SEPARATE_TELEMETRY:
+        print("Telemetry shares the core database; nothing to migrate")
+        return 0
+    db_service.init_schema()
+    report = db_service.migrate_telemetry_tables(batch_size=args.batch_size, drop=args.drop)
+    if not report:
+        print("No telemetry tables left in the core database")
+        return 0
+    for table, counts in report.items():
+        print(f"{table}: {counts['rows']} rows, {counts['copied']} copied, {counts['missing']} not verified, "
+              f"{'dropped' if counts['dropped'] else 'kept'}")
+    if not args.drop:
+        print("Core tables kept; run again with --drop to remove them (rollups are merged then)")
+    return 1 if any(counts["missing"] for counts in report.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -82,7 +82,11 @@ export function DeepfakeAnalyzer() {
           { label: 'Model', value: data.analysis?.model_type || 'SecureScan X1' },
           { label: 'Filesize', value: `${(selectedFile.size / 1024).toFixed(1)} KB` }
         ],
-        heatmap: data.heatmap ? (data.heatmap.startsWith('http') ? data.heatmap : `${API_BASE_URL}${data.heatmap}`) : undefined
+        heatmap: (() => {
+          // Resized preview keeps the page light; fall back to the full-size heatmap
+          const heatmap = data.heatmap_preview || data.heatmap;
+          return heatmap ? (heatmap.startsWith('http') ? heatmap : `${API_BASE_URL}${heatmap}`) : undefined;
+        })()
       };
 
       setResult(mappedResult);
@@ -1,6 +1,6 @@
 import { useState } from 'react';
 import { Upload, Search, Eye, MapPin, Smartphone, Calendar, AlertCircle, CheckCircle, Shield } from 'lucide-react';
-import { API_ENDPOINTS } from '../config';
+import { API_BASE_URL, API_ENDPOINTS } from '../config';
 
 interface StegoResult {
     has_hidden_data: boolean;
@@ -13,6 +13,7 @@ interface StegoResult {
         extraction_method?: string;
     };
     heatmap_url?: string;
+    heatmap_preview_url?: string;
     reverse_osint_correlation?: {
         matches_found: boolean;
         risk_level: 'LOW' | 'MEDIUM' | 'HIGH' | 'CRITICAL';
@@ -283,7 +284,7 @@ export function SteganographyAnalyzer() {
                                     <h4 className="text-sm text-slate-400 mb-3">Suspicious Region Heatmap:</h4>
                                     <div className="rounded-lg overflow-hidden border border-slate-800 bg-black/40">
                                         <img
-                                            src={result.heatmap_url}
+                                            src={result.heatmap_preview_url ? `${API_BASE_URL}${result.heatmap_preview_url}` : result.heatmap_url}
                                             alt="Steganography Heatmap"
                                             className="w-full h-auto object-contain"
                                         />
@@ -22,7 +22,7 @@ export const API_ENDPOINTS = {
     SOCIAL_HISTORY: (userId: string) => `${API_BASE_URL}/api/social/history?user_id=${encodeURIComponent(userId)}`,
 
     // Steganography
-    STEGO_ANALYZE: `${API_BASE_URL}/api/stego/analyze`,
+    STEGO_ANALYZE: `${API_BASE_URL}/api/stego/analyze?generate_heatmap=true`,
     STEGO_EXTRACT: `${API_BASE_URL}/api/stego/extract`,
     STEGO_HISTORY: (userId: string) => `${API_BASE_URL}/api/stego/history?user_id=${encodeURIComponent(userId)}`,
     STEGO_METHODS: `${API_BASE_URL}/api/stego/methods`,